@@ -0,0 +1,59 @@
+import numpy as np
+from django.utils import timezone
+
+from .matrices import SponsorshipMatrix
+from .scores import store
+
+
+def cross_party_share(party_counts, own_party):
+    """
+    Computes the share of each row's counts that falls outside a given party.
+    :param party_counts: A dense array of counts, one row per scored object and one column per party
+    :param own_party: An array holding each row's own party column, or -1 where it has none
+    :return: An array of shares between 0 and 1, NaN for rows without a party or without any counts
+    """
+    totals = party_counts.sum(axis=1)
+    scores = np.full(len(party_counts), np.nan)
+    valid = (own_party >= 0) & (totals > 0)
+    rows = np.flatnonzero(valid)
+    scores[rows] = (totals[rows] - party_counts[rows, own_party[rows]]) / totals[rows]
+    return scores
+
+
+def bill_scores(matrix):
+    """
+    Scores each bill by the share of its cosponsors who belong to a different party than its sponsors.
+    :param matrix: A SponsorshipMatrix
+    :return: An array of scores, one per bill in matrix.bill_pks
+    """
+    parties = matrix.party_matrix()
+    cosponsor_parties = (matrix.cosponsors.T @ parties).toarray()
+    sponsor_parties = (matrix.sponsors.T @ parties).toarray()
+    # Bills with sponsors from several parties take the party most of their sponsors belong to
+    sponsor_party = np.where(sponsor_parties.sum(axis=1) > 0, sponsor_parties.argmax(axis=1), -1)
+    return cross_party_share(cosponsor_parties, sponsor_party)
+
+
+def legislator_scores(matrix):
+    """
+    Scores each legislator by the share of cosponsors on the bills they sponsor who belong to another party.
+    :param matrix: A SponsorshipMatrix
+    :return: An array of scores, one per legislator in matrix.legislator_pks
+    """
+    cosponsor_parties = (matrix.sponsors @ (matrix.cosponsors.T @ matrix.party_matrix())).toarray()
+    return cross_party_share(cosponsor_parties, matrix.parties)
+
+
+def score_bipartisanship():
+    """
+    Recomputes and stores the bipartisanship score of every bill and legislator.
+    :return: A tuple of the primary keys of the bills and of the legislators whose scores changed
+    """
+    from ..models import Bill, Legislator
+
+    matrix = SponsorshipMatrix.load()
+    now = timezone.now()
+    bill_pks = store(Bill.objects.all(), 'bipartisanship_score', matrix.bill_pks, bill_scores(matrix), now)
+    legislator_pks = store(Legislator.objects.non_polymorphic(), 'bipartisanship_score', matrix.legislator_pks,
+                           legislator_scores(matrix), now)
+    return bill_pks, legislator_pks
@@ -0,0 +1,93 @@
+import numpy as np
+
+from .matrices import pk_array
+
+
+class UnionFind:
+    """
+    Disjoint sets over the integers 0 to size - 1, with union by size and path halving.
+    """
+    def __init__(self, size):
+        self.parent = np.arange(size)
+        self.sizes = np.ones(size, dtype=np.int64)
+
+    def find(self, index):
+        parent = self.parent
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    def union(self, first, second):
+        first, second = self.find(first), self.find(second)
+        if first == second:
+            return
+        if self.sizes[first] < self.sizes[second]:
+            first, second = second, first
+        self.parent[second] = first
+        self.sizes[first] += self.sizes[second]
+
+    def roots(self):
+        """
+        :return: An array holding the root of every element's set
+        """
+        parent = self.parent.copy()
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                return parent
+            parent = grandparent
+
+
+class RelatedBillGraph:
+    """
+    The related bill graph as compact adjacency arrays: the neighbours of the bill at index i are
+    indices[indptr[i]:indptr[i + 1]], with bills indexed in ascending primary key order.
+    """
+    def __init__(self, bill_pks, indptr, indices):
+        self.bill_pks = bill_pks
+        self.indptr = indptr
+        self.indices = indices
+
+    @classmethod
+    def load(cls):
+        """
+        Reads every bill and related bill edge, with one query per table.
+        :return: A RelatedBillGraph
+        """
+        from ..models import Bill
+
+        bill_pks = pk_array(Bill.objects.order_by('pk').values_list('pk', flat=True))
+        edges = pk_array(Bill.related_bills.through.objects.values_list('from_bill_id', 'to_bill_id')).reshape(-1, 2)
+        # The M2M is symmetrical, but add the reverse of every edge so one-sided rows still connect both ways
+        sources = np.concatenate([np.searchsorted(bill_pks, edges[:, 0]), np.searchsorted(bill_pks, edges[:, 1])])
+        targets = np.concatenate([np.searchsorted(bill_pks, edges[:, 1]), np.searchsorted(bill_pks, edges[:, 0])])
+
+        order = np.lexsort((targets, sources))
+        sources, targets = sources[order], targets[order]
+        unique = np.ones(len(sources), dtype=bool)
+        unique[1:] = (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1])
+        sources, targets = sources[unique], targets[unique]
+
+        indptr = np.zeros(len(bill_pks) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(bill_pks)), out=indptr[1:])
+        return cls(bill_pks, indptr, targets)
+
+    def neighbours(self, index):
+        return self.indices[self.indptr[index]:self.indptr[index + 1]]
+
+    def families(self):
+        """
+        Finds the connected components of the graph with union-find.
+        :return: An array holding, for every bill, the lowest primary key in its component
+        """
+        sets = UnionFind(len(self.bill_pks))
+        for index in range(len(self.bill_pks)):
+            for neighbour in self.neighbours(index):
+                if neighbour > index:
+                    sets.union(index, neighbour)
+
+        roots = sets.roots()
+        lowest = np.full(len(self.bill_pks), np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(lowest, roots, self.bill_pks)
+        return lowest[roots]
@@ -0,0 +1,97 @@
+import numpy as np
+from scipy import sparse
+
+
+def pk_array(pks):
+    """
+    :param pks: An iterable of primary keys
+    :return: The primary keys as an integer array
+    """
+    return np.array(list(pks), dtype=np.int64)
+
+
+def incidence(pairs, row_pks, column_pks):
+    """
+    Builds an incidence matrix from (row, column) primary key pairs.
+    :param pairs: An iterable of (row primary key, column primary key) tuples
+    :param row_pks: The sorted primary keys of the rows
+    :param column_pks: The sorted primary keys of the columns
+    :return: A CSR matrix with a 1 for every pair, however many times the pair appears
+    """
+    pairs = pk_array(pairs).reshape(-1, 2)
+    rows = np.searchsorted(row_pks, pairs[:, 0])
+    columns = np.searchsorted(column_pks, pairs[:, 1])
+    matrix = sparse.csr_matrix((np.ones(len(pairs), dtype=np.int32), (rows, columns)),
+                               shape=(len(row_pks), len(column_pks)))
+    matrix.data[:] = 1
+    return matrix
+
+
+def co_occurrence(matrix):
+    """
+    Counts, for every pair of rows in an incidence matrix, the columns both have, and scores the pair by the Jaccard
+    similarity of their columns.
+    :param matrix: A CSR incidence matrix, e.g. legislators by bills
+    :return: A tuple of arrays, one entry per pair sharing at least one column: row indexes, paired row indexes,
+    shared column counts and similarities. Each row is paired with itself, sharing all its columns, and every other
+    pair appears in both directions.
+    """
+    totals = np.asarray(matrix.sum(axis=1)).ravel()
+    shared = (matrix @ matrix.T).tocoo()
+    similarity = shared.data / (totals[shared.row] + totals[shared.col] - shared.data)
+    return shared.row, shared.col, shared.data, similarity
+
+
+class SponsorshipMatrix:
+    """
+    Sponsorships and cosponsorships held as sparse legislator by bill incidence matrices, with a party vector over
+    the legislators. Rows follow legislator_pks and columns follow bill_pks, both in ascending primary key order.
+    """
+    def __init__(self, legislator_pks, parties, party_pks, bill_pks, sponsors, cosponsors):
+        """
+        :param legislator_pks: An array of legislator primary keys, one per row
+        :param parties: An array of each legislator's index into party_pks, or -1 if their party is unknown
+        :param party_pks: The party primary keys, one per party index
+        :param bill_pks: An array of bill primary keys, one per column
+        :param sponsors: A CSR matrix with a 1 where a legislator sponsors a bill
+        :param cosponsors: A CSR matrix with a 1 where a legislator cosponsors a bill
+        """
+        self.legislator_pks = legislator_pks
+        self.parties = parties
+        self.party_pks = party_pks
+        self.bill_pks = bill_pks
+        self.sponsors = sponsors
+        self.cosponsors = cosponsors
+
+    @classmethod
+    def load(cls):
+        """
+        Reads every legislator, bill, sponsorship and cosponsorship into a matrix, with one query per table.
+        :return: A SponsorshipMatrix
+        """
+        from ..models import Bill, Cosponsorship, Legislator
+        from ..registry import reference_data
+
+        party_pks = sorted(reference_data.current().parties)
+        party_indexes = {party_pk: index for index, party_pk in enumerate(party_pks)}
+
+        legislators = list(Legislator.objects.non_polymorphic().order_by('pk')
+                           .values_list('pk', 'legislator_party_id'))
+        legislator_pks = pk_array(pk for pk, party_pk in legislators)
+        parties = np.array([party_indexes.get(party_pk, -1) for pk, party_pk in legislators], dtype=np.int64)
+        bill_pks = pk_array(Bill.objects.order_by('pk').values_list('pk', flat=True))
+
+        sponsors = incidence(Bill.sponsors.through.objects.values_list('legislator_id', 'bill_id'),
+                             legislator_pks, bill_pks)
+        cosponsors = incidence(Cosponsorship.objects.values_list('legislator_id', 'bill_id'), legislator_pks, bill_pks)
+
+        return cls(legislator_pks, parties, party_pks, bill_pks, sponsors, cosponsors)
+
+    def party_matrix(self):
+        """
+        :return: A legislator by party CSR matrix with a 1 in each legislator's party column. Legislators without a
+        known party have an empty row.
+        """
+        known = np.flatnonzero(self.parties >= 0)
+        return sparse.csr_matrix((np.ones(len(known), dtype=np.int32), (known, self.parties[known])),
+                                 shape=(len(self.legislator_pks), len(self.party_pks)))
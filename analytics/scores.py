@@ -0,0 +1,21 @@
+import math
+
+
+def store(queryset, field, pks, scores, now):
+    """
+    Writes scores that differ from the stored ones, and marks their rows as modified.
+    :param queryset: A queryset of the scored model
+    :param field: The name of the score field
+    :param pks: An array of primary keys
+    :param scores: An array of scores lined up with pks
+    :param now: The time to mark changed rows as modified at
+    :return: The primary keys of the rows that changed
+    """
+    stored = dict(queryset.values_list('pk', field))
+    changed = []
+    for pk, score in zip(pks.tolist(), scores.tolist()):
+        score = None if math.isnan(score) else round(score, 4)
+        if pk in stored and stored[pk] != score:
+            changed.append(queryset.model(pk=pk, last_modified=now, **{field: score}))
+    queryset.bulk_update(changed, [field, 'last_modified'], batch_size=500)
+    return [instance.pk for instance in changed]
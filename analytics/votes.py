@@ -0,0 +1,132 @@
+import numpy as np
+from django.utils import timezone
+
+from .scores import store
+
+
+def unpack(vector, size):
+    """
+    :param vector: A bit vector packed with numpy.packbits
+    :param size: The number of bits it holds
+    :return: The bits as a boolean array
+    """
+    return np.unpackbits(np.frombuffer(vector, dtype=np.uint8), count=size).astype(bool)
+
+
+class VoteMatrix:
+    """
+    Roll calls decoded into a dense matrix with one row per roll call and one column per legislator vote ordinal,
+    holding 1 for yea, -1 for nay and 0 for anything else, along with the legislator and party of every column.
+    """
+    def __init__(self, votes, legislator_pks, parties):
+        """
+        :param votes: An int8 array of roll calls by ordinals
+        :param legislator_pks: An array of the legislator primary key at each ordinal, or -1 where there is none
+        :param parties: An array of the party primary key at each ordinal, or -1 where it is unknown
+        """
+        self.votes = votes
+        self.legislator_pks = legislator_pks
+        self.parties = parties
+
+    @classmethod
+    def load(cls, roll_calls):
+        """
+        Decodes roll calls into a matrix.
+        :param roll_calls: A queryset of roll calls
+        :return: A VoteMatrix
+        """
+        from ..models import Legislator
+
+        rows = list(roll_calls.values_list('size', 'yeas', 'nays'))
+        size = max((row[0] for row in rows), default=0)
+        votes = np.zeros((len(rows), size), dtype=np.int8)
+        for index, (row_size, yeas, nays) in enumerate(rows):
+            votes[index, :row_size] += unpack(yeas, row_size)
+            votes[index, :row_size] -= unpack(nays, row_size)
+
+        legislator_pks = np.full(size, -1, dtype=np.int64)
+        parties = np.full(size, -1, dtype=np.int64)
+        for ordinal, pk, party_pk in Legislator.objects.non_polymorphic().filter(vote_ordinal__lt=size)\
+                .values_list('vote_ordinal', 'pk', 'legislator_party_id'):
+            legislator_pks[ordinal] = pk
+            parties[ordinal] = -1 if party_pk is None else party_pk
+
+        return cls(votes, legislator_pks, parties)
+
+    def party_majorities(self, party_pk):
+        """
+        :param party_pk: The primary key of a party
+        :return: An array holding, for each roll call, 1 if most of the party's members voting voted yea, -1 if most
+        voted nay and 0 on a tie
+        """
+        members = self.votes[:, self.parties == party_pk]
+        return np.sign((members == 1).sum(axis=1) - (members == -1).sum(axis=1))
+
+
+def party_unity(matrix, first_party_pk, second_party_pk):
+    """
+    Counts, for each legislator in either of two parties, the party unity votes they took part in and the ones on
+    which they sided with their party. A party unity vote is one where most voting members of one party opposed most
+    voting members of the other.
+    :param matrix: A VoteMatrix
+    :param first_party_pk: The primary key of one party
+    :param second_party_pk: The primary key of the other party
+    :return: A tuple of two arrays over ordinals: party unity votes sided with the party, and party unity votes cast
+    """
+    first, second = matrix.party_majorities(first_party_pk), matrix.party_majorities(second_party_pk)
+    unity_votes = (first != 0) & (second != 0) & (first != second)
+
+    majorities = np.zeros(matrix.votes.shape, dtype=np.int8)
+    majorities[:, matrix.parties == first_party_pk] = first[:, np.newaxis]
+    majorities[:, matrix.parties == second_party_pk] = second[:, np.newaxis]
+
+    votes = matrix.votes[unity_votes]
+    majorities = majorities[unity_votes]
+    cast = ((votes != 0) & (majorities != 0)).sum(axis=0)
+    sided = ((votes != 0) & (votes == majorities)).sum(axis=0)
+    return sided, cast
+
+
+def agreement(matrix, ordinals=None):
+    """
+    Computes how often pairs of legislators voted the same way.
+    :param matrix: A VoteMatrix
+    :param ordinals: The ordinals to compare with every other, or None for every ordinal
+    :return: An array of the given ordinals by every ordinal, holding the share of roll calls on which both voted
+    yea or nay and agreed, NaN for pairs that never both voted
+    """
+    yeas = (matrix.votes == 1).astype(np.float32)
+    nays = (matrix.votes == -1).astype(np.float32)
+    voted = yeas + nays
+    rows = slice(None) if ordinals is None else ordinals
+    both = voted[:, rows].T @ voted
+    same = yeas[:, rows].T @ yeas + nays[:, rows].T @ nays
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(both > 0, same / both, np.nan)
+
+
+def score_party_unity():
+    """
+    Recomputes and stores every legislator's party unity score, the share of party unity votes on which they sided
+    with their party, over every loaded roll call. Congresses are decoded one at a time to bound memory.
+    :return: The primary keys of the legislators whose scores changed
+    """
+    from ..models import Legislator, RollCall
+    from ..registry import reference_data
+
+    democratic_pk = reference_data.party_by_abbreviation('D').pk
+    republican_pk = reference_data.party_by_abbreviation('R').pk
+
+    sided, cast = {}, {}
+    for congress in RollCall.objects.order_by('congress').values_list('congress', flat=True).distinct():
+        matrix = VoteMatrix.load(RollCall.objects.filter(congress=congress))
+        congress_sided, congress_cast = party_unity(matrix, democratic_pk, republican_pk)
+        for pk, pk_sided, pk_cast in zip(matrix.legislator_pks.tolist(), congress_sided.tolist(),
+                                         congress_cast.tolist()):
+            if pk >= 0:
+                sided[pk] = sided.get(pk, 0) + pk_sided
+                cast[pk] = cast.get(pk, 0) + pk_cast
+
+    pks = np.array(sorted(cast), dtype=np.int64)
+    scores = np.array([sided[pk] / cast[pk] if cast[pk] else np.nan for pk in pks.tolist()])
+    return store(Legislator.objects.non_polymorphic(), 'party_unity_score', pks, scores, timezone.now())
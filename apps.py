@@ -1,5 +1,48 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.models.signals import post_delete, post_migrate, post_save
+
+
+def create_search_index(sender, **kwargs):
+    """
+    Creates the bill full-text index once the app's tables exist.
+    """
+    from .search import BillSearchIndex
+
+    BillSearchIndex.create()
+
+
+def remove_from_search_index(sender, instance=None, **kwargs):
+    """
+    Drops deleted bills from the bill full-text index.
+    """
+    from .search import BillSearchIndex
+
+    BillSearchIndex.delete(instance.pk)
 
 
 class BillserveConfig(AppConfig):
     name = 'billserve'
+
+    def ready(self):
+        from celery.signals import before_task_publish, task_postrun, task_prerun
+        from .autocomplete import autocomplete
+        from .changes import DELETED_RESOURCES, record_deletion
+        from .metrics import task_finished, task_published, task_started
+        from .registry import reference_data_changed
+
+        post_migrate.connect(create_search_index, sender=self)
+        post_delete.connect(remove_from_search_index, sender=self.get_model('Bill'))
+        before_task_publish.connect(task_published)
+        task_prerun.connect(task_started)
+        task_postrun.connect(task_finished)
+        for model_name in ('Party', 'State', 'Chamber', 'PolicyArea'):
+            model = self.get_model(model_name)
+            post_save.connect(reference_data_changed, sender=model)
+            post_delete.connect(reference_data_changed, sender=model)
+        for model_name in DELETED_RESOURCES:
+            post_delete.connect(record_deletion, sender=self.get_model(model_name))
+
+        # Processes that never serve autocomplete requests, like Celery workers, can turn this off
+        if getattr(settings, 'BILLSERVE_AUTOCOMPLETE_WARM', True):
+            autocomplete.rebuild()
@@ -0,0 +1,339 @@
+import bisect
+import heapq
+import logging
+import re
+import threading
+import time
+import unicodedata
+from array import array
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+
+from .registry import deep_size, reference_data
+
+logger = logging.getLogger(__name__)
+
+# How bill numbers are written, by lowercase bill type
+BILL_LABELS = {'s': 'S.', 'hr': 'H.R.', 'sjres': 'S.J.Res.', 'hjres': 'H.J.Res.', 'sconres': 'S.Con.Res.',
+               'hconres': 'H.Con.Res.', 'sres': 'S.Res.', 'hres': 'H.Res.'}
+KINDS = ('bill', 'senator', 'representative', 'legislative-subject', 'policy-area', 'committee')
+# Keys only ever hold these characters, so every key starting with a prefix sorts before prefix + END
+END = '\x7f'
+
+
+def normalize(text):
+    """
+    Folds a name into the form it's indexed under: ASCII, lowercase, without dots or apostrophes and with every
+    other run of punctuation or whitespace turned into a single space. 'H.R. 1' becomes 'hr 1'.
+    :param text: The name
+    :return: The normalized name
+    """
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode().lower()
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', re.sub(r"[.']", '', text)).split())
+
+
+def normalize_query(text):
+    """
+    Normalizes a query like a name, and also splits bill numbers typed without a space, e.g. 'hr1'.
+    :param text: The query
+    :return: The normalized query
+    """
+    query = normalize(text)
+    match = re.match(r'^([a-z]+)(\d+)$', query)
+    if match and match.group(1) in BILL_LABELS:
+        query = '{type} {number}'.format(type=match.group(1), number=match.group(2))
+    return query
+
+
+def word_keys(name):
+    """
+    :param name: A name
+    :return: The normalized name and every suffix of it starting at a later word, so 'Elizabeth Warren' is found by
+    typing either name
+    """
+    words = normalize(name).split()
+    return [' '.join(words[index:]) for index in range(len(words))]
+
+
+def ordinal(number):
+    suffix = 'th' if 10 <= number % 100 <= 20 else {1: 'st', 2: 'nd', 3: 'rd'}.get(number % 10, 'th')
+    return '{number}{suffix}'.format(number=number, suffix=suffix)
+
+
+class KindIndex:
+    """
+    The sorted keys of one kind of entry, with the rank of the entry each key belongs to. A prefix's matches are a
+    contiguous range of the keys. Ranges longer than scan_limit have their best ranks precomputed, so no lookup
+    ever scans more than scan_limit keys.
+    """
+    def __init__(self, tokens, scan_limit, depth):
+        """
+        :param tokens: (key, rank) tuples
+        :param scan_limit: The longest range to scan for the best ranks at lookup time
+        :param depth: How many of the best ranks to precompute for longer ranges
+        """
+        tokens.sort()
+        self.keys = [key for key, rank in tokens]
+        self.ranks = array('l', (rank for key, rank in tokens))
+        self.scan_limit, self.depth = scan_limit, depth
+        self.heavy = {}
+
+        # Only prefixes of heavy prefixes can be heavy, so the search starts from the empty prefix and goes down
+        stack = [('', 0, len(self.keys))]
+        while stack:
+            prefix, lo, hi = stack.pop()
+            index = lo
+            while index < hi:
+                key = self.keys[index]
+                if len(key) <= len(prefix):
+                    index += 1
+                    continue
+                child = key[:len(prefix) + 1]
+                end = bisect.bisect_left(self.keys, child + END, index, hi)
+                if end - index > scan_limit:
+                    self.heavy[child] = tuple(heapq.nsmallest(depth, self.ranks[index:end]))
+                    stack.append((child, index, end))
+                index = end
+
+    def lookup(self, key, count):
+        """
+        :param key: A normalized prefix
+        :param count: How many ranks to return, at most depth
+        :return: The best ranks among the keys starting with the prefix, and the ranks of keys equal to it
+        """
+        lo = bisect.bisect_left(self.keys, key)
+        hi = bisect.bisect_left(self.keys, key + END, lo)
+        if hi - lo > self.scan_limit:
+            best = self.heavy[key][:count]
+        else:
+            best = heapq.nsmallest(count, self.ranks[lo:hi])
+        exact = []
+        for index in range(lo, min(hi, lo + count)):
+            if self.keys[index] != key:
+                break
+            exact.append(self.ranks[index])
+        return best, exact
+
+
+class AutocompleteIndex:
+    """
+    An immutable in-memory prefix index over bill numbers and the names of legislators, legislative subjects, policy
+    areas and committees. Every entry is ranked once, at build time: whole name matches before later word matches,
+    then by how many bills the entry is involved in, then newer congresses and shorter names first. Exact matches of
+    the whole query come before anything else.
+    """
+    scan_limit = 256
+    max_results = 20
+
+    def __init__(self, version):
+        """
+        Builds an index from the database.
+        :param version: The data version the index was built at
+        """
+        started = time.perf_counter()
+        self.version = version
+        self.kind, self.pks, self.labels, self.details = array('b'), array('l'), [], []
+        weights, recencies, tokens = [], [], []
+
+        for kind, pk, label, detail, keys, weight, recency in self.rows():
+            entry = len(self.labels)
+            self.kind.append(KINDS.index(kind))
+            self.pks.append(pk)
+            self.labels.append(label)
+            self.details.append(detail)
+            weights.append(weight)
+            recencies.append(recency)
+            tokens.extend((key, position, entry) for position, key in enumerate(keys) if key)
+
+        order = sorted(range(len(tokens)), key=lambda token: (
+            tokens[token][1] > 0, -weights[tokens[token][2]], -recencies[tokens[token][2]],
+            len(self.labels[tokens[token][2]]), self.labels[tokens[token][2]]))
+        self.entries_by_rank = array('l', (tokens[token][2] for token in order))
+        ranked = [None] * len(tokens)
+        for rank, token in enumerate(order):
+            ranked[token] = rank
+
+        by_kind = {index: [] for index in range(len(KINDS))}
+        for token, (key, position, entry) in enumerate(tokens):
+            by_kind[self.kind[entry]].append((key, ranked[token]))
+        self.kinds = {KINDS[index]: KindIndex(kind_tokens, self.scan_limit, 2 * self.max_results)
+                      for index, kind_tokens in by_kind.items()}
+
+        self.build_seconds = time.perf_counter() - started
+        self.key_count = len(tokens)
+        self.footprint = deep_size([self.kind, self.pks, self.labels, self.details, self.entries_by_rank] +
+                                   [[kind.keys, kind.ranks, kind.heavy] for kind in self.kinds.values()])
+
+    @staticmethod
+    def rows():
+        """
+        Reads every entry from the database.
+        :return: A generator of (kind, pk, label, detail, keys, weight, recency) tuples
+        """
+        from django.db.models import Count
+        from .enumerations import LegislatorType
+        from .models import Bill, Committee, Cosponsorship, Legislator, LegislativeSubject, PolicyArea
+
+        for pk, bill_type, number, congress, title, sponsors, cosponsors in Bill.objects.filter(
+                type__isnull=False, bill_number__isnull=False).values_list(
+                'pk', 'type', 'bill_number', 'congress', 'title', 'num_sponsors', 'num_cosponsors').iterator():
+            label = '{type} {number}'.format(type=BILL_LABELS.get(bill_type.lower(), bill_type.upper()), number=number)
+            detail = title if congress is None else '{title} ({congress} Congress)'.format(
+                title=title or '', congress=ordinal(congress)).strip()
+            yield 'bill', pk, label, detail, [normalize(label)], sponsors + cosponsors, congress or 0
+
+        activity = dict(Bill.sponsors.through.objects.values('legislator').annotate(n=Count('pk'))
+                        .values_list('legislator', 'n').order_by())
+        for legislator_pk, count in Cosponsorship.objects.values('legislator').annotate(n=Count('pk'))\
+                .values_list('legislator', 'n').order_by():
+            activity[legislator_pk] = activity.get(legislator_pk, 0) + count
+        kinds = {LegislatorType.senator.value: 'senator', LegislatorType.representative.value: 'representative'}
+        tables = reference_data.current()
+        for pk, first_name, last_name, legislator_type, party_pk, state_pk in Legislator.objects.non_polymorphic()\
+                .filter(legislator_type__in=kinds).values_list('pk', 'first_name', 'last_name', 'legislator_type',
+                                                              'legislator_party', 'legislator_state').iterator():
+            name = '{first_name} {last_name}'.format(first_name=first_name, last_name=last_name)
+            party, state = tables.parties.get(party_pk), tables.states.get(state_pk)
+            detail = '-'.join(record.abbreviation for record in (party, state) if record is not None) or None
+            yield kinds[legislator_type], pk, name, detail, word_keys(name), activity.get(pk, 0), 0
+
+        counts = dict(Bill.legislative_subjects.through.objects.values('legislativesubject')
+                      .annotate(n=Count('pk')).values_list('legislativesubject', 'n').order_by())
+        for pk, name in LegislativeSubject.objects.values_list('pk', 'name').iterator():
+            yield 'legislative-subject', pk, name, None, word_keys(name), counts.get(pk, 0), 0
+
+        counts = dict(Bill.objects.values('policy_area').annotate(n=Count('pk')).values_list('policy_area', 'n')
+                      .order_by())
+        for pk, name in PolicyArea.objects.values_list('pk', 'name').iterator():
+            yield 'policy-area', pk, name, None, word_keys(name), counts.get(pk, 0), 0
+
+        counts = dict(Bill.committees.through.objects.values('committee').annotate(n=Count('pk'))
+                      .values_list('committee', 'n').order_by())
+        for pk, name, chamber_pk in Committee.objects.values_list('pk', 'name', 'chamber').iterator():
+            chamber = tables.chambers.get(chamber_pk)
+            yield 'committee', pk, name, chamber.name if chamber else None, word_keys(name), counts.get(pk, 0), 0
+
+    def search(self, query, limit=10, kinds=KINDS):
+        """
+        :param query: What the user has typed so far
+        :param limit: The most results to return, up to max_results
+        :param kinds: The kinds of entry to search
+        :return: A list of (kind, pk, label, detail) tuples, best first
+        """
+        key = normalize_query(query)
+        limit = min(limit, self.max_results)
+        if not key or limit < 1:
+            return []
+
+        candidates = []
+        for kind in kinds:
+            best, exact = self.kinds[kind].lookup(key, 2 * limit)
+            candidates.extend((0, rank) for rank in exact)
+            candidates.extend((1, rank) for rank in best)
+        candidates.sort()
+
+        results, seen = [], set()
+        for _, rank in candidates:
+            entry = self.entries_by_rank[rank]
+            if entry in seen:
+                continue
+            seen.add(entry)
+            results.append((KINDS[self.kind[entry]], self.pks[entry], self.labels[entry], self.details[entry]))
+            if len(results) == limit:
+                break
+        return results
+
+    def stats(self):
+        return {'version': self.version, 'entries': len(self.labels), 'keys': self.key_count,
+                'bytes': self.footprint, 'build_seconds': self.build_seconds}
+
+
+class Autocomplete:
+    """
+    A process-wide holder of the current AutocompleteIndex. The index's data version pairs the reference data version
+    with the latest change feed sequence number, which every ingested bill moves on. The app starts building the index
+    in the background as it loads, unless BILLSERVE_AUTOCOMPLETE_WARM is off. It checks the version at most once
+    every BILLSERVE_AUTOCOMPLETE_CHECK_INTERVAL seconds and, when it changed, rebuilds in a background thread while
+    requests keep being answered from the previous index. Only requests that arrive before the first build finishes
+    wait for it.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.index = None
+        self.checked_at = None
+        self.thread = None
+
+    @staticmethod
+    def check_interval():
+        return getattr(settings, 'BILLSERVE_AUTOCOMPLETE_CHECK_INTERVAL', 30.0)
+
+    @staticmethod
+    def data_version():
+        """
+        :return: The version of the data the index is built from
+        """
+        from .models import ChangeEvent
+
+        sequence = ChangeEvent.objects.order_by('-pk').values_list('pk', flat=True).first()
+        return '{reference}:{sequence}'.format(reference=reference_data.data_version(), sequence=sequence or 0)
+
+    def build(self):
+        """
+        Builds the index, unless the current one is already up to date. The caller holds the lock.
+        """
+        version = self.data_version()
+        if self.index is None or self.index.version != version:
+            index = AutocompleteIndex(version)
+            logger.info('Built autocomplete index version %s: %d keys, %d bytes in %.2fs', version, index.key_count,
+                        index.footprint, index.build_seconds)
+            self.index = index
+        self.checked_at = time.monotonic()
+
+    def rebuild(self):
+        """
+        Starts rebuilding the index in a background thread, unless it's already being rebuilt.
+        :return: Whether a rebuild was started
+        """
+        if not self.lock.acquire(blocking=False):
+            return False
+        try:
+            self.thread = threading.Thread(target=self.build_in_background, name='autocomplete', daemon=True)
+            self.thread.start()
+        except Exception:
+            self.lock.release()
+            raise
+        return True
+
+    def build_in_background(self):
+        try:
+            self.build()
+        except DatabaseError as error:
+            # e.g. the app's tables don't exist yet. The next request builds it instead.
+            logger.warning('Could not build the autocomplete index: %s', error)
+        except Exception:
+            logger.exception('Failed to build the autocomplete index')
+        finally:
+            self.lock.release()
+            connection.close()
+
+    def current(self):
+        """
+        :return: The current AutocompleteIndex, built first if there is none yet
+        """
+        index = self.index
+        if index is None:
+            with self.lock:
+                if self.index is None:
+                    self.build()
+                return self.index
+
+        checked_at = self.checked_at
+        if checked_at is None or time.monotonic() - checked_at >= self.check_interval():
+            self.checked_at = time.monotonic()
+            if index.version != self.data_version():
+                self.rebuild()
+        return index
+
+
+autocomplete = Autocomplete()
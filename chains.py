@@ -1,27 +1,61 @@
-from celery import signature
-from .tasks import update, rebuild
+from .crawls import crawls, inflight
+from .metrics import metrics
+from .tasks import drain_frontier, update
 import celery
 
 
 class RelatedBillChain:
     @staticmethod
-    def execute(related_bill_url, current_bill_pk):
+    def execute(related_bill_url, current_bill_pk, crawl_id=None):
         """
-        Executes the asynchronous task chain we need to make a related bill and get it added
-        to its sibling bill correctly.
+        Executes the asynchronous task we need to make a related bill and get it added to its sibling bill correctly.
+        The task adds the bills to each other's related bills itself, rather than through a linked task, so a crawl's
+        barrier counts it as one unit of work that always finishes.
         :param related_bill_url: The URL of the related bill we'd like to parse. May or may not exist in database.
         :param current_bill_pk: The primary key of the bill we've already parsed. Exists in database.
+        :param crawl_id: The id of the crawl to add the task to, if any
         """
+        from .models import Bill
+
+        # A bill populated a moment ago is linked here rather than through another task that would only reuse it
+        related_bill_pk = inflight.result(related_bill_url)
+        if related_bill_pk is not None:
+            metrics.increment('populate_duplicates_total', outcome='linked')
+            Bill.objects.add_related_bill(current_bill_pk, related_bill_pk)
+            return
+
         pb_task_name = 'billserve.tasks.populate_bill'
-        arb_signature = signature('billserve.tasks.add_related_bill', args=[current_bill_pk])
-        celery.current_app.send_task(pb_task_name, args=[related_bill_url], link=arb_signature)
+        crawls.add(crawl_id)
+        celery.current_app.send_task(pb_task_name, args=[related_bill_url],
+                                     kwargs={'crawl_id': crawl_id, 'related_bill_pk': current_bill_pk})
 
 
 class UpdateChain:
     @staticmethod
-    def execute(url):
+    def execute(urls):
+        """
+        Starts a single crawl over bill listings, which requests a debounced rebuild once every bill it found, and
+        every related bill those spidered out to, has been populated.
+        :param urls: The URLs of the listings to start our graph search at
+        :return: The id of the crawl
+        """
+        crawl_id = crawls.start(len(urls))
+        for url in urls:
+            update.delay(url, crawl_id=crawl_id)
+        return crawl_id
+
+
+class ResumeChain:
+    @staticmethod
+    def execute():
         """
-        Executes the asynchronous task chain we need to update the bill database and then rebuild support splits.
-        :param url: The URL to start our graph search at
+        Resumes the crawl frontier from its checkpoint after a crash, as a new crawl of every URL left unfinished.
+        :return: The id of the new crawl, and the number of URLs it has to populate
         """
-        update.apply_async((url,), link=rebuild.s())
+        from .models import CrawlFrontier
+
+        crawl_id = crawls.start(1)
+        count = CrawlFrontier.objects.resume(crawl_id)
+        crawls.start_draining(crawl_id)
+        drain_frontier.delay(crawl_id)
+        return crawl_id, count
@@ -0,0 +1,13 @@
+# The resources deletions are recorded for in the change feed, by model name
+DELETED_RESOURCES = {'Bill': 'bills', 'Cosponsorship': 'cosponsorships'}
+
+
+def record_deletion(sender, instance=None, **kwargs):
+    """
+    post_delete receiver that records deleted bills and cosponsorships in the change feed, wherever they're deleted
+    from.
+    """
+    from .enumerations import ChangeAction
+    from .models import ChangeEvent
+
+    ChangeEvent.objects.record(DELETED_RESOURCES[sender.__name__], ChangeAction.deleted, [instance.pk])
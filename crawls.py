@@ -0,0 +1,385 @@
+import datetime
+import hashlib
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CrawlTracker:
+    """
+    Tracks when a crawl has finished. A crawl is every update, drain_frontier, populate_bill and related bill task
+    started on behalf of a single update request, and its barrier is a counter of outstanding tasks in the cache.
+    Work is added to the counter before it is queued and taken off once it has run, whether or not it succeeded, so
+    the counter only reaches zero once nothing is left running or queued. That's when the crawl requests a rebuild.
+    Like the metrics, workers only share barriers through a shared cache backend, which also has to make incr and decr
+    atomic.
+    """
+    key_prefix = 'billserve:crawl:'
+
+    def __init__(self, scheduler):
+        """
+        :param scheduler: The RebuildScheduler finished crawls request rebuilds from
+        """
+        self.scheduler = scheduler
+
+    @staticmethod
+    def expiry():
+        return getattr(settings, 'BILLSERVE_CRAWL_EXPIRY', 24 * 60 * 60)
+
+    def pending_key(self, crawl_id):
+        return '{prefix}{crawl_id}:pending'.format(prefix=self.key_prefix, crawl_id=crawl_id)
+
+    def finished_key(self, crawl_id):
+        return '{prefix}{crawl_id}:finished'.format(prefix=self.key_prefix, crawl_id=crawl_id)
+
+    def draining_key(self, crawl_id):
+        return '{prefix}{crawl_id}:draining'.format(prefix=self.key_prefix, crawl_id=crawl_id)
+
+    def start(self, units):
+        """
+        Starts a crawl.
+        :param units: The number of tasks the crawl starts with, which are queued after this returns
+        :return: The crawl's id, to pass to each of its tasks
+        """
+        crawl_id = uuid.uuid4().hex
+        cache.set(self.pending_key(crawl_id), units, self.expiry())
+        return crawl_id
+
+    def add(self, crawl_id, units=1):
+        """
+        Adds work to a crawl. Call this before queueing the work, so the crawl can't finish in between.
+        :param crawl_id: The crawl's id, or None for work outside of any crawl
+        :param units: The number of tasks about to be queued
+        """
+        if crawl_id is None or not units:
+            return
+        try:
+            cache.incr(self.pending_key(crawl_id), units)
+        except ValueError:
+            logger.warning('Crawl %s expired before all of its work was queued', crawl_id)
+
+    def done(self, crawl_id, units=1):
+        """
+        Takes finished tasks off a crawl, finishing the crawl and requesting a rebuild if they were the last ones.
+        :param crawl_id: The crawl's id, or None for work outside of any crawl
+        :param units: The number of tasks that finished
+        :return: Whether this finished the crawl
+        """
+        if crawl_id is None or not units:
+            return False
+        try:
+            pending = cache.decr(self.pending_key(crawl_id), units)
+        except ValueError:
+            logger.warning('Crawl %s expired before all of its work finished', crawl_id)
+            return False
+        if pending > 0:
+            return False
+
+        cache.set(self.finished_key(crawl_id), time.time(), self.expiry())
+        logger.info('Crawl %s finished', crawl_id)
+        self.scheduler.request()
+        return True
+
+    def start_draining(self, crawl_id):
+        """
+        Claims the right to run the loop that drains a crawl's frontier, so only one runs at a time.
+        :param crawl_id: The crawl's id
+        :return: Whether the claim succeeded
+        """
+        return cache.add(self.draining_key(crawl_id), True, self.expiry())
+
+    def stop_draining(self, crawl_id):
+        cache.delete(self.draining_key(crawl_id))
+
+    def pending(self, crawl_id):
+        """
+        :param crawl_id: The crawl's id
+        :return: The number of the crawl's tasks still queued or running, or None if the crawl has expired
+        """
+        return cache.get(self.pending_key(crawl_id))
+
+    def finished_at(self, crawl_id):
+        """
+        :param crawl_id: The crawl's id
+        :return: When the crawl finished, as a Unix timestamp, or None if it hasn't
+        """
+        return cache.get(self.finished_key(crawl_id))
+
+
+class RebuildScheduler:
+    """
+    Debounces and serializes rebuilds. Requests only note the time they were made, and the first request in a window
+    queues the debounced_rebuild task. That task keeps waiting until BILLSERVE_REBUILD_DEBOUNCE seconds have passed
+    without another request, then rebuilds once for all of them. The rebuild itself holds a lock in the cache, so
+    two never run at once; a rebuild that finds the lock taken requests another instead, which runs after the first.
+    """
+    requested_key = 'billserve:rebuild:requested'
+    scheduled_key = 'billserve:rebuild:scheduled'
+    lock_key = 'billserve:rebuild:lock'
+    finished_key = 'billserve:rebuild:finished'
+
+    @staticmethod
+    def debounce():
+        return getattr(settings, 'BILLSERVE_REBUILD_DEBOUNCE', 30.0)
+
+    @staticmethod
+    def lock_timeout():
+        return getattr(settings, 'BILLSERVE_REBUILD_LOCK_TIMEOUT', 6 * 60 * 60)
+
+    def request(self):
+        """
+        Asks for a rebuild once requests have stopped for the debounce window.
+        :return: Whether this request queued the debounced rebuild, rather than joining one already queued
+        """
+        cache.set(self.requested_key, time.time(), None)
+        if not cache.add(self.scheduled_key, True, self.lock_timeout()):
+            return False
+        self.schedule(self.debounce())
+        return True
+
+    def schedule(self, countdown):
+        """
+        Queues the debounced rebuild task.
+        :param countdown: How long the task should wait before running, in seconds
+        """
+        from .tasks import debounced_rebuild
+
+        debounced_rebuild.apply_async(countdown=countdown)
+
+    def remaining(self):
+        """
+        :return: How many seconds are left until the debounce window since the last request closes
+        """
+        requested = cache.get(self.requested_key)
+        if requested is None:
+            return 0.0
+        return max(requested + self.debounce() - time.time(), 0.0)
+
+    def clear(self):
+        """
+        Lets the next request queue a new debounced rebuild. Called just before rebuilding, so requests made during
+        the rebuild get one of their own.
+        """
+        cache.delete(self.scheduled_key)
+
+    def acquire(self):
+        """
+        :return: A token for the rebuild lock, or None if another rebuild holds it
+        """
+        token = uuid.uuid4().hex
+        return token if cache.add(self.lock_key, token, self.lock_timeout()) else None
+
+    def release(self, token):
+        """
+        Releases the rebuild lock, unless it expired and another rebuild has taken it since.
+        :param token: The token acquire returned
+        """
+        if cache.get(self.lock_key) == token:
+            cache.delete(self.lock_key)
+        cache.set(self.finished_key, time.time(), None)
+
+    def finished_at(self):
+        """
+        :return: When the last rebuild finished, as a Unix timestamp, or None if none has
+        """
+        return cache.get(self.finished_key)
+
+
+class InFlightRegistry:
+    """
+    Collapses duplicate populate_bill work. Every bill in a family points at every other, so the related bill spider
+    queues the same URL many times over. The first task for a URL claims it with an atomic add in the cache, and
+    later tasks for it wait for and reuse that task's result instead of racing it to insert the bill. Results are
+    kept for BILLSERVE_INFLIGHT_TTL seconds, which also bounds how long a worker that died holds a claim.
+    """
+    key_prefix = 'billserve:inflight:'
+
+    @staticmethod
+    def ttl():
+        return getattr(settings, 'BILLSERVE_INFLIGHT_TTL', 10 * 60)
+
+    @staticmethod
+    def wait_timeout():
+        return getattr(settings, 'BILLSERVE_INFLIGHT_WAIT', 30.0)
+
+    @staticmethod
+    def poll_interval():
+        return getattr(settings, 'BILLSERVE_INFLIGHT_POLL_INTERVAL', 0.1)
+
+    def key(self, url):
+        return self.key_prefix + hashlib.sha1(url.encode()).hexdigest()
+
+    def result(self, url):
+        """
+        :param url: A bill URL
+        :return: The primary key of the bill at the URL, if a task populated it recently, else None
+        """
+        value = cache.get(self.key(url))
+        return value if isinstance(value, int) else None
+
+    def claim(self, url):
+        """
+        :param url: A bill URL
+        :return: A token for the claim on the URL, or None if another task holds it or already populated it
+        """
+        token = uuid.uuid4().hex
+        return token if cache.add(self.key(url), token, self.ttl()) else None
+
+    def resolve(self, url, bill_pk):
+        """
+        Publishes the result of populating a URL to every task waiting on it.
+        :param url: A bill URL
+        :param bill_pk: The primary key of the bill at the URL
+        """
+        cache.set(self.key(url), bill_pk, self.ttl())
+
+    def abandon(self, url, token):
+        """
+        Gives up a claim after failing to populate its URL, so the next task tries again.
+        :param url: A bill URL
+        :param token: The token claim returned
+        """
+        if cache.get(self.key(url)) == token:
+            cache.delete(self.key(url))
+
+    def wait(self, url):
+        """
+        Waits for the task holding the claim on a URL to populate it.
+        :param url: A bill URL
+        :return: The primary key of the bill, or None if the claim was abandoned
+        :raises TimeoutError: If the claim is still held after BILLSERVE_INFLIGHT_WAIT seconds
+        """
+        deadline = time.monotonic() + self.wait_timeout()
+        while time.monotonic() < deadline:
+            value = cache.get(self.key(url))
+            if value is None or isinstance(value, int):
+                return value
+            time.sleep(self.poll_interval())
+        raise TimeoutError('Gave up waiting on the task populating {url}'.format(url=url))
+
+    def run(self, url, populate):
+        """
+        Populates a URL, unless another task has already or is already doing so.
+        :param url: A bill URL
+        :param populate: A callable that gets or creates the bill at the URL and returns its primary key
+        :return: The primary key of the bill
+        """
+        bill_pk = self.result(url)
+        if bill_pk is not None:
+            metrics.increment('populate_duplicates_total', outcome='reused')
+            return bill_pk
+
+        # Only the task holding the claim populates the URL. If it gives up, the tasks waiting on it race to claim
+        # it again, and a stuck one makes them fail, so their URLs are retried later rather than populated twice.
+        token = self.claim(url)
+        while token is None:
+            bill_pk = self.wait(url)
+            if bill_pk is not None:
+                metrics.increment('populate_duplicates_total', outcome='waited')
+                return bill_pk
+            token = self.claim(url)
+
+        try:
+            bill_pk = populate()
+        except Exception:
+            self.abandon(url, token)
+            raise
+        self.resolve(url, bill_pk)
+        return bill_pk
+
+
+def current_congress(today=None):
+    """
+    :param today: The date to find the congress of, by default today
+    :return: The number of the congress in session on the date. Each congress starts on January 3rd of an odd year.
+    """
+    today = today or timezone.now().date()
+    if today.year % 2 == 0:
+        start = today.year - 1
+    else:
+        start = today.year if today >= datetime.date(today.year, 1, 3) else today.year - 2
+    return (start - 1789) // 2 + 1
+
+
+class CrawlScheduler:
+    """
+    Decides which bill status collections to crawl. It covers every collection in BILLSERVE_CRAWL_COLLECTIONS for
+    every congress from BILLSERVE_CRAWL_FIRST_CONGRESS up to BILLSERVE_CRAWL_LAST_CONGRESS, or the current congress.
+    The current congress is refreshed every BILLSERVE_CURRENT_CONGRESS_REFRESH seconds. Earlier congresses are
+    effectively frozen, so they're only refreshed every BILLSERVE_HISTORICAL_CONGRESS_REFRESH seconds. Every due
+    collection is crawled together as a single crawl.
+    """
+    @staticmethod
+    def congresses():
+        first = getattr(settings, 'BILLSERVE_CRAWL_FIRST_CONGRESS', 113)
+        last = getattr(settings, 'BILLSERVE_CRAWL_LAST_CONGRESS', None) or current_congress()
+        return range(first, last + 1)
+
+    @staticmethod
+    def collections():
+        from .networking.client import GovinfoClient
+
+        return getattr(settings, 'BILLSERVE_CRAWL_COLLECTIONS', GovinfoClient.collections)
+
+    @staticmethod
+    def refresh_interval(congress):
+        """
+        :param congress: A congress number
+        :return: How often the congress's collections are refreshed
+        """
+        if congress >= current_congress():
+            return datetime.timedelta(seconds=getattr(settings, 'BILLSERVE_CURRENT_CONGRESS_REFRESH', 6 * 60 * 60))
+        return datetime.timedelta(seconds=getattr(settings, 'BILLSERVE_HISTORICAL_CONGRESS_REFRESH',
+                                                  30 * 24 * 60 * 60))
+
+    def pairs(self):
+        """
+        :return: Every (congress, collection) pair covered, newest congresses first
+        """
+        return [(congress, collection) for congress in reversed(self.congresses()) for collection in self.collections()]
+
+    def due(self, now=None):
+        """
+        :param now: The time to check at, by default now
+        :return: The (congress, collection) pairs due a crawl, never crawled ones and the newest congresses first
+        """
+        from .models import CollectionCrawl
+
+        now = now or timezone.now()
+        pairs = self.pairs()
+        crawled = CollectionCrawl.objects.crawled(pairs)
+        due = [pair for pair in pairs if pair not in crawled or now - crawled[pair] >= self.refresh_interval(pair[0])]
+        return sorted(due, key=lambda pair: pair in crawled)
+
+    def run(self, force=False):
+        """
+        Starts a crawl of every collection that's due.
+        :param force: Whether to crawl every collection, due or not
+        :return: The id of the crawl, or None if nothing was due
+        """
+        from .chains import UpdateChain
+        from .models import CollectionCrawl
+        from .networking.client import GovinfoClient
+
+        pairs = self.pairs() if force else self.due()
+        if not pairs:
+            return None
+        crawl_id = UpdateChain.execute([GovinfoClient.create_listing_url(congress, collection)
+                                        for congress, collection in pairs])
+        CollectionCrawl.objects.record(pairs, crawl_id)
+        logger.info('Crawl %s started on %d collections', crawl_id, len(pairs))
+        return crawl_id
+
+
+rebuilds = RebuildScheduler()
+crawls = CrawlTracker(rebuilds)
+inflight = InFlightRegistry()
+scheduler = CrawlScheduler()
@@ -0,0 +1,49 @@
+from django.http import HttpRequest
+from django.urls import get_script_prefix, set_script_prefix
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+# Stored documents are rendered against this origin and script prefix. The .invalid top level domain is reserved, so
+# the string can't appear in real bill data.
+SENTINEL_ORIGIN = 'http://billserve.invalid/'
+
+
+class DocumentRequest(HttpRequest):
+    """
+    A request that stands in for every real one while bill documents are rendered. Its host skips the ALLOWED_HOSTS
+    check, since the sentinel host is never served.
+    """
+    def get_host(self):
+        return 'billserve.invalid'
+
+    def _get_scheme(self):
+        return 'http'
+
+
+def render(bills):
+    """
+    Renders the detail payloads of many bills against the sentinel origin.
+    :param bills: Bills from BillManager.detailed()
+    :return: A list of (bill primary key, JSON text) tuples
+    """
+    from .serializers import BillSerializer
+
+    request = Request(DocumentRequest())
+    script_prefix = get_script_prefix()
+    set_script_prefix('/')
+    try:
+        renderer = JSONRenderer()
+        return [(bill.pk, renderer.render(BillSerializer(bill, context={'request': request}).data).decode())
+                for bill in bills]
+    finally:
+        set_script_prefix(script_prefix)
+
+
+def localize(payload, request):
+    """
+    Points the hyperlinks in a stored document at the origin and script prefix of a real request.
+    :param payload: The stored JSON text
+    :param request: The request being served
+    :return: The JSON text as the live serializer would have rendered it for the request
+    """
+    return payload.replace(SENTINEL_ORIGIN, request.build_absolute_uri(get_script_prefix()))
@@ -5,3 +5,34 @@ class LegislativeSubjectActivityType(Enum):
     sponsorship = 1
     cosponsorship = 2
 
+
+class LegislatorType(Enum):
+    senator = 1
+    representative = 2
+
+
+class RollupDimension(Enum):
+    total = 0
+    legislative_subject = 1
+    policy_area = 2
+
+
+class FrontierStatus(Enum):
+    pending = 0
+    queued = 1
+    done = 2
+    failed = 3
+
+
+class FrontierPriority(Enum):
+    # Drained lowest first
+    new = 0
+    refresh = 1
+
+
+class ChangeAction(Enum):
+    created = 1
+    updated = 2
+    deleted = 3
+    # Every row of the resource may have changed, so clients should sync all of it again
+    rebuilt = 4
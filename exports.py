@@ -0,0 +1,94 @@
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+class Echo:
+    """
+    A file-like object that hands back whatever is written to it, so csv.writer can format one row at a time.
+    """
+    def write(self, value):
+        return value
+
+
+class Export:
+    """
+    A table that can be streamed out in full. Rows are read with a server-side cursor in chunks, so memory use stays
+    constant however large the table is.
+    """
+    chunk_size = 2000
+
+    def __init__(self, queryset, fields, updated_field):
+        """
+        Initializes an export.
+        :param queryset: A callable returning the queryset to export
+        :param fields: The fields to export, in column order
+        :param updated_field: The timestamp field used to filter for rows changed since a given time
+        """
+        self.queryset = queryset
+        self.fields = fields
+        self.updated_field = updated_field
+
+    def rows(self, updated_since=None):
+        """
+        :param updated_since: If given, only rows changed after this datetime are exported
+        :return: An iterator over tuples of the export's fields
+        """
+        queryset = self.queryset()
+        if updated_since is not None:
+            queryset = queryset.filter(**{'{field}__gt'.format(field=self.updated_field): updated_since})
+        return queryset.order_by('pk').values_list(*self.fields).iterator(chunk_size=self.chunk_size)
+
+    def ndjson(self, updated_since=None):
+        """
+        :param updated_since: If given, only rows changed after this datetime are exported
+        :return: A generator of newline delimited JSON objects, one per row
+        """
+        encoder = DjangoJSONEncoder()
+        for row in self.rows(updated_since):
+            yield encoder.encode(dict(zip(self.fields, row))) + '\n'
+
+    def csv(self, updated_since=None):
+        """
+        :param updated_since: If given, only rows changed after this datetime are exported
+        :return: A generator of CSV lines, starting with a header
+        """
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.fields)
+        for row in self.rows(updated_since):
+            yield writer.writerow(row)
+
+
+def bills():
+    from .models import Bill
+    return Bill.objects.all()
+
+
+def cosponsorships():
+    from .models import Cosponsorship
+    return Cosponsorship.objects.all()
+
+
+def sponsorships():
+    from .models import Bill
+    return Bill.sponsors.through.objects.all()
+
+
+def support_splits():
+    from .models import LegislativeSubjectSupportSplit
+    return LegislativeSubjectSupportSplit.objects.all()
+
+
+exports = {
+    'bills': Export(bills, ('id', 'type', 'bill_number', 'congress', 'title', 'introduction_date', 'policy_area_id',
+                            'originating_body_id', 'cbo_cost_estimate', 'bill_url', 'num_sponsors', 'num_cosponsors',
+                            'bipartisanship_score', 'family_id', 'last_modified'),
+                    'last_modified'),
+    'cosponsorships': Export(cosponsorships, ('id', 'bill_id', 'legislator_id', 'is_original_cosponsor',
+                                              'cosponsorship_date'),
+                             'bill__last_modified'),
+    'sponsorships': Export(sponsorships, ('id', 'bill_id', 'legislator_id'), 'bill__last_modified'),
+    'support-splits': Export(support_splits, ('id', 'legislative_subject_id', 'red_count', 'blue_count',
+                                              'white_count', 'last_modified'),
+                             'last_modified'),
+}
@@ -0,0 +1,338 @@
+"""
+Generates a synthetic congress: BILLSTATUS XML files laid out like govinfo's bulk data, and a matching database fixture.
+
+    python generate_congress.py --legislators 535 --bills 10000 --output /tmp/congress
+
+writes /tmp/congress/bulkdata/BILLSTATUS/115/{s,hr}/BILLSTATUS-115{s,hr}<number>.xml, for ingest benchmarks or for
+serving as a stand-in for govinfo, and /tmp/congress/congress-115.json, which loads the same data into an empty
+database next to the parties.json, states.json and chambers.json fixtures.
+"""
+import argparse
+import datetime
+import json
+import os
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+FIXTURES = os.path.dirname(os.path.abspath(__file__))
+BILL_URL = 'https://www.govinfo.gov/bulkdata/BILLSTATUS/{congress}/{type}/BILLSTATUS-{congress}{type}{number}.xml'
+
+POLICY_AREAS = ['Education', 'Agriculture and Food', 'Armed Forces and National Security', 'Commerce',
+                'Crime and Law Enforcement', 'Economics and Public Finance', 'Energy', 'Environmental Protection',
+                'Finance and Financial Sector', 'Foreign Trade and International Finance', 'Government Operations and '
+                'Politics', 'Health', 'Housing and Community Development', 'Immigration', 'International Affairs',
+                'Labor and Employment', 'Native Americans', 'Public Lands and Natural Resources', 'Science, '
+                'Technology, Communications', 'Social Welfare', 'Taxation', 'Transportation and Public Works',
+                'Water Resources Development', 'Congress', 'Law', 'Families', 'Emergency Management',
+                'Civil Rights and Liberties, Minority Issues', 'Arts, Culture, Religion', 'Sports and Recreation',
+                'Animals', 'Social Sciences and History']
+SUBJECT_WORDS = ['Academic', 'Administrative', 'Agricultural', 'Air', 'Alternative', 'Border', 'Budget', 'Child',
+                 'Civil', 'Coastal', 'Community', 'Consumer', 'Criminal', 'Digital', 'Disaster', 'Drug', 'Elementary',
+                 'Employee', 'Energy', 'Federal', 'Financial', 'Forest', 'Health', 'Higher', 'Housing', 'Indian',
+                 'Infrastructure', 'Insurance', 'Judicial', 'Land', 'Marine', 'Medical', 'Military', 'Public',
+                 'Rural', 'Small', 'Student', 'Tax', 'Trade', 'Transportation', 'Urban', 'Veterans', 'Water']
+SUBJECT_NOUNS = ['access', 'administration', 'assistance', 'benefits', 'compliance', 'costs', 'development',
+                 'education', 'employment', 'facilities', 'funding', 'grants', 'infrastructure', 'liability',
+                 'oversight', 'planning', 'programs', 'protection', 'research', 'safety', 'services', 'standards']
+FIRST_NAMES = ['Alan', 'Amy', 'Ben', 'Carol', 'David', 'Debra', 'Edward', 'Elaine', 'Frank', 'Grace', 'Henry', 'Irene',
+               'James', 'Joan', 'Kevin', 'Linda', 'Mark', 'Maria', 'Nancy', 'Orrin', 'Patty', 'Paul', 'Rosa', 'Ruth',
+               'Steve', 'Susan', 'Thomas', 'Tina', 'Walter', 'Zoe']
+SYLLABLES = ['al', 'bar', 'ben', 'bro', 'car', 'dal', 'den', 'fer', 'gar', 'har', 'kel', 'lan', 'mar', 'mor', 'nel',
+             'par', 'ren', 'ros', 'sel', 'ton', 'val', 'wick', 'ley', 'son', 'ford', 'man', 'ing', 'ham']
+TITLE_WORDS = ['Accountability', 'Modernization', 'Protection', 'Relief', 'Fairness', 'Improvement', 'Access',
+               'Transparency', 'Security', 'Opportunity', 'Reform', 'Investment', 'Recovery', 'Innovation']
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name)) as fixture:
+        return json.load(fixture)
+
+
+def names(rng, count):
+    """
+    :return: count distinct (first name, last name) pairs, capitalized the way ingest stores them
+    """
+    seen, result = set(), []
+    while len(result) < count:
+        last_name = ''.join(rng.choice(SYLLABLES, size=rng.integers(2, 4))).capitalize()
+        first_name = str(rng.choice(FIRST_NAMES))
+        if (first_name, last_name) not in seen:
+            seen.add((first_name, last_name))
+            result.append((first_name, last_name))
+    return result
+
+
+class Congress:
+    """
+    A synthetic congress, generated in memory by __init__ and then written out by write_xml and write_fixture.
+    """
+    def __init__(self, congress=115, legislators=535, bills=2000, senate_share=0.3, cosponsor_mean=6.0,
+                 cosponsor_dispersion=0.5, party_loyalty=0.8, subjects=800, subjects_per_bill=4.0,
+                 related_density=0.15, seed=0):
+        """
+        :param congress: The congress number, which also fixes the dates bills are introduced on
+        :param legislators: The number of legislators, split between the chambers in the real proportion
+        :param bills: The number of bills
+        :param senate_share: The share of bills introduced in the Senate
+        :param cosponsor_mean: The mean number of cosponsors per bill
+        :param cosponsor_dispersion: The negative binomial dispersion of cosponsor counts. Smaller values give a
+        heavier tail: many bills with none and a few with hundreds.
+        :param party_loyalty: The chance that each cosponsor shares the sponsor's party
+        :param subjects: The number of legislative subjects, at most 946
+        :param subjects_per_bill: The mean number of subjects per bill. Subject popularity follows Zipf's law.
+        :param related_density: The chance that a bill has related bills
+        :param seed: The random seed
+        """
+        rng = np.random.default_rng(seed)
+        self.congress = congress
+        self.start = datetime.date(1789 + 2 * (congress - 1), 1, 3)
+
+        parties = {party['fields']['abbreviation']: party['pk'] for party in load_fixture('parties.json')}
+        states = [(state['fields']['abbreviation'], int(state['pk'])) for state in load_fixture('states.json')][:50]
+        chambers = {chamber['fields']['name']: chamber['pk'] for chamber in load_fixture('chambers.json')}
+
+        self.policy_areas = POLICY_AREAS
+        words = [(first, noun) for first in SUBJECT_WORDS for noun in SUBJECT_NOUNS]
+        self.subjects = ['{first} {noun}'.format(first=first, noun=noun)
+                         for first, noun in (words[index] for index in rng.permutation(len(words))[:subjects])]
+        self.committees = [
+            ('{area} Committee'.format(area=area), chamber, '{c}s{code:02d}00'.format(c=chamber[0].lower(), code=index))
+            for chamber in ('Senate', 'House') for index, area in enumerate(POLICY_AREAS[:20])]
+
+        # Legislators: two senators per state, then representatives spread over the states' districts
+        senators = min(round(legislators * 100 / 535), 2 * len(states))
+        party_choices = rng.choice(['D', 'R', 'I'], size=legislators, p=[0.49, 0.49, 0.02])
+        self.districts, self.legislators = [], []
+        for index, (first_name, last_name) in enumerate(names(rng, legislators)):
+            state, state_pk = states[index % len(states)] if index < senators else \
+                states[(index - senators) % len(states)]
+            legislator = {'pk': index + 1, 'first_name': first_name, 'last_name': last_name, 'state': state,
+                          'state_pk': state_pk, 'party': str(party_choices[index]),
+                          'party_pk': parties[str(party_choices[index])], 'district': None, 'district_pk': None}
+            if index < senators:
+                legislator.update(chamber='Senate', chamber_pk=chambers['Senate'])
+            else:
+                number = (index - senators) // len(states) + 1
+                self.districts.append((state_pk, number))
+                legislator.update(chamber='House', chamber_pk=chambers['House'], district=number,
+                                  district_pk=len(self.districts))
+            self.legislators.append(legislator)
+        by_chamber = {chamber: [legislator for legislator in self.legislators if legislator['chamber'] == chamber]
+                      for chamber in ('Senate', 'House')}
+        # Some legislators sponsor far more bills than others
+        activity = rng.pareto(1.5, size=legislators) + 1
+
+        subject_weights = 1 / np.arange(1, len(self.subjects) + 1)
+        subject_weights /= subject_weights.sum()
+        days = (datetime.date(self.start.year + 2, 1, 3) - self.start).days
+
+        self.bills = []
+        numbers = {'s': 0, 'hr': 0}
+        for index in range(bills):
+            chamber = 'Senate' if rng.random() < senate_share and by_chamber['Senate'] else 'House'
+            if not by_chamber[chamber]:
+                chamber = 'Senate'
+            members = by_chamber[chamber]
+            bill_type = 's' if chamber == 'Senate' else 'hr'
+            numbers[bill_type] += 1
+
+            weights = np.array([activity[member['pk'] - 1] for member in members])
+            sponsor = members[rng.choice(len(members), p=weights / weights.sum())]
+            introduced = self.start + datetime.timedelta(days=int(rng.integers(days)))
+
+            count = int(rng.negative_binomial(cosponsor_dispersion,
+                                              cosponsor_dispersion / (cosponsor_dispersion + cosponsor_mean)))
+            same_party = [member for member in members if member['party'] == sponsor['party'] and member != sponsor]
+            other_party = [member for member in members if member['party'] != sponsor['party']]
+            cosponsors = []
+            for pool, share in ((same_party, party_loyalty), (other_party, 1 - party_loyalty)):
+                wanted = min(int(rng.binomial(count, share)), len(pool))
+                for position in rng.choice(len(pool), size=wanted, replace=False):
+                    original = rng.random() < 0.5
+                    date = introduced if original else introduced + datetime.timedelta(days=int(rng.integers(1, 90)))
+                    cosponsors.append((pool[position], original, date))
+
+            subject_count = min(int(rng.poisson(subjects_per_bill)), len(self.subjects))
+            self.bills.append({
+                'pk': index + 1, 'type': bill_type, 'number': numbers[bill_type], 'chamber': chamber,
+                'chamber_pk': chambers[chamber], 'sponsor': sponsor, 'introduced': introduced,
+                'title': '{area} {word} Act of {year}'.format(
+                    area=POLICY_AREAS[int(rng.integers(len(POLICY_AREAS)))].split(',')[0],
+                    word=TITLE_WORDS[int(rng.integers(len(TITLE_WORDS)))], year=introduced.year),
+                'policy_area': int(rng.integers(len(POLICY_AREAS))), 'cosponsors': cosponsors,
+                'subjects': sorted(rng.choice(len(self.subjects), size=subject_count, replace=False,
+                                              p=subject_weights).tolist()),
+                'committee': int(rng.integers(20)) + (0 if chamber == 'Senate' else 20), 'related': set(),
+            })
+
+        # Related bills: mostly a companion bill from the other chamber, sometimes a nearby bill from the same one
+        for bill in self.bills:
+            if rng.random() >= related_density:
+                continue
+            for _ in range(int(rng.integers(1, 4))):
+                other = self.bills[int(rng.integers(len(self.bills)))]
+                if other is not bill:
+                    bill['related'].add(other['pk'])
+                    other['related'].add(bill['pk'])
+
+    def url(self, bill):
+        return BILL_URL.format(congress=self.congress, type=bill['type'], number=bill['number'])
+
+    def path(self, output, bill):
+        return os.path.join(output, 'bulkdata', 'BILLSTATUS', str(self.congress), bill['type'],
+                            'BILLSTATUS-{congress}{type}{number}.xml'.format(
+                                congress=self.congress, type=bill['type'], number=bill['number']))
+
+    @staticmethod
+    def element(name, value):
+        if value is None:
+            return '<{name} />'.format(name=name)
+        return '<{name}>{value}</{name}>'.format(name=name, value=escape(str(value)))
+
+    def member_xml(self, legislator, extra=''):
+        return ('<item><firstName>{first}</firstName><lastName>{last}</lastName><state>{state}</state>'
+                '<party>{party}</party>{district}{extra}</item>').format(
+            first=escape(legislator['first_name'].upper()), last=escape(legislator['last_name'].upper()),
+            state=legislator['state'], party=legislator['party'],
+            district=self.element('district', legislator['district']), extra=extra)
+
+    def bill_xml(self, bill):
+        name, chamber, system_code = self.committees[bill['committee']]
+        introduced = bill['introduced'].isoformat()
+        cosponsors = ''.join(self.member_xml(legislator, '<isOriginalCosponsor>{original}</isOriginalCosponsor>'
+                                                         '<sponsorshipDate>{date}</sponsorshipDate>'.format(
+                                                             original=original, date=date.isoformat()))
+                             for legislator, original, date in bill['cosponsors'])
+        subjects = ''.join('<item><name>{name}</name></item>'.format(name=escape(self.subjects[subject]))
+                           for subject in bill['subjects'])
+        related = ''.join('<item><type>{type}</type><congress>{congress}</congress><number>{number}</number></item>'
+                          .format(type=self.bills[pk - 1]['type'].upper(), congress=self.congress,
+                                  number=self.bills[pk - 1]['number'])
+                          for pk in sorted(bill['related']))
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?><billStatus><bill>'
+            '<billType>{type}</billType><billNumber>{number}</billNumber><congress>{congress}</congress>'
+            '<originChamber>{chamber}</originChamber><introducedDate>{introduced}</introducedDate>'
+            '<title>{title}</title><policyArea><name>{policy_area}</name></policyArea>'
+            '<sponsors>{sponsor}</sponsors><cosponsors>{cosponsors}</cosponsors>'
+            '<subjects><billSubjects><legislativeSubjects>{subjects}</legislativeSubjects></billSubjects></subjects>'
+            '<committees><billCommittees><item><type>Standing</type><systemCode>{system_code}</systemCode>'
+            '<chamber>{committee_chamber}</chamber><name>{committee}</name></item></billCommittees></committees>'
+            '<actions><item><actionDate>{introduced}</actionDate><text>Introduced in {chamber}</text>'
+            '<type>IntroReferral</type></item></actions>'
+            '<summaries><billSummaries><item><name>Introduced in {chamber}</name><actionDate>{introduced}'
+            '</actionDate><actionDesc>Introduced in {chamber}</actionDesc><text>{title}</text></item>'
+            '</billSummaries></summaries>'
+            '<relatedBills>{related}</relatedBills>'
+            '</bill></billStatus>').format(
+            type=bill['type'].upper(), number=bill['number'], congress=self.congress, chamber=bill['chamber'],
+            introduced=introduced, title=escape(bill['title']), policy_area=escape(POLICY_AREAS[bill['policy_area']]),
+            sponsor=self.member_xml(bill['sponsor']), cosponsors=cosponsors, subjects=subjects,
+            system_code=system_code, committee_chamber=chamber, committee=escape(name), related=related)
+
+    def write_xml(self, output):
+        """
+        Writes one BILLSTATUS file per bill under output/bulkdata.
+        :param output: The output directory
+        :return: The number of files written
+        """
+        for bill in self.bills:
+            path = self.path(output, bill)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as xml:
+                xml.write(self.bill_xml(bill))
+        return len(self.bills)
+
+    def fixture(self):
+        """
+        :return: The congress as a list of fixture objects, as ingest would have stored it
+        """
+        now = '{date}T00:00:00Z'.format(date=datetime.date(self.start.year + 2, 1, 3).isoformat())
+        objects = [{'model': 'billserve.policyarea', 'pk': pk, 'fields': {'name': name}}
+                   for pk, name in enumerate(self.policy_areas, 1)]
+        objects += [{'model': 'billserve.legislativesubject', 'pk': pk, 'fields': {'name': name, 'last_modified': now}}
+                    for pk, name in enumerate(self.subjects, 1)]
+        objects += [{'model': 'billserve.committee', 'pk': pk,
+                     'fields': {'name': name, 'type': 'Standing', 'system_code': system_code,
+                                'chamber': 1 if chamber == 'Senate' else 2}}
+                    for pk, (name, chamber, system_code) in enumerate(self.committees, 1)]
+        objects += [{'model': 'billserve.district', 'pk': pk, 'fields': {'number': number, 'state': state_pk}}
+                    for pk, (state_pk, number) in enumerate(self.districts, 1)]
+
+        for legislator in self.legislators:
+            senator = legislator['chamber'] == 'Senate'
+            objects.append({'model': 'billserve.legislator', 'pk': legislator['pk'], 'fields': {
+                'polymorphic_ctype': ['billserve', 'senator' if senator else 'representative'],
+                'first_name': legislator['first_name'], 'last_name': legislator['last_name'], 'last_modified': now,
+                'legislator_type': 1 if senator else 2, 'legislator_party': legislator['party_pk'],
+                'legislator_state': legislator['state_pk'], 'legislator_chamber': legislator['chamber_pk'],
+                'legislator_district': legislator['district_pk']}})
+            fields = {'party': legislator['party_pk'], 'state': legislator['state_pk'],
+                      'legislative_body': legislator['chamber_pk']}
+            if not senator:
+                fields['district'] = legislator['district_pk']
+            objects.append({'model': 'billserve.senator' if senator else 'billserve.representative',
+                            'pk': legislator['pk'], 'fields': fields})
+
+        cosponsorships, summaries = [], []
+        for bill in self.bills:
+            objects.append({'model': 'billserve.bill', 'pk': bill['pk'], 'fields': {
+                'bill_url': self.url(bill), 'title': bill['title'], 'introduction_date': bill['introduced'].isoformat(),
+                'last_modified': now, 'bill_number': bill['number'], 'congress': self.congress,
+                'type': bill['type'].upper(), 'originating_body': bill['chamber_pk'],
+                'policy_area': bill['policy_area'] + 1, 'num_sponsors': 1, 'num_cosponsors': len(bill['cosponsors']),
+                'sponsors': [bill['sponsor']['pk']],
+                'legislative_subjects': [subject + 1 for subject in bill['subjects']],
+                'related_bills': sorted(bill['related']), 'committees': [bill['committee'] + 1]}})
+            for legislator, original, date in bill['cosponsors']:
+                cosponsorships.append({'model': 'billserve.cosponsorship', 'pk': len(cosponsorships) + 1, 'fields': {
+                    'legislator': legislator['pk'], 'bill': bill['pk'], 'is_original_cosponsor': bool(original),
+                    'cosponsorship_date': date.isoformat()}})
+            summaries.append({'model': 'billserve.billsummary', 'pk': bill['pk'], 'fields': {
+                'name': 'Introduced in {chamber}'.format(chamber=bill['chamber']), 'text': bill['title'],
+                'action_description': 'Introduced in {chamber}'.format(chamber=bill['chamber']),
+                'action_date': bill['introduced'].isoformat(), 'bill': bill['pk']}})
+        return objects + cosponsorships + summaries
+
+    def write_fixture(self, output):
+        """
+        Writes the fixture to output/congress-<congress>.json.
+        :param output: The output directory
+        :return: The path of the fixture
+        """
+        os.makedirs(output, exist_ok=True)
+        path = os.path.join(output, 'congress-{congress}.json'.format(congress=self.congress))
+        with open(path, 'w') as fixture:
+            json.dump(self.fixture(), fixture)
+        return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generates a synthetic congress as BILLSTATUS XML and a fixture.')
+    parser.add_argument('--output', required=True, help='The directory to write to.')
+    parser.add_argument('--congress', type=int, default=115)
+    parser.add_argument('--legislators', type=int, default=535)
+    parser.add_argument('--bills', type=int, default=2000)
+    parser.add_argument('--senate-share', type=float, default=0.3)
+    parser.add_argument('--cosponsor-mean', type=float, default=6.0)
+    parser.add_argument('--cosponsor-dispersion', type=float, default=0.5)
+    parser.add_argument('--party-loyalty', type=float, default=0.8)
+    parser.add_argument('--subjects', type=int, default=800)
+    parser.add_argument('--subjects-per-bill', type=float, default=4.0)
+    parser.add_argument('--related-density', type=float, default=0.15)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-xml', action='store_true', help='Only write the fixture.')
+    parser.add_argument('--no-fixture', action='store_true', help='Only write the XML files.')
+    options = vars(parser.parse_args())
+
+    output, no_xml, no_fixture = options.pop('output'), options.pop('no_xml'), options.pop('no_fixture')
+    congress = Congress(**options)
+    if not no_xml:
+        print('Wrote {n} BILLSTATUS files'.format(n=congress.write_xml(output)))
+    if not no_fixture:
+        print('Wrote {path}'.format(path=congress.write_fixture(output)))
+
+
+if __name__ == '__main__':
+    main()
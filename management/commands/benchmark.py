@@ -0,0 +1,165 @@
+import datetime
+import json
+import os
+import re
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from billserve.models import Bill, Cosponsorship, Legislator, LegislativeSubject, PolicyArea, Representative, Senator
+from billserve.networking.client import GovinfoClient
+from billserve.tasks import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks ingest throughput from local BILLSTATUS XML, the rebuild task, and the latency of each ' \
+           'endpoint, and saves the results as JSON. Run it against a scratch database: ingest adds every bill it ' \
+           'reads, e.g. from fixtures/generate_congress.py.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--xml-dir', help='A directory of BILLSTATUS XML files to ingest first.')
+        parser.add_argument('--skip-rebuild', action='store_true', help="Don't time the rebuild task.")
+        parser.add_argument('--requests', type=int, default=50, help='Requests to time for each endpoint.')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for picking the objects requested.')
+        parser.add_argument('--output', help='The file to save results to, instead of printing them.')
+        parser.add_argument('--compare', help='Results from an earlier run to compare against.')
+
+    def handle(self, *args, **options):
+        results = {'started': datetime.datetime.utcnow().isoformat() + 'Z', 'database': connection.vendor}
+        if options['xml_dir']:
+            results['ingest'] = self.ingest(options['xml_dir'])
+        if not options['skip_rebuild']:
+            started = time.perf_counter()
+            rebuild()
+            results['rebuild'] = {'seconds': time.perf_counter() - started}
+        results['counts'] = {'bills': Bill.objects.count(), 'legislators': Legislator.objects.count(),
+                             'cosponsorships': Cosponsorship.objects.count(),
+                             'legislative_subjects': LegislativeSubject.objects.count()}
+        results['endpoints'] = self.endpoints(options['requests'], np.random.default_rng(options['seed']))
+
+        text = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(text)
+        else:
+            self.stdout.write(text)
+        if options['compare']:
+            with open(options['compare']) as earlier:
+                self.compare(json.load(earlier), results)
+
+    @staticmethod
+    def files(directory):
+        for path, _, names in sorted(os.walk(directory)):
+            for name in sorted(names):
+                if re.match(r'BILLSTATUS-.*\.xml$', name):
+                    yield os.path.join(path, name)
+
+    def ingest(self, directory):
+        """
+        Ingests every BILLSTATUS file under a directory through the same parse, clean and store steps as
+        GovinfoClient.create_bill_from_url. Related bills are linked in process once every bill is stored, instead of
+        through Celery, so no broker or network is needed. Bills that already exist are skipped.
+        :param directory: The directory to search
+        :return: A dictionary of timings
+        """
+        existing = set(Bill.objects.values_list('bill_url', flat=True))
+        related, count = [], 0
+        started = time.perf_counter()
+        for path in self.files(directory):
+            with open(path, 'rb') as xml:
+                data = GovinfoClient.parse_bill(xml.read(), path)
+            data['url'] = GovinfoClient.create_bill_url(data['congress'], data['billType'], data['billNumber'])
+            if data['url'] in existing:
+                continue
+            key = (int(data['congress']), data['billType'], int(data['billNumber']))
+            related.extend((key, (int(item['congress']), item['type'], int(item['number'])))
+                           for item in data['relatedBills'] or [])
+            data['relatedBills'] = None
+            Bill.objects.create_from_dict(data)
+            count += 1
+        stored = time.perf_counter()
+
+        pks = {(congress, bill_type, number): pk for pk, congress, bill_type, number in
+               Bill.objects.values_list('pk', 'congress', 'type', 'bill_number')}
+        pairs = {tuple(sorted((pks[key], pks[other]))) for key, other in related if key in pks and other in pks}
+        for bill_pk, related_bill_pk in sorted(pairs):
+            Bill.objects.add_related_bill(bill_pk, related_bill_pk)
+        finished = time.perf_counter()
+
+        return {'bills': count, 'related_pairs': len(pairs), 'store_seconds': stored - started,
+                'link_seconds': finished - stored, 'bills_per_second': count / (finished - started) if count else None}
+
+    @staticmethod
+    def samples(queryset, count, rng):
+        pks = list(queryset.values_list('pk', flat=True)[:1000])
+        return [int(pk) for pk in rng.choice(pks, size=count)] if pks else []
+
+    def endpoints(self, count, rng):
+        """
+        Times requests to each endpoint through the Django test client, spreading detail requests over randomly
+        chosen objects.
+        :param count: The number of requests per endpoint
+        :param rng: A numpy random generator
+        :return: A dictionary mapping endpoint names to latency percentiles in milliseconds
+        """
+        bills = self.samples(Bill.objects.all(), count, rng)
+        senators = self.samples(Senator.objects.non_polymorphic(), count, rng)
+        representatives = self.samples(Representative.objects.non_polymorphic(), count, rng)
+        legislators = self.samples(Legislator.objects.non_polymorphic(), count, rng)
+        subjects = self.samples(LegislativeSubject.objects.annotate(n=Count('bills')).order_by('-n'), count, rng)
+        policy_areas = self.samples(PolicyArea.objects.all(), count, rng)
+        endpoints = {
+            'bill-list': [reverse('bill-list')] * count,
+            'legislator-list': [reverse('legislator-list')] * count,
+            'representative-list': [reverse('representative-list')] * count,
+            'bill-detail': [reverse('bill-detail', kwargs={'pk': pk}) for pk in bills],
+            'bill-family': [reverse('bill-family', kwargs={'pk': pk}) for pk in bills],
+            'senator-detail': [reverse('senator-detail', kwargs={'pk': pk}) for pk in senators],
+            'representative-detail': [reverse('representative-detail', kwargs={'pk': pk}) for pk in representatives],
+            'legislator-collaborators': [reverse('legislator-collaborators', kwargs={'pk': pk}) for pk in legislators],
+            'legislator-votes': [reverse('legislator-votes', kwargs={'pk': pk}) for pk in legislators],
+            'legislativesubject-detail': [reverse('legislativesubject-detail', kwargs={'pk': pk}) for pk in subjects],
+            'policyarea-detail': [reverse('policyarea-detail', kwargs={'pk': pk}) for pk in policy_areas],
+            'activity': [reverse('activity')] * count,
+        }
+
+        client, results = Client(), {}
+        # The test client's host has to pass ALLOWED_HOSTS
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for name, urls in endpoints.items():
+                latencies, statuses = [], {}
+                for url in urls:
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if latencies:
+                    results[name] = {'requests': len(latencies), 'statuses': statuses,
+                                     'mean_ms': float(np.mean(latencies)),
+                                     'p50_ms': float(np.percentile(latencies, 50)),
+                                     'p99_ms': float(np.percentile(latencies, 99))}
+        return results
+
+    def compare(self, earlier, later):
+        """
+        Prints how each measurement changed since an earlier run, as later / earlier.
+        """
+        rows = []
+        for section, key in (('ingest', 'bills_per_second'), ('rebuild', 'seconds')):
+            before, after = (earlier.get(section) or {}).get(key), (later.get(section) or {}).get(key)
+            if before and after:
+                rows.append(('{section} {key}'.format(section=section, key=key), before, after))
+        for name, result in later['endpoints'].items():
+            for key in ('p50_ms', 'p99_ms'):
+                before = earlier.get('endpoints', {}).get(name, {}).get(key)
+                if before:
+                    rows.append(('{name} {key}'.format(name=name, key=key), before, result[key]))
+        for name, before, after in rows:
+            self.stdout.write('{name:45} {before:12.3f} {after:12.3f} {ratio:6.2f}x'.format(
+                name=name, before=before, after=after, ratio=after / before))
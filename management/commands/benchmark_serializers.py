@@ -0,0 +1,46 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from billserve.models import Bill, Representative
+from billserve.serializers import BillShortSerializer, BillShortRowSerializer, RepresentativeShortSerializer, \
+    RepresentativeShortRowSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compares the throughput of the hyperlinked and row based serializers behind BillList and ' \
+           'RepresentativeList over the current database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=25, help='Objects per serialization, i.e. the page size.')
+        parser.add_argument('--repeat', type=int, default=20, help='Serializations to time for each path.')
+
+    def handle(self, *args, **options):
+        request = Request(APIRequestFactory().get('/'))
+        limit, repeat = options['limit'], options['repeat']
+
+        for name, queryset, serializer_class, row_serializer_class in (
+                ('BillList', Bill.objects.order_by('pk'), BillShortSerializer, BillShortRowSerializer),
+                ('RepresentativeList', Representative.objects.order_by('pk'), RepresentativeShortSerializer,
+                 RepresentativeShortRowSerializer)):
+
+            def hyperlinked():
+                return serializer_class(queryset[:limit], many=True, context={'request': request}).data
+
+            def rows():
+                row_serializer = row_serializer_class(request)
+                return row_serializer.many(row_serializer.rows(queryset)[:limit])
+
+            count = len(rows())
+            if not count:
+                self.stdout.write('{name}: no rows to serialize'.format(name=name))
+                continue
+
+            hyperlinked_seconds = timeit.timeit(hyperlinked, number=repeat)
+            rows_seconds = timeit.timeit(rows, number=repeat)
+            self.stdout.write('{name}: {hyperlinked:.0f} objects/s hyperlinked, {rows:.0f} objects/s rows, '
+                              '{speedup:.1f}x'.format(name=name, hyperlinked=count * repeat / hyperlinked_seconds,
+                                                      rows=count * repeat / rows_seconds,
+                                                      speedup=hyperlinked_seconds / rows_seconds))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from billserve.models import BillDocument
+
+
+class Command(BaseCommand):
+    help = 'Compares stored bill documents with live serialization and lists the bills whose documents differ.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('pks', nargs='*', type=int, help='Primary keys of the bills to check')
+        parser.add_argument('--repair', action='store_true', help='Re-render the documents that differ')
+
+    def handle(self, *args, **options):
+        mismatched = BillDocument.objects.inconsistent(options['pks'] or None)
+        if not mismatched:
+            self.stdout.write('Every stored bill document matches live serialization.')
+            return
+
+        self.stdout.write('{count} bill documents differ: {pks}'.format(
+            count=len(mismatched), pks=', '.join(str(pk) for pk in mismatched)))
+        if options['repair']:
+            BillDocument.objects.regenerate(mismatched)
+            self.stdout.write('Re-rendered {count} bill documents.'.format(count=len(mismatched)))
+        else:
+            raise CommandError('Stored bill documents are inconsistent. Run with --repair to re-render them.')
@@ -0,0 +1,102 @@
+import json
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from billserve.chains import UpdateChain
+from billserve.crawls import crawls, rebuilds
+from billserve.models import Bill
+from billserve.networking.client import GovinfoClient
+from billserve.networking.fakegovinfo import FakeGovinfoServer
+
+
+class Command(BaseCommand):
+    help = 'Runs the whole crawl, populate, related bill and rebuild pipeline against BILLSERVE_GOVINFO_BASE_URL and ' \
+           'reports bills per second and the total completion time, up to the end of the debounced rebuild the crawl ' \
+           'requests. Needs running Celery workers configured with the same settings and cache, and a scratch ' \
+           'database. With --corpus, a fake govinfo server is started at the base URL first.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--congress', type=int, default=115)
+        parser.add_argument('--types', nargs='+', default=['s', 'hr'], help='The bill types to crawl.')
+        parser.add_argument('--corpus', help='Serve this corpus from a fake govinfo server at the base URL.')
+        parser.add_argument('--latency', type=float, default=0.0, help='Fake server delay per response, in ms.')
+        parser.add_argument('--jitter', type=float, default=0.0, help='Fake server delay deviation, in ms.')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Fake server share of 500s.')
+        parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fake server share of 429s.')
+        parser.add_argument('--retry-after', type=int, default=1, help='Fake server Retry-After, in seconds.')
+        parser.add_argument('--timeout', type=float, default=3600.0,
+                            help='Seconds to wait for the crawl and the rebuild.')
+        parser.add_argument('--output', help='The file to save results to, instead of printing them.')
+
+    def start_server(self, options):
+        base = urlsplit(GovinfoClient.base_url())
+        if base.scheme != 'http' or not base.port:
+            raise CommandError('--corpus needs BILLSERVE_GOVINFO_BASE_URL to be http://host:port, not {url}'.format(
+                url=GovinfoClient.base_url()))
+        server = FakeGovinfoServer((base.hostname, base.port), options['corpus'], latency=options['latency'] / 1000,
+                                   jitter=options['jitter'] / 1000, error_rate=options['error_rate'],
+                                   throttle_rate=options['throttle_rate'], retry_after=options['retry_after'])
+        server.start()
+        return server
+
+    @staticmethod
+    def progress():
+        return Bill.objects.count(), Bill.related_bills.through.objects.count()
+
+    def handle(self, *args, **options):
+        server = self.start_server(options) if options['corpus'] else None
+        try:
+            results = self.run(options)
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+        if server is not None:
+            results['server'] = server.counts
+
+        text = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(text)
+        else:
+            self.stdout.write(text)
+
+    def run(self, options):
+        listings = [GovinfoClient.create_listing_url(options['congress'], bill_type) for bill_type in options['types']]
+        expected = set()
+        for listing in listings:
+            expected.update(GovinfoClient.create_bill_url_list_from_origin(listing))
+        already = Bill.objects.filter(bill_url__in=expected).count()
+        bills_before, links_before = self.progress()
+
+        started = time.perf_counter()
+        crawl_id = UpdateChain.execute(listings)
+
+        # The crawl's barrier reaches zero once every populate task, related bills included, has run, and the crawl
+        # then requests a rebuild that runs after the debounce window
+        crawled = rebuilt = None
+        while time.perf_counter() - started <= options['timeout']:
+            time.sleep(0.5)
+            if crawled is None and crawls.pending(crawl_id) == 0:
+                crawled = time.perf_counter() - started
+            finished = crawls.finished_at(crawl_id)
+            if finished is not None and (rebuilds.finished_at() or 0) > finished:
+                rebuilt = time.perf_counter() - started
+                break
+        else:
+            self.stderr.write('Timed out with {n} tasks of the crawl pending'.format(n=crawls.pending(crawl_id)))
+
+        bills_after, links_after = self.progress()
+        stored = Bill.objects.filter(bill_url__in=expected).count()
+        new_bills = bills_after - bills_before
+        return {
+            'crawl_id': crawl_id, 'listed_bills': len(expected), 'already_stored': already, 'stored_bills': stored,
+            'complete': stored == len(expected), 'new_bills': new_bills,
+            'new_related_bill_links': links_after - links_before, 'crawl_seconds': crawled,
+            'bills_per_second': new_bills / crawled if crawled else None,
+            'rebuild_debounce_seconds': rebuilds.debounce(),
+            'rebuild_seconds': rebuilt - crawled if rebuilt is not None and crawled is not None else None,
+            'total_seconds': rebuilt,
+        }
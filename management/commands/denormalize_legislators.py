@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from billserve.models import Legislator
+
+
+class Command(BaseCommand):
+    help = 'Copies every senator\'s and representative\'s party, state, chamber and district onto the legislator table.'
+
+    def handle(self, *args, **options):
+        count = Legislator.objects.sync_denormalized()
+        self.stdout.write('Updated {count} legislators.'.format(count=count))
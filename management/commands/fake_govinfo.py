@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from billserve.networking.fakegovinfo import FakeGovinfoServer
+
+
+class Command(BaseCommand):
+    help = 'Serves a local corpus of BILLSTATUS XML, e.g. from fixtures/generate_congress.py, the way govinfo ' \
+           'does. Point BILLSERVE_GOVINFO_BASE_URL at it to crawl offline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('corpus', help='The directory holding bulkdata/BILLSTATUS.')
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--public-url', help='The origin to link to in listings, if not http://host:port.')
+        parser.add_argument('--latency', type=float, default=0.0, help='Mean delay per response, in milliseconds.')
+        parser.add_argument('--jitter', type=float, default=0.0, help='Standard deviation of the delay, in ms.')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with a 500.')
+        parser.add_argument('--throttle-rate', type=float, default=0.0, help='Share of requests answered with a 429.')
+        parser.add_argument('--retry-after', type=int, default=1, help='Retry-After sent with 429s, in seconds.')
+        parser.add_argument('--seed', type=int)
+
+    def handle(self, *args, **options):
+        server = FakeGovinfoServer((options['host'], options['port']), options['corpus'],
+                                   latency=options['latency'] / 1000, jitter=options['jitter'] / 1000,
+                                   error_rate=options['error_rate'], throttle_rate=options['throttle_rate'],
+                                   retry_after=options['retry_after'], seed=options['seed'],
+                                   public_url=options['public_url'])
+        self.stdout.write('Serving {corpus} at {url}'.format(corpus=options['corpus'], url=server.base_url))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(', '.join('{n} {key}'.format(n=n, key=key.replace('_', ' '))
+                                        for key, n in server.counts.items()))
@@ -0,0 +1,38 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from billserve.analytics.votes import score_party_unity
+from billserve.models import RollCall
+
+
+class Command(BaseCommand):
+    help = 'Loads roll call vote XML files from the House Clerk or the Senate, then rescores party unity.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='XML files, or directories to search for them')
+
+    @staticmethod
+    def files(paths):
+        for path in paths:
+            if os.path.isdir(path):
+                for directory, _, names in sorted(os.walk(path)):
+                    for name in sorted(names):
+                        if name.lower().endswith('.xml'):
+                            yield os.path.join(directory, name)
+            else:
+                yield path
+
+    def handle(self, *args, **options):
+        loaded, unmatched = 0, 0
+        for path in self.files(options['paths']):
+            roll_call, left_out = RollCall.objects.load_file(path)
+            loaded += 1
+            unmatched += left_out
+            if left_out:
+                self.stderr.write('{path}: left out {n} members of {roll_call}'.format(
+                    path=path, n=left_out, roll_call=roll_call))
+
+        rescored = score_party_unity()
+        self.stdout.write('Loaded {loaded} roll calls, leaving out {unmatched} members. Rescored {n} legislators.'
+                          .format(loaded=loaded, unmatched=unmatched, n=len(rescored)))
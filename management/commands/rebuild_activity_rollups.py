@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from billserve.models import ActivityRollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the monthly activity rollup from every bill, sponsorship and cosponsorship.'
+
+    def handle(self, *args, **options):
+        count = ActivityRollup.objects.rebuild()
+        self.stdout.write('Wrote {count} activity rollup rows.'.format(count=count))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from billserve.models import Bill
+
+
+class Command(BaseCommand):
+    help = 'Recomputes every bill\'s family from the connected components of the related bill graph.'
+
+    def handle(self, *args, **options):
+        count = len(Bill.objects.rebuild_families())
+        self.stdout.write('Updated the family of {count} bills.'.format(count=count))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from billserve.models import Collaboration
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the legislator collaboration counts and similarities from every sponsorship and cosponsorship.'
+
+    def handle(self, *args, **options):
+        count = Collaboration.objects.rebuild()
+        self.stdout.write('Wrote {count} collaborations.'.format(count=count))
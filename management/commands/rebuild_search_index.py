@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from billserve.search import BillSearchIndex
+
+
+class Command(BaseCommand):
+    help = 'Creates the bill full-text index if needed and re-indexes every bill.'
+
+    def handle(self, *args, **options):
+        count = BillSearchIndex.rebuild()
+        self.stdout.write('Indexed {count} bills.'.format(count=count))
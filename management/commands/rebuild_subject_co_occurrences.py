@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from billserve.models import SubjectCoOccurrence
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the legislative subject co-occurrence counts and similarities from every bill\'s subjects.'
+
+    def handle(self, *args, **options):
+        count = SubjectCoOccurrence.objects.rebuild()
+        self.stdout.write('Wrote {count} subject co-occurrences.'.format(count=count))
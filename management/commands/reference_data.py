@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from billserve.registry import reference_data
+
+
+class Command(BaseCommand):
+    help = 'Loads the reference data registry and reports its size and memory footprint.'
+
+    def handle(self, *args, **options):
+        tables = reference_data.reload()
+        self.stdout.write('Version {version}: {parties} parties, {states} states, {chambers} chambers, '
+                          '{policy_areas} policy areas, {footprint} bytes.'
+                          .format(version=tables.version, parties=len(tables.parties), states=len(tables.states),
+                                  chambers=len(tables.chambers), policy_areas=len(tables.policy_areas),
+                                  footprint=tables.footprint()))
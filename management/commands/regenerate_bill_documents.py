@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from billserve.models import BillDocument
+
+
+class Command(BaseCommand):
+    help = 'Re-renders the stored detail documents of the given bills, or of every bill.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('pks', nargs='*', type=int, help='Primary keys of the bills to re-render')
+
+    def handle(self, *args, **options):
+        count = BillDocument.objects.regenerate(options['pks'] or None)
+        self.stdout.write('Rendered {count} bill documents.'.format(count=count))
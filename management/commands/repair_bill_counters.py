@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from billserve.models import Bill
+
+
+class Command(BaseCommand):
+    help = 'Recounts the sponsor and cosponsor counter columns of every bill.'
+
+    def handle(self, *args, **options):
+        count = Bill.objects.refresh_counters()
+        self.stdout.write('Recounted {count} bills.'.format(count=count))
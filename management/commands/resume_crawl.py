@@ -0,0 +1,24 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from billserve.chains import ResumeChain
+from billserve.models import CrawlFrontier
+
+
+class Command(BaseCommand):
+    help = 'Resumes the crawl frontier from its checkpoint after a crash. URLs that were queued are taken to have ' \
+           'been lost and are crawled again, so stop every worker of the crashed crawl first. With --progress, ' \
+           'only reports progress.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--progress', action='store_true', help='Report progress instead of resuming.')
+        parser.add_argument('--crawl', help='The crawl to report progress for, instead of the whole frontier.')
+
+    def handle(self, *args, **options):
+        if options['progress']:
+            self.stdout.write(json.dumps(CrawlFrontier.objects.progress(options['crawl']), indent=2))
+            return
+        crawl_id, count = ResumeChain.execute()
+        self.stdout.write('Resumed {count} unfinished URLs as crawl {crawl_id}.'.format(count=count,
+                                                                                     crawl_id=crawl_id))
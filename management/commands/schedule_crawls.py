@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from billserve.crawls import scheduler
+
+
+class Command(BaseCommand):
+    help = 'Starts a crawl of every bill status collection due a refresh, across the configured congresses. ' \
+           'Needs running Celery workers. With --dry-run, only lists the collections due.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Crawl every collection, due or not.')
+        parser.add_argument('--dry-run', action='store_true', help='List the collections due without crawling.')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            for congress, collection in scheduler.due():
+                self.stdout.write('{congress}/{collection}'.format(congress=congress, collection=collection))
+            return
+        crawl_id = scheduler.run(force=options['force'])
+        if crawl_id is None:
+            self.stdout.write('No collections are due.')
+        else:
+            self.stdout.write('Started crawl {crawl_id}.'.format(crawl_id=crawl_id))
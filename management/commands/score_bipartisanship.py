@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from billserve.analytics.bipartisanship import score_bipartisanship
+from billserve.models import BillDocument
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the bipartisanship scores of every bill and legislator.'
+
+    def handle(self, *args, **options):
+        bill_pks, legislator_pks = score_bipartisanship()
+        BillDocument.objects.regenerate(bill_pks)
+        self.stdout.write('Rescored {bills} bills and {legislators} legislators.'.format(
+            bills=len(bill_pks), legislators=len(legislator_pks)))
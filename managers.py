@@ -1,10 +1,22 @@
-from django.db.models import Manager
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Manager, Count, ExpressionWrapper, F, FloatField, IntegerField, Max, Min, OuterRef, \
+    Prefetch, Q, Subquery, Sum, prefetch_related_objects
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
 import datetime
+import json
+import time
 from pytz import utc
 from .networking.client import GovinfoClient
 from .chains import RelatedBillChain
+from .search import BillSearchIndex
 from polymorphic.managers import PolymorphicManager
 from itertools import chain
+from collections import defaultdict
+from functools import partial, reduce
+from operator import or_
 
 
 def fix_name(n):
@@ -28,6 +40,32 @@ def format_date(string, date_format):
     return datetime.datetime.strptime(string, date_format).astimezone(utc)
 
 
+def prefetch_legislator_relations(legislators, *lookups):
+    """
+    Prefetches the relations a list of mixed senators and representatives need for serialization. Each subclass is
+    prefetched separately, since only representatives have districts.
+    :param legislators: A list of Senator and Representative instances
+    :param lookups: Extra lookups to prefetch for every legislator
+    """
+    from .models import Representative, Senator
+
+    prefetch_related_objects([legislator for legislator in legislators if isinstance(legislator, Senator)],
+                             'party', 'state', *lookups)
+    prefetch_related_objects([legislator for legislator in legislators if isinstance(legislator, Representative)],
+                             'party', 'state', 'district__state', *lookups)
+
+
+def in_order(instances, pks):
+    """
+    Orders instances by a list of primary keys.
+    :param instances: The instances to order
+    :param pks: The primary keys in the order wanted. Keys without an instance are skipped.
+    :return: A list of instances
+    """
+    by_pk = {instance.pk: instance for instance in instances}
+    return [by_pk[pk] for pk in pks if pk in by_pk]
+
+
 class LegislatorManager(PolymorphicManager):
     def get_or_create_from_dict(self, data):
         """
@@ -35,7 +73,8 @@ class LegislatorManager(PolymorphicManager):
         :param data: A dictionary containing a serialized Legislator instance
         :return: A tuple containing the object and a boolean indicator telling whether it was created or not
         """
-        from .models import Representative, Senator, District, State, Party
+        from .models import Representative, Senator, District
+        from .registry import reference_data
         first_name = data['firstName']
         last_name = data['lastName']
         state = data['state']
@@ -48,84 +87,222 @@ class LegislatorManager(PolymorphicManager):
 
         first_name, last_name = fix_name(first_name), fix_name(last_name)
 
-        state = State.objects.get(abbreviation=state)
-        party = Party.objects.get(abbreviation=party)
+        state_pk = reference_data.state_by_abbreviation(state).pk
+        party_pk = reference_data.party_by_abbreviation(party).pk
 
         if district:
-            district = District.objects.get_or_create(number=int(district), state=state)[0]
-            legislator = Representative.objects.get_or_create(first_name=first_name, last_name=last_name, state=state,
-                                                              party=party, district=district)
+            district = District.objects.get_or_create(number=int(district), state_id=state_pk)[0]
+            legislator = Representative.objects.get_or_create(first_name=first_name, last_name=last_name,
+                                                              state_id=state_pk, party_id=party_pk, district=district)
         else:
-            legislator = Senator.objects.get_or_create(first_name=first_name, last_name=last_name, state=state,
-                                                       party=party)
+            legislator = Senator.objects.get_or_create(first_name=first_name, last_name=last_name, state_id=state_pk,
+                                                       party_id=party_pk)
 
         return legislator
 
-
-class BillManager(Manager):
-    def create_from_dict(self, data):
+    def last_modified_for(self, pk):
         """
-        Get or create a Bill instance (and all its related instances) from a serialized dictionary instance.
-        :param data: A dictionary containing a serialized Bill instance
-        :return: The freshly created Bill instance
+        Gets the last time a legislator, or any bill they sponsor or cosponsor, was changed by ingest.
+        :param pk: The primary key of the legislator
+        :return: A datetime, or None if the legislator doesn't exist or has never been touched by ingest
         """
-        from .models import Bill, PolicyArea, Legislator, Cosponsorship, BillSummary, LegislativeSubject, Action,\
-            Committee
+        return self.non_polymorphic().filter(pk=pk).values_list('last_modified', flat=True).first()
 
-        url = data['url']
-        bill = self.create(bill_url=url)
-
-        bill.type = data['billType']
-        bill.bill_number = int(data['billNumber'])
-        bill.title = data['title']
-        bill.congress = int(data['congress'])
-        bill.introduction_date = format_date(data['introducedDate'], Bill.introduction_date_format)
-        bill.save()
-
-        if 'policyArea' in data:
-            policy_area_data = data['policyArea']
-            policy_area, created = PolicyArea.objects.get_or_create_from_dict(policy_area_data)
-            bill.policy_area = policy_area
-        else:
-            bill.policy_area = None
-
-        for sponsor_data in data['sponsors']:
-            sponsor, created = Legislator.objects.get_or_create_from_dict(sponsor_data)
-            bill.sponsors.add(sponsor)
-
-        if data['cosponsors']:
-            for cosponsor_data in data['cosponsors']:
-                Cosponsorship.objects.get_or_create_from_dict(cosponsor_data, bill.pk)
-
-        if data['relatedBills']:
-            for related_data in data['relatedBills']:
-                related_bill_type = related_data['type']
-                related_bill_congress = related_data['congress']
-                related_bill_number = related_data['number']
-
-                related_bill_url = GovinfoClient.create_bill_url(
-                    related_bill_congress, related_bill_type, related_bill_number)
-
-                RelatedBillChain.execute(related_bill_url, bill.pk)
+    def denormalized(self):
+        """
+        A fast read path for legislators. Returns plain Legislator instances, without the polymorphic upcast or any
+        child table join, with the denormalized district loaded in the same query. Parties and states are resolved
+        from the reference data registry instead of joined.
+        :return: A non-polymorphic queryset of legislators
+        """
+        return self.non_polymorphic().select_related('legislator_district')
 
-        if data['summaries']['billSummaries']:
-            for bill_summary_data in data['summaries']['billSummaries']:
-                BillSummary.objects.get_or_create_from_dict(bill_summary_data, bill.pk)
+    def sync_denormalized(self):
+        """
+        Recopies every senator's and representative's columns onto the base legislator table. Only needed for rows
+        written without save(), e.g. by queryset updates or before the columns existed.
+        :return: The number of legislators updated
+        """
+        from .models import Representative, Senator
+
+        count = 0
+        for model, columns in ((Senator, {'legislator_party': 'party', 'legislator_state': 'state',
+                                          'legislator_chamber': 'legislative_body'}),
+                               (Representative, {'legislator_party': 'party', 'legislator_state': 'state',
+                                                 'legislator_chamber': 'legislative_body',
+                                                 'legislator_district': 'district'})):
+            subclass = model.objects.non_polymorphic().filter(pk=OuterRef('pk'))
+            values = {column: Subquery(subclass.values(source)[:1]) for column, source in columns.items()}
+            count += self.non_polymorphic().filter(pk__in=model.objects.non_polymorphic().values('pk'))\
+                .update(legislator_type=model.denormalized_type.value, **values)
+        return count
+
+    def in_bulk_detailed(self, pks):
+        """
+        Gets many legislators with everything their detail serializers need, using a fixed number of queries
+        however many legislators are requested.
+        :param pks: The primary keys of the legislators
+        :return: A list of Senator and Representative instances in the order of pks
+        """
+        legislators = list(self.filter(pk__in=pks))
+        prefetch_legislator_relations(legislators, 'committees', 'sponsored_bills__policy_area',
+                                      'cosponsored_bills__policy_area')
+        return in_order(legislators, pks)
 
-        if data['subjects']['billSubjects']['legislativeSubjects']:
-            for legislative_subject_data in data['subjects']['billSubjects']['legislativeSubjects']:
-                legislative_subject, created = LegislativeSubject.objects.get_or_create_from_dict(
-                    legislative_subject_data)
-                bill.legislative_subjects.add(legislative_subject)
+    def assign_vote_ordinals(self, pks):
+        """
+        Gives legislators a vote ordinal, their permanent bit position in roll call vectors, if they lack one.
+        :param pks: The primary keys of the legislators
+        :return: A dictionary mapping each primary key to its legislator's ordinal
+        """
+        with transaction.atomic():
+            legislators = list(self.non_polymorphic().select_for_update().filter(pk__in=pks).order_by('pk'))
+            missing = [legislator for legislator in legislators if legislator.vote_ordinal is None]
+            if missing:
+                highest = self.non_polymorphic().aggregate(highest=Max('vote_ordinal'))['highest']
+                start = 0 if highest is None else highest + 1
+                for ordinal, legislator in enumerate(missing, start):
+                    legislator.vote_ordinal = ordinal
+                self.non_polymorphic().bulk_update(missing, ['vote_ordinal'])
+        return {legislator.pk: legislator.vote_ordinal for legislator in legislators}
 
-        for committee_data in data['committees']['billCommittees']:
-            committee, created = Committee.objects.get_or_create_from_dict(committee_data)
-            bill.committees.add(committee)
 
-        # for action_data in data['actions']:
-        #     Action.objects.get_or_create_from_dict(action_data, bill.pk)
+class BillManager(Manager):
+    def create_from_dict(self, data, crawl_id=None, refresh=False):
+        """
+        Get or create a Bill instance (and all its related instances) from a serialized dictionary instance. A refresh
+        re-ingests the stored bill at the same URL in place, replacing its fields and relations with the ones in the
+        data. Collaborations, subject co-occurrences and activity rollups can only be added to incrementally, so a
+        refresh leaves them to the rebuild its crawl requests once it finishes.
+        :param data: A dictionary containing a serialized Bill instance
+        :param crawl_id: The id of the crawl to add the related bill tasks to, if any
+        :param refresh: Whether to refresh the stored bill rather than create a new one
+        :return: The freshly created or refreshed Bill instance
+        """
+        from .enumerations import ChangeAction
+        from .models import Bill, PolicyArea, Legislator, Cosponsorship, BillSummary, LegislativeSubject, Action,\
+            Committee, BillDocument, Collaboration, SubjectCoOccurrence, ActivityRollup, ChangeEvent
 
-        bill.save()
+        url = data['url']
+        now = timezone.now()
+        legislator_pks, cosponsorship_pks, legislative_subject_pks = set(), set(), set()
+
+        # Everything is written in one transaction, so a failure can't leave a partly ingested bill that retries
+        # would find and skip. Related bill tasks are only queued once it commits, so they can find the bill.
+        with transaction.atomic():
+            bill = self.select_for_update().filter(bill_url=url).order_by('pk').first() if refresh else None
+            if bill is None:
+                refresh = False
+                bill = self.create(bill_url=url, last_modified=now)
+            else:
+                # Whoever the bill no longer involves has changed too
+                legislator_pks.update(bill.sponsors.values_list('pk', flat=True),
+                                      Cosponsorship.objects.filter(bill=bill).values_list('legislator_id', flat=True))
+                legislative_subject_pks.update(bill.legislative_subjects.values_list('pk', flat=True))
+                bill.last_modified = now
+
+            bill.type = data['billType']
+            bill.bill_number = int(data['billNumber'])
+            bill.title = data['title']
+            bill.congress = int(data['congress'])
+            bill.introduction_date = format_date(data['introducedDate'], Bill.introduction_date_format)
+            bill.save()
+
+            if 'policyArea' in data:
+                policy_area_data = data['policyArea']
+                policy_area, created = PolicyArea.objects.get_or_create_from_dict(policy_area_data)
+                bill.policy_area = policy_area
+            else:
+                bill.policy_area = None
+
+            sponsors = []
+            for sponsor_data in data['sponsors']:
+                sponsor, created = Legislator.objects.get_or_create_from_dict(sponsor_data)
+                sponsors.append(sponsor)
+                legislator_pks.add(sponsor.pk)
+            bill.sponsors.set(sponsors)
+
+            kept_cosponsorship_pks = set()
+            if data['cosponsors']:
+                for cosponsor_data in data['cosponsors']:
+                    cosponsorship, created = Cosponsorship.objects.get_or_create_from_dict(cosponsor_data, bill.pk)
+                    legislator_pks.add(cosponsorship.legislator_id)
+                    kept_cosponsorship_pks.add(cosponsorship.pk)
+                    if created:
+                        cosponsorship_pks.add(cosponsorship.pk)
+            if refresh:
+                # Deleting them one at a time records each in the change feed
+                for cosponsorship in Cosponsorship.objects.filter(bill=bill).exclude(pk__in=kept_cosponsorship_pks):
+                    cosponsorship.delete()
+
+            self.refresh_counters([bill.pk])
+            bill.refresh_from_db(fields=['num_sponsors', 'num_cosponsors'])
+            if not refresh:
+                # Legislators whose collaborators were rescored count as modified too
+                legislator_pks |= Collaboration.objects.record_bill(legislator_pks)
+
+            if data['relatedBills']:
+                known_urls = set(bill.related_bills.values_list('bill_url', flat=True)) if refresh else set()
+                for related_data in data['relatedBills']:
+                    related_bill_type = related_data['type']
+                    related_bill_congress = related_data['congress']
+                    related_bill_number = related_data['number']
+
+                    related_bill_url = GovinfoClient.create_bill_url(
+                        related_bill_congress, related_bill_type, related_bill_number)
+
+                    if related_bill_url not in known_urls:
+                        transaction.on_commit(partial(RelatedBillChain.execute, related_bill_url, bill.pk,
+                                                      crawl_id=crawl_id))
+
+            if data['summaries']['billSummaries']:
+                for bill_summary_data in data['summaries']['billSummaries']:
+                    BillSummary.objects.get_or_create_from_dict(bill_summary_data, bill.pk)
+
+            new_legislative_subject_pks = set()
+
+            if data['subjects']['billSubjects']['legislativeSubjects']:
+                for legislative_subject_data in data['subjects']['billSubjects']['legislativeSubjects']:
+                    legislative_subject, created = LegislativeSubject.objects.get_or_create_from_dict(
+                        legislative_subject_data)
+                    new_legislative_subject_pks.add(legislative_subject.pk)
+            bill.legislative_subjects.set(new_legislative_subject_pks)
+            legislative_subject_pks |= new_legislative_subject_pks
+
+            if not refresh:
+                # Subjects whose related subjects were rescored count as modified too
+                legislative_subject_pks |= SubjectCoOccurrence.objects.record_bill(legislative_subject_pks)
+
+            committees = []
+            for committee_data in data['committees']['billCommittees']:
+                committee, created = Committee.objects.get_or_create_from_dict(committee_data)
+                committees.append(committee)
+            bill.committees.set(committees)
+
+            # for action_data in data['actions']:
+            #     Action.objects.get_or_create_from_dict(action_data, bill.pk)
+
+            bill.save()
+
+            # Related bills embed this one in their documents
+            document_pks = [bill.pk]
+            if refresh:
+                related_bill_pks = list(bill.related_bills.values_list('pk', flat=True))
+                self.filter(pk__in=related_bill_pks).update(last_modified=now)
+                document_pks.extend(related_bill_pks)
+
+            BillSearchIndex.update(bill)
+            BillDocument.objects.regenerate(document_pks)
+            Legislator.objects.filter(pk__in=legislator_pks).update(last_modified=now)
+            LegislativeSubject.objects.filter(pk__in=legislative_subject_pks).update(last_modified=now)
+
+            ChangeEvent.objects.record('bills', ChangeAction.updated if refresh else ChangeAction.created, document_pks)
+            ChangeEvent.objects.record('cosponsorships', ChangeAction.created, cosponsorship_pks)
+            if not refresh:
+                ActivityRollup.objects.record_bills([bill.pk])
+                ChangeEvent.objects.record('collaborations', ChangeAction.updated, legislator_pks)
+                ChangeEvent.objects.record('subject-co-occurrences', ChangeAction.updated, legislative_subject_pks)
+                ChangeEvent.objects.record('activity-rollups', ChangeAction.updated)
 
         return bill
 
@@ -136,24 +313,145 @@ class BillManager(Manager):
         :param bill_pk: The primary key of the first related bill
         :param related_bill_pk: The primary key of the second related bill
         """
-        from .models import Bill
+        from .models import Bill, BillDocument
 
         related_bill = Bill.objects.get(pk=related_bill_pk)
         bill = Bill.objects.get(pk=bill_pk)
+        now = timezone.now()
 
         related_bill.related_bills.add(bill)
+        related_bill.last_modified = now
         related_bill.save()
 
         bill.related_bills.add(related_bill)
+        bill.last_modified = now
         bill.save()
 
+        moved_pks = Bill.objects.merge_families(bill.pk, related_bill.pk)
+        BillDocument.objects.regenerate(sorted(set(moved_pks) | {bill.pk, related_bill.pk}))
+
+    def merge_families(self, bill_pk, related_bill_pk):
+        """
+        Joins the families of two newly related bills. A family is identified by the lowest primary key among its
+        bills, and a bill without a family yet is a family of its own. Bills whose family changed are marked as
+        modified.
+        :param bill_pk: The primary key of the first related bill
+        :param related_bill_pk: The primary key of the second related bill
+        :return: The primary keys of the bills whose family changed
+        """
+        from .enumerations import ChangeAction
+        from .models import ChangeEvent
+
+        with transaction.atomic():
+            families = dict(self.select_for_update().filter(pk__in=[bill_pk, related_bill_pk])
+                            .values_list('pk', 'family_id'))
+            bill_family = families[bill_pk] or bill_pk
+            related_bill_family = families[related_bill_pk] or related_bill_pk
+            family = min(bill_family, related_bill_family)
+            moved = self.filter(Q(family_id__in={bill_family, related_bill_family}) |
+                                Q(pk__in=[bill_pk, related_bill_pk])).exclude(family_id=family)
+            moved_pks = list(moved.values_list('pk', flat=True))
+            self.filter(pk__in=moved_pks).update(family_id=family, last_modified=timezone.now())
+            # The two bills changed anyway, since they're now related
+            ChangeEvent.objects.record('bills', ChangeAction.updated, moved_pks + [bill_pk, related_bill_pk])
+        return moved_pks
+
+    def rebuild_families(self):
+        """
+        Recomputes every bill's family from the related bill graph, leaving bills without related bills out of any
+        family like merge_families does. Bills whose family changed are marked as modified.
+        :return: The primary keys of the bills whose family changed
+        """
+        from .analytics.families import RelatedBillGraph
+        from .enumerations import ChangeAction
+        from .models import ChangeEvent
+
+        graph = RelatedBillGraph.load()
+        families = graph.families().tolist()
+        related = (graph.indptr[1:] > graph.indptr[:-1]).tolist()
+        stored = dict(self.values_list('pk', 'family_id'))
+        now = timezone.now()
+        changed = []
+        for pk, family, has_related in zip(graph.bill_pks.tolist(), families, related):
+            family = family if has_related else None
+            if pk in stored and stored[pk] != family:
+                changed.append(self.model(pk=pk, family_id=family, last_modified=now))
+        with transaction.atomic():
+            self.bulk_update(changed, ['family_id', 'last_modified'], batch_size=500)
+            ChangeEvent.objects.record('bills', ChangeAction.updated, [bill.pk for bill in changed])
+        return [bill.pk for bill in changed]
+
+    def family(self, pk):
+        """
+        :param pk: The primary key of a bill
+        :return: A queryset of every bill in the bill's family, including the bill, read with one query
+        """
+        from .models import Bill
+
+        family = Subquery(Bill.objects.filter(pk=pk).values('family_id')[:1])
+        return self.filter(Q(family_id=family) | Q(pk=pk))
+
+    def refresh_counters(self, pks=None):
+        """
+        Recounts the sponsors and cosponsors of bills into their counter columns, in a single UPDATE.
+        :param pks: The primary keys of the bills to recount, or None to recount every bill
+        :return: The number of bills updated
+        """
+        from .models import Bill, Cosponsorship
+
+        def count_of(model):
+            counts = model.objects.filter(bill=OuterRef('pk')).order_by().values('bill').annotate(count=Count('pk'))
+            return Coalesce(Subquery(counts.values('count'), output_field=IntegerField()), 0)
+
+        queryset = self.all() if pks is None else self.filter(pk__in=pks)
+        return queryset.update(num_sponsors=count_of(Bill.sponsors.through), num_cosponsors=count_of(Cosponsorship))
+
+    def last_modified_for(self, pk):
+        """
+        Gets the last time a bill was changed by ingest.
+        :param pk: The primary key of the bill
+        :return: A datetime, or None if the bill doesn't exist or has never been touched by ingest
+        """
+        return self.filter(pk=pk).values_list('last_modified', flat=True).first()
+
+    def in_bulk_detailed(self, pks):
+        """
+        Gets many bills with everything BillSerializer needs, using a fixed number of queries however many bills
+        are requested.
+        :param pks: The primary keys of the bills
+        :return: A list of bills in the order of pks
+        """
+        bills = list(self.detailed().filter(pk__in=pks))
+        return in_order(bills, pks)
+
+    def detailed(self):
+        """
+        :return: A queryset of bills that prefetches everything BillSerializer needs. Sponsors and cosponsors are
+        loaded through the denormalized legislator read path.
+        """
+        from .models import Legislator
+
+        return self.select_related('policy_area', 'originating_body')\
+            .prefetch_related(Prefetch('sponsors', queryset=Legislator.objects.denormalized()),
+                              Prefetch('cosponsors', queryset=Legislator.objects.denormalized()),
+                              'legislative_subjects', 'related_bills__policy_area', 'bill_summaries', 'committees')
+
     @staticmethod
-    def bulk_create_bills_from_origin(origin_url):
-        from .tasks import populate_bill
+    def bulk_create_bills_from_origin(origin_url, crawl_id):
+        """
+        Adds every bill in a listing to a crawl's frontier, and starts draining the frontier unless that's underway.
+        :param origin_url: The URL of the listing
+        :param crawl_id: The crawl's id
+        """
+        from .crawls import crawls
+        from .models import CrawlFrontier
+        from .tasks import drain_frontier
 
         bill_urls = GovinfoClient.create_bill_url_list_from_origin(origin_url)
-        for bill_url in bill_urls:
-            populate_bill.delay(bill_url)
+        CrawlFrontier.objects.enqueue(bill_urls, crawl_id)
+        if crawls.start_draining(crawl_id):
+            crawls.add(crawl_id)
+            drain_frontier.delay(crawl_id)
 
 
 class BillSummaryManager(Manager):
@@ -186,15 +484,15 @@ class CommitteeManager(Manager):
         :param data: A dictionary containing a serialized committee instance
         :return: A tuple containing the committee and a boolean indicator of whether it was created
         """
-        from .models import Chamber
+        from .registry import reference_data
 
         name = data['name']
         c_type = data['type']
         chamber = data['chamber']
         system_code = data['systemCode']
-        chamber = Chamber.objects.get(name=chamber)
+        chamber_pk = reference_data.chamber_by_name(chamber).pk
 
-        return self.update_or_create(name=name, type=c_type, chamber=chamber, system_code=system_code)
+        return self.update_or_create(name=name, type=c_type, chamber_id=chamber_pk, system_code=system_code)
 
 
 class PolicyAreaManager(Manager):
@@ -224,6 +522,18 @@ class LegislativeSubjectManager(Manager):
             return None
         return self.get_or_create(name=name)
 
+    def last_modified_for(self, pk):
+        """
+        Gets the last time a legislative subject, its bills or its support split was changed.
+        :param pk: The primary key of the legislative subject
+        :return: A datetime, or None if the subject doesn't exist or has never been touched
+        """
+        timestamps = self.filter(pk=pk).values_list('last_modified', 'support_split__last_modified').first()
+        if timestamps is None:
+            return None
+        timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+        return max(timestamps) if timestamps else None
+
 
 class ActionManager(Manager):
     def get_or_create_from_dict(self, data, bill_pk):
@@ -290,22 +600,712 @@ class LegislativeSubjectSupportSplitManager(Manager):
         Destroys and then rebuilds all legislative subject support split objects.
         """
         from .models import LegislativeSubject, LegislativeSubjectSupportSplit
+        from .registry import reference_data
 
-        independent_party_pk = 1
-        democratic_party_pk = 2
-        republican_party_pk = 3
+        independent_party_pk = reference_data.party_by_abbreviation('I').pk
+        democratic_party_pk = reference_data.party_by_abbreviation('D').pk
+        republican_party_pk = reference_data.party_by_abbreviation('R').pk
 
         self.all().delete()
+        now = timezone.now()
 
         for legislative_subject in LegislativeSubject.objects.all():
-            legislative_subject_support_split = LegislativeSubjectSupportSplit(legislative_subject=legislative_subject)
+            legislative_subject_support_split = LegislativeSubjectSupportSplit(legislative_subject=legislative_subject,
+                                                                               last_modified=now)
             for bill in legislative_subject.bills.all():
                 legislators = list(chain(bill.sponsors.all(), bill.cosponsors.all()))
                 for legislator in legislators:
-                    if legislator.party.pk == independent_party_pk:
+                    if legislator.party_id == independent_party_pk:
                         legislative_subject_support_split.white_count += 1
-                    elif legislator.party.pk == democratic_party_pk:
+                    elif legislator.party_id == democratic_party_pk:
                         legislative_subject_support_split.blue_count += 1
-                    elif legislator.party.pk == republican_party_pk:
+                    elif legislator.party_id == republican_party_pk:
                         legislative_subject_support_split.red_count += 1
             legislative_subject_support_split.save()
+
+
+class BillDocumentManager(Manager):
+    batch_size = 200
+
+    def regenerate(self, pks=None):
+        """
+        Renders and stores the detail documents of bills, a batch at a time.
+        :param pks: The primary keys of the bills to render, or None to render every bill
+        :return: The number of documents written
+        """
+        from .models import Bill
+        from . import documents
+
+        if pks is None:
+            pks = Bill.objects.order_by('pk').values_list('pk', flat=True)
+        pks = list(pks)
+
+        count = 0
+        for start in range(0, len(pks), self.batch_size):
+            batch = pks[start:start + self.batch_size]
+            rendered = documents.render(Bill.objects.detailed().filter(pk__in=batch))
+            now = timezone.now()
+            with transaction.atomic():
+                self.filter(pk__in=batch).delete()
+                self.bulk_create([self.model(bill_id=pk, payload=payload, generated=now) for pk, payload in rendered])
+            count += len(rendered)
+        return count
+
+    def lookup(self, pk):
+        """
+        Reads a bill's last modified time together with its stored document, in one query.
+        :param pk: The primary key of the bill
+        :return: A tuple of the bill's last modified time and the document's JSON text, which is None if the bill
+        has no stored document, or None if the bill doesn't exist
+        """
+        from .models import Bill
+
+        return Bill.objects.filter(pk=pk).values_list('last_modified', 'document__payload').first()
+
+    def inconsistent(self, pks=None):
+        """
+        Compares stored documents with live serialization.
+        :param pks: The primary keys of the bills to compare, or None to compare every bill
+        :return: A list of the primary keys of bills whose document is missing or differs from live serialization
+        """
+        from .models import Bill
+        from . import documents
+
+        if pks is None:
+            pks = Bill.objects.order_by('pk').values_list('pk', flat=True)
+        pks = list(pks)
+
+        mismatched = []
+        for start in range(0, len(pks), self.batch_size):
+            batch = pks[start:start + self.batch_size]
+            live = dict(documents.render(Bill.objects.detailed().filter(pk__in=batch)))
+            stored = dict(self.filter(pk__in=batch).values_list('pk', 'payload'))
+            mismatched.extend(pk for pk in batch if pk in live and
+                              (pk not in stored or json.loads(stored[pk]) != json.loads(live[pk])))
+        return mismatched
+
+
+class CoOccurrenceManager(Manager):
+    """
+    Maintains a sparse, symmetric co-occurrence table with one row per ordered pair of items that share a bill. Each
+    row holds the number of bills shared and the Jaccard similarity of the two items' bills, and the row pairing an
+    item with itself counts all of its bills. Subclasses name the pair's columns and load the item by bill matrix.
+    """
+    row_field = None
+    column_field = None
+
+    def incidence(self):
+        """
+        :return: A tuple of a sorted array of item primary keys and a CSR item by bill matrix with a 1 wherever an
+        item is on a bill
+        """
+        raise NotImplementedError
+
+    def pair(self, row_pk, column_pk, **values):
+        return self.model(**{'{field}_id'.format(field=self.row_field): row_pk,
+                             '{field}_id'.format(field=self.column_field): column_pk}, **values)
+
+    def record_bill(self, pks):
+        """
+        Counts a new bill towards every pair of its items, then rescores every pair involving them. Only rows
+        touching the bill's items are written, never the whole matrix.
+        :param pks: The primary keys of the bill's items
+        :return: The primary keys of the items whose rows changed
+        """
+        row, column = '{field}_id'.format(field=self.row_field), '{field}_id'.format(field=self.column_field)
+        pks = sorted(set(pks))
+        if not pks:
+            return set()
+
+        with transaction.atomic():
+            # Missing pairs are inserted empty, skipping any a concurrent ingest inserted first, so every pair can
+            # then be counted with the same increment
+            pairs = self.filter(**{'{row}__in'.format(row=row): pks, '{column}__in'.format(column=column): pks})
+            found = set(pairs.values_list(row, column))
+            self.bulk_create([self.pair(row_pk, column_pk, shared_bills=0) for row_pk in pks for column_pk in pks
+                              if (row_pk, column_pk) not in found], batch_size=1000, ignore_conflicts=True)
+            pairs.update(shared_bills=F('shared_bills') + 1)
+            return self.rescore(pks)
+
+    def rescore(self, pks):
+        """
+        Recomputes the similarity of every pair involving the given items, from the shared bill counts and the
+        counts on each item's own row.
+        :param pks: The primary keys of the items
+        :return: The primary keys of the items whose rows were rescored
+        """
+        row, column = '{field}_id'.format(field=self.row_field), '{field}_id'.format(field=self.column_field)
+
+        def total(field):
+            return Subquery(self.filter(**{row: OuterRef(field), column: OuterRef(field)}).values('shared_bills')[:1])
+
+        similarity = ExpressionWrapper(
+            Cast('shared_bills', FloatField()) / (total(row) + total(column) - F('shared_bills')),
+            output_field=FloatField())
+        rows = self.filter(Q(**{'{row}__in'.format(row=row): pks}) | Q(**{'{column}__in'.format(column=column): pks}))
+        rows.update(similarity=similarity)
+        return set(pks) | set(rows.values_list(row, flat=True))
+
+    def rebuild(self):
+        """
+        Destroys and then rebuilds the whole table from a sparse product of the item by bill matrix.
+        :return: The number of rows written
+        """
+        from .analytics.matrices import co_occurrence
+
+        pks, incidence = self.incidence()
+        rows, columns, shared_bills, similarities = co_occurrence(incidence)
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create((self.pair(row_pk, column_pk, shared_bills=shared, similarity=similarity)
+                              for row_pk, column_pk, shared, similarity in
+                              zip(pks[rows].tolist(), pks[columns].tolist(), shared_bills.tolist(),
+                                  similarities.tolist())), batch_size=2000)
+        return len(rows)
+
+    def top(self, pk, limit, ordering='shared_bills'):
+        """
+        Reads an item's closest neighbours from the index on its rows.
+        :param pk: The primary key of the item
+        :param limit: The number of neighbours wanted
+        :param ordering: 'shared_bills' or 'similarity'
+        :return: A list of (neighbour primary key, shared bill count, similarity) tuples, closest first
+        """
+        row, column = '{field}_id'.format(field=self.row_field), '{field}_id'.format(field=self.column_field)
+        return list(self.filter(**{row: pk}).exclude(**{column: pk})
+                    .order_by('-{field}'.format(field=ordering), column)
+                    .values_list(column, 'shared_bills', 'similarity')[:limit])
+
+
+class CollaborationManager(CoOccurrenceManager):
+    row_field = 'legislator'
+    column_field = 'collaborator'
+
+    def incidence(self):
+        """
+        :return: The legislator primary keys and a legislator by bill matrix, where sponsoring and cosponsoring both
+        count
+        """
+        from .analytics.matrices import SponsorshipMatrix
+
+        matrix = SponsorshipMatrix.load()
+        involvement = (matrix.sponsors + matrix.cosponsors).tocsr()
+        involvement.data[:] = 1
+        return matrix.legislator_pks, involvement
+
+
+class SubjectCoOccurrenceManager(CoOccurrenceManager):
+    row_field = 'legislative_subject'
+    column_field = 'related_subject'
+
+    def incidence(self):
+        """
+        :return: The legislative subject primary keys and a subject by bill matrix
+        """
+        import numpy as np
+        from .analytics.matrices import incidence, pk_array
+        from .models import Bill, LegislativeSubject
+
+        subject_pks = pk_array(LegislativeSubject.objects.order_by('pk').values_list('pk', flat=True))
+        pairs = pk_array(Bill.legislative_subjects.through.objects.values_list('legislativesubject_id', 'bill_id'))
+        pairs = pairs.reshape(-1, 2)
+        return subject_pks, incidence(pairs, subject_pks, np.unique(pairs[:, 1]))
+
+
+class ActivityRollupManager(Manager):
+    measures = ('bills', 'sponsorships', 'cosponsorships')
+    batch_size = 500
+
+    @staticmethod
+    def deltas_for(pks):
+        """
+        Tallies what bills contribute to the rollup. Each bill counts once for every party among its sponsors, under
+        the totals, its policy area and each of its subjects.
+        :param pks: The primary keys of the bills
+        :return: A dictionary mapping (dimension, dimension_pk, month, congress, party_pk) keys to lists of bill,
+        sponsorship and cosponsorship counts, where an unknown congress or party is 0
+        """
+        from .enumerations import RollupDimension
+        from .models import Bill, Cosponsorship
+
+        subjects, sponsor_parties, cosponsorships = defaultdict(list), defaultdict(list), defaultdict(list)
+        for bill_pk, subject_pk in Bill.legislative_subjects.through.objects.filter(bill_id__in=pks)\
+                .values_list('bill_id', 'legislativesubject_id'):
+            subjects[bill_pk].append(subject_pk)
+        for bill_pk, party_pk in Bill.sponsors.through.objects.filter(bill_id__in=pks)\
+                .values_list('bill_id', 'legislator__legislator_party_id'):
+            sponsor_parties[bill_pk].append(party_pk or 0)
+        for bill_pk, date, party_pk in Cosponsorship.objects.filter(bill_id__in=pks)\
+                .values_list('bill_id', 'cosponsorship_date', 'legislator__legislator_party_id'):
+            cosponsorships[bill_pk].append((date.replace(day=1), party_pk or 0))
+
+        deltas = defaultdict(lambda: [0, 0, 0])
+        for pk, introduction_date, congress, policy_area_pk in Bill.objects.filter(pk__in=pks)\
+                .values_list('pk', 'introduction_date', 'congress', 'policy_area_id'):
+            congress = congress or 0
+            dimensions = [(RollupDimension.total.value, 0)]
+            if policy_area_pk is not None:
+                dimensions.append((RollupDimension.policy_area.value, policy_area_pk))
+            dimensions.extend((RollupDimension.legislative_subject.value, subject_pk) for subject_pk in subjects[pk])
+
+            for dimension, dimension_pk in dimensions:
+                if introduction_date is not None:
+                    month = introduction_date.replace(day=1)
+                    for party_pk in set(sponsor_parties[pk]):
+                        deltas[(dimension, dimension_pk, month, congress, party_pk)][0] += 1
+                    for party_pk in sponsor_parties[pk]:
+                        deltas[(dimension, dimension_pk, month, congress, party_pk)][1] += 1
+                for month, party_pk in cosponsorships[pk]:
+                    deltas[(dimension, dimension_pk, month, congress, party_pk)][2] += 1
+        return deltas
+
+    def record_bills(self, pks):
+        """
+        Adds newly ingested bills to the rollup, touching only the rows they contribute to. Missing rows are inserted
+        empty first, skipping any a concurrent ingest inserted, and then every row is counted with an increment, so
+        concurrent ingests never collide or lose counts.
+        :param pks: The primary keys of the bills
+        """
+        deltas = self.deltas_for(pks)
+        if not deltas:
+            return
+
+        # Rows getting the same counts are incremented together
+        keys_by_counts = defaultdict(list)
+        for key, counts in deltas.items():
+            keys_by_counts[tuple(counts)].append(key)
+
+        with transaction.atomic():
+            self.bulk_create((self.row(key, (0, 0, 0)) for key in deltas), batch_size=self.batch_size,
+                             ignore_conflicts=True)
+            for counts, keys in keys_by_counts.items():
+                for start in range(0, len(keys), self.batch_size):
+                    rows = reduce(or_, (Q(**self.lookup(key)) for key in keys[start:start + self.batch_size]))
+                    self.filter(rows).update(**{measure: F(measure) + count
+                                                for measure, count in zip(self.measures, counts) if count})
+
+    @staticmethod
+    def lookup(key):
+        return dict(zip(('dimension', 'dimension_pk', 'month', 'congress', 'party_pk'), key))
+
+    def row(self, key, counts):
+        return self.model(**self.lookup(key), **dict(zip(self.measures, counts)))
+
+    def rebuild(self):
+        """
+        Destroys and then rebuilds the whole rollup, a batch of bills at a time.
+        :return: The number of rows written
+        """
+        from .models import Bill
+
+        totals = defaultdict(lambda: [0, 0, 0])
+        pks = list(Bill.objects.order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(pks), self.batch_size):
+            for key, counts in self.deltas_for(pks[start:start + self.batch_size]).items():
+                totals[key] = [total + count for total, count in zip(totals[key], counts)]
+
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create((self.row(key, counts) for key, counts in totals.items()), batch_size=self.batch_size)
+        return len(totals)
+
+    def series(self, dimension, dimension_pk=0, start=None, end=None, congress=None, party_pk=None):
+        """
+        Reads a monthly time series from one range of the rollup's index.
+        :param dimension: A RollupDimension
+        :param dimension_pk: The subject or policy area, or 0 for totals
+        :param start: The first month wanted, or None
+        :param end: The last month wanted, or None
+        :param congress: A congress to restrict to, or None for all
+        :param party_pk: A party to restrict to, or None for all
+        :return: A queryset of dictionaries with month, party_pk, which is 0 for no party, and the summed measures, in
+        month then party order
+        """
+        rows = self.filter(dimension=dimension.value, dimension_pk=dimension_pk)
+        if start is not None:
+            rows = rows.filter(month__gte=start)
+        if end is not None:
+            rows = rows.filter(month__lte=end)
+        if congress is not None:
+            rows = rows.filter(congress=congress)
+        if party_pk is not None:
+            rows = rows.filter(party_pk=party_pk)
+        return rows.values('month', 'party_pk').annotate(**{measure: Sum(measure) for measure in self.measures})\
+            .order_by('month', 'party_pk')
+
+
+class RollCallManager(Manager):
+    def create_from_dict(self, data):
+        """
+        Creates or replaces a roll call from a dictionary produced by networking.rollcalls.RollCallParser. Members are
+        matched to existing legislators of the chamber by last name and state, and by first name where that's
+        ambiguous. Members who can't be matched, or whose vote isn't recognized, are left out of the vectors.
+        :param data: A dictionary describing the roll call
+        :return: A tuple containing the roll call and the number of members left out
+        """
+        import numpy as np
+        from .enumerations import LegislatorType
+        from .models import Bill, Legislator, State
+        from .registry import reference_data
+
+        chamber = reference_data.chamber_by_name(data['chamber'])
+        legislator_type = LegislatorType.senator if data['chamber'] == 'Senate' else LegislatorType.representative
+
+        candidates = defaultdict(list)
+        for pk, first_name, last_name, state_pk in Legislator.objects.non_polymorphic()\
+                .filter(legislator_type=legislator_type.value)\
+                .values_list('pk', 'first_name', 'last_name', 'legislator_state_id'):
+            candidates[(last_name.lower(), state_pk)].append((pk, first_name.lower()))
+
+        matched, unmatched = [], 0
+        for member in data['members']:
+            if member['vote'] is None:
+                unmatched += 1
+                continue
+            try:
+                state_pk = reference_data.state_by_abbreviation(member['state']).pk
+            except State.DoesNotExist:
+                unmatched += 1
+                continue
+            found = candidates.get(((member['last_name'] or '').lower(), state_pk), [])
+            if len(found) > 1 and member['first_name']:
+                found = [candidate for candidate in found if candidate[1] == member['first_name'].lower()]
+            if len(found) != 1:
+                unmatched += 1
+                continue
+            matched.append((found[0][0], member['vote']))
+
+        ordinals = Legislator.objects.assign_vote_ordinals([pk for pk, _ in matched])
+        highest = Legislator.objects.non_polymorphic().aggregate(highest=Max('vote_ordinal'))['highest']
+        size = 0 if highest is None else highest + 1
+        vectors = {vector: np.zeros(size, dtype=bool) for vector in self.model.vectors}
+        for pk, vote in matched:
+            vectors['yeas' if vote == 'yea' else 'nays' if vote == 'nay' else vote][ordinals[pk]] = True
+
+        bill = None
+        if data['bill'] is not None:
+            bill = Bill.objects.filter(congress=data['congress'], type=data['bill']['type'],
+                                       bill_number=data['bill']['number']).first()
+
+        roll_call, _ = self.update_or_create(
+            chamber_id=chamber.pk, congress=data['congress'], session=data['session'], number=data['number'],
+            defaults=dict({vector: np.packbits(bits).tobytes() for vector, bits in vectors.items()},
+                          date=data['date'], question=data['question'], result=data['result'], bill=bill, size=size))
+        return roll_call, unmatched
+
+    def load_file(self, path):
+        """
+        Loads a roll call from an XML file in either chamber's format.
+        :param path: The path of the file
+        :return: A tuple containing the roll call and the number of members left out
+        """
+        from .networking.rollcalls import RollCallParser
+
+        with open(path, 'rb') as xml:
+            return self.create_from_dict(RollCallParser.parse(xml.read()))
+
+    def for_legislator(self, legislator):
+        """
+        Gets the roll calls a legislator could have voted in, newest first. The vectors are loaded but not decoded;
+        RollCall.vote_for reads the legislator's bit from each one as it's serialized.
+        :param legislator: A legislator with legislator_type and vote_ordinal loaded
+        :return: A queryset of roll calls, empty if the legislator has never been matched to a roll call
+        """
+        from .enumerations import LegislatorType
+        from .registry import reference_data
+
+        if legislator.vote_ordinal is None:
+            return self.none()
+        # Ingest doesn't record legislative bodies, so the chamber comes from the legislator's type
+        chamber = 'Senate' if legislator.legislator_type == LegislatorType.senator.value else 'House'
+        return self.filter(chamber_id=reference_data.chamber_by_name(chamber).pk, size__gt=legislator.vote_ordinal)\
+            .order_by('-date', '-number')
+
+
+class CrawlFrontierManager(Manager):
+    chunk_size = 500
+
+    @staticmethod
+    def concurrency(collection):
+        """
+        :param collection: A bill status collection, e.g. 'hr', or None for URLs outside of any
+        :return: The most URLs of the collection a crawl may have queued at once, from the
+        BILLSERVE_COLLECTION_CONCURRENCY dictionary or else BILLSERVE_FRONTIER_BATCH
+        """
+        limits = getattr(settings, 'BILLSERVE_COLLECTION_CONCURRENCY', {})
+        return limits.get(collection, getattr(settings, 'BILLSERVE_FRONTIER_BATCH', 200))
+
+    @staticmethod
+    def max_attempts():
+        return getattr(settings, 'BILLSERVE_FRONTIER_ATTEMPTS', 3)
+
+    @staticmethod
+    def stale_after():
+        return datetime.timedelta(seconds=getattr(settings, 'BILLSERVE_FRONTIER_STALE', 30 * 60))
+
+    def enqueue(self, urls, crawl_id):
+        """
+        Adds bill URLs to a crawl's frontier. URLs of bills that aren't stored yet are new, the rest refreshes. URLs an
+        earlier crawl finished come back as refreshes, and URLs another crawl left pending join this one.
+        :param urls: The bill URLs
+        :param crawl_id: The crawl's id
+        """
+        from .enumerations import FrontierPriority, FrontierStatus
+        from .models import Bill
+
+        for start in range(0, len(urls), self.chunk_size):
+            chunk = urls[start:start + self.chunk_size]
+            existing = set(self.filter(url__in=chunk).values_list('url', flat=True))
+            stored = set(Bill.objects.filter(bill_url__in=chunk).values_list('bill_url', flat=True))
+            entries = []
+            for url in dict.fromkeys(chunk):
+                if url in existing:
+                    continue
+                congress, collection, number = GovinfoClient.parse_bill_url(url) or (None, None, None)
+                entries.append(self.model(url=url, crawl_id=crawl_id, congress=congress, collection=collection,
+                                          priority=(FrontierPriority.refresh if url in stored else
+                                                    FrontierPriority.new).value))
+            self.bulk_create(entries, ignore_conflicts=True)
+
+            self.filter(url__in=existing, status__in=[FrontierStatus.done.value, FrontierStatus.failed.value])\
+                .update(crawl_id=crawl_id, status=FrontierStatus.pending.value,
+                        priority=FrontierPriority.refresh.value, attempts=0, last_error=None, queued_at=None,
+                        started_at=None, finished_at=None)
+            self.filter(url__in=existing, status=FrontierStatus.pending.value).update(crawl_id=crawl_id)
+
+    def claim(self, crawl_id, collection, limit):
+        """
+        Marks the highest priority pending URLs of one collection of a crawl as queued.
+        :param crawl_id: The crawl's id
+        :param collection: The collection, or None for URLs outside of any
+        :param limit: The most URLs to claim
+        :return: A list of (URL, FrontierPriority value) tuples of the URLs claimed, highest priority first
+        """
+        from .enumerations import FrontierStatus
+
+        if limit <= 0:
+            return []
+        with transaction.atomic():
+            pending = self.select_for_update(skip_locked=True).filter(crawl_id=crawl_id, collection=collection,
+                                                                      status=FrontierStatus.pending.value)
+            claimed = list(pending.order_by('priority', 'pk').values_list('pk', 'url', 'priority')[:limit])
+            self.filter(pk__in=[pk for pk, url, priority in claimed]).update(status=FrontierStatus.queued.value,
+                                                                             queued_at=timezone.now())
+        return [(url, priority) for pk, url, priority in claimed]
+
+    def requeue_stale(self, crawl_id):
+        """
+        Puts a crawl's URLs that have been queued for longer than BILLSERVE_FRONTIER_STALE seconds back to pending,
+        taking their tasks to have been lost with a worker or the broker. This settles their claims, so a task that
+        was only slow can't settle them again when it finishes.
+        :param crawl_id: The crawl's id
+        :return: The number of URLs put back
+        """
+        from .enumerations import FrontierStatus
+
+        return self.filter(crawl_id=crawl_id, status=FrontierStatus.queued.value,
+                           queued_at__lt=timezone.now() - self.stale_after())\
+            .update(status=FrontierStatus.pending.value, queued_at=None)
+
+    def top_ups(self, crawl_id):
+        """
+        Works out how many more URLs of each collection a crawl may queue under the collection concurrency limits.
+        :param crawl_id: The crawl's id
+        :return: A dictionary mapping each collection with pending URLs to the number of them to queue
+        """
+        from .enumerations import FrontierStatus
+
+        queued, pending = defaultdict(int), set()
+        for status, collection, count in self.unfinished(crawl_id).values_list('status', 'collection')\
+                .annotate(n=Count('pk')).order_by():
+            if status == FrontierStatus.queued.value:
+                queued[collection] += count
+            else:
+                pending.add(collection)
+        return {collection: max(self.concurrency(collection) - queued[collection], 0) for collection in pending}
+
+    def queued(self, crawl_id):
+        """
+        :param crawl_id: The crawl's id
+        :return: A queryset of the crawl's URLs whose tasks are queued or running
+        """
+        from .enumerations import FrontierStatus
+
+        return self.filter(crawl_id=crawl_id, status=FrontierStatus.queued.value)
+
+    def unfinished(self, crawl_id):
+        """
+        :param crawl_id: The crawl's id
+        :return: A queryset of the crawl's URLs that are pending, queued or running
+        """
+        from .enumerations import FrontierStatus
+
+        return self.filter(crawl_id=crawl_id, status__in=[FrontierStatus.pending.value, FrontierStatus.queued.value])
+
+    def started(self, url):
+        """
+        Notes that a task started populating a URL, if it's in the frontier.
+        :param url: The bill URL
+        """
+        self.filter(url=url).update(started_at=timezone.now(), attempts=F('attempts') + 1)
+
+    def finished(self, url, bill_pk, claimed=False):
+        """
+        Checkpoints a URL as done. A queued URL is only settled by a task claimed for it, and only once, so a task
+        requeue_stale gave up on that turns up after all can't be counted twice.
+        :param url: The bill URL
+        :param bill_pk: The primary key of the bill populated from it
+        :param claimed: Whether the caller is a task drain_frontier queued for the URL
+        :return: Whether this settled the URL's claim, so the caller counts as done in its crawl
+        """
+        from .enumerations import FrontierStatus
+
+        entries = self.filter(url=url)
+        values = dict(status=FrontierStatus.done.value, bill_id=bill_pk, last_error=None, finished_at=timezone.now())
+        if claimed and entries.filter(status=FrontierStatus.queued.value).update(**values):
+            return True
+        # Pending URLs don't have to be populated again
+        entries.filter(status=FrontierStatus.pending.value).update(**values)
+        return False
+
+    def failed(self, url, error, claimed=False):
+        """
+        Records a failure to populate a URL. The URL goes back to pending to be retried, until it has been tried
+        BILLSERVE_FRONTIER_ATTEMPTS times. Like with finished, a queued URL is only settled by a task claimed for it.
+        :param url: The bill URL
+        :param error: The exception raised
+        :param claimed: Whether the caller is a task drain_frontier queued for the URL
+        :return: Whether this settled the URL's claim, so the caller counts as done in its crawl
+        """
+        from .enumerations import FrontierStatus
+
+        message = '{name}: {error}'.format(name=type(error).__name__, error=error)
+        entries = self.filter(url=url, status=(FrontierStatus.queued if claimed else FrontierStatus.pending).value)
+        retried = entries.filter(attempts__lt=self.max_attempts()).update(status=FrontierStatus.pending.value,
+                                                                           last_error=message, queued_at=None)
+        given_up = entries.filter(attempts__gte=self.max_attempts()).update(status=FrontierStatus.failed.value,
+                                                                             last_error=message,
+                                                                             finished_at=timezone.now())
+        return claimed and bool(retried or given_up)
+
+    def resume(self, crawl_id):
+        """
+        Moves every unfinished URL into a new crawl after a crash. URLs that were queued are taken to have been lost,
+        so stop the workers of the old crawl first.
+        :param crawl_id: The id of the new crawl
+        :return: The number of URLs the new crawl has to populate
+        """
+        from .enumerations import FrontierStatus
+
+        self.filter(status=FrontierStatus.queued.value).update(status=FrontierStatus.pending.value, queued_at=None)
+        return self.filter(status=FrontierStatus.pending.value).update(crawl_id=crawl_id)
+
+    def progress(self, crawl_id=None, window=60):
+        """
+        Summarizes a crawl's progress, or the whole frontier's.
+        :param crawl_id: The crawl's id, or None for every crawl
+        :param window: The number of seconds to measure the recent throughput over
+        :return: A dictionary of counts by status and priority, the throughput since the first URL started and over
+        the window, in URLs per second, and the estimated seconds remaining at the recent throughput
+        """
+        from .enumerations import FrontierPriority, FrontierStatus
+
+        entries = self if crawl_id is None else self.filter(crawl_id=crawl_id)
+        statuses = {status.name: 0 for status in FrontierStatus}
+        priorities = {priority.name: {status.name: 0 for status in FrontierStatus} for priority in FrontierPriority}
+        for status, priority, count in entries.values_list('status', 'priority').annotate(n=Count('pk'))\
+                .order_by():
+            statuses[FrontierStatus(status).name] += count
+            priorities[FrontierPriority(priority).name][FrontierStatus(status).name] += count
+
+        now = timezone.now()
+        finished = entries.filter(status__in=[FrontierStatus.done.value, FrontierStatus.failed.value])
+        recent = finished.filter(finished_at__gte=now - datetime.timedelta(seconds=window)).count()
+        first_started = entries.aggregate(first=Min('started_at'))['first']
+        elapsed = (now - first_started).total_seconds() if first_started is not None else None
+        total_finished = statuses['done'] + statuses['failed']
+        remaining = statuses['pending'] + statuses['queued']
+        return {
+            'crawl_id': crawl_id, 'statuses': statuses, 'priorities': priorities,
+            'total': sum(statuses.values()), 'remaining': remaining,
+            'throughput': total_finished / elapsed if elapsed else None,
+            'recent_throughput': recent / window,
+            'eta_seconds': remaining / (recent / window) if recent else None,
+        }
+
+
+class CollectionCrawlManager(Manager):
+    def crawled(self, pairs):
+        """
+        :param pairs: (congress, collection) tuples
+        :return: A dictionary mapping the pairs that have been crawled to when they were last crawled
+        """
+        pairs = set(pairs)
+        congresses = {congress for congress, collection in pairs}
+        return {(congress, collection): crawled_at for congress, collection, crawled_at in
+                self.filter(congress__in=congresses).values_list('congress', 'collection', 'crawled_at')
+                if (congress, collection) in pairs}
+
+    def record(self, pairs, crawl_id):
+        """
+        Records that a crawl started on collections.
+        :param pairs: (congress, collection) tuples
+        :param crawl_id: The crawl's id
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            for congress, collection in pairs:
+                self.update_or_create(congress=congress, collection=collection,
+                                      defaults={'crawl_id': crawl_id, 'crawled_at': now})
+
+
+class ChangeEventManager(Manager):
+    batch_size = 500
+
+    def record(self, resource, action, pks=None):
+        """
+        Appends changes to the change feed.
+        :param resource: The name of the resource that changed, e.g. 'bills'
+        :param action: A ChangeAction
+        :param pks: The primary keys of the rows or owners that changed, or None for a change to the whole resource
+        """
+        pks = [None] if pks is None else sorted(set(pks))
+        self.bulk_create([self.model(resource=resource, action=action.value, object_pk=pk) for pk in pks],
+                         batch_size=self.batch_size)
+
+    @staticmethod
+    def settle():
+        return getattr(settings, 'BILLSERVE_CHANGES_SETTLE', 10.0)
+
+    def gap_age(self, seq):
+        """
+        Measures how long a missing sequence number has been seen missing, from the first time any reader in the
+        process, or every process with a shared cache, stopped at it. The time the number was reserved isn't stored
+        anywhere, and the changes around it say nothing about when its own transaction will commit.
+        :param seq: The missing sequence number
+        :return: The number of seconds since the gap was first seen
+        """
+        key = 'billserve:changes:gap:{seq}'.format(seq=seq)
+        now = time.time()
+        cache.add(key, now, max(60 * 60, 2 * self.settle()))
+        return now - cache.get(key, now)
+
+    def since(self, seq, limit):
+        """
+        Reads the changes after a sequence number with a range scan of the primary key. Sequence numbers are handed
+        out when a change is written but only become visible when its transaction commits, so a gap may belong to
+        a change that's still being committed. Reading stops at a gap until it has been seen for
+        BILLSERVE_CHANGES_SETTLE seconds, after which it's taken to be a rolled back transaction, so clients never
+        skip past a change that commits within that time.
+        :param seq: The last sequence number the client has seen, or 0
+        :param limit: The most changes to return
+        :return: A tuple of the changes in order, and whether more may follow straight away
+        """
+        events = list(self.filter(pk__gt=seq).order_by('pk')[:limit])
+        expected = seq + 1
+        for index, event in enumerate(events):
+            # A gap is tracked by its first missing number
+            if event.pk != expected and self.gap_age(expected) < self.settle():
+                return events[:index], False
+            expected = event.pk + 1
+        return events, len(events) == limit
@@ -0,0 +1,321 @@
+import bisect
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+SECONDS_BUCKETS = (.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 300)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+QUERY_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+# name: (help, buckets) for histograms, or (help, None) for counters
+METRICS = {
+    'govinfo_fetch_seconds': ('Time spent waiting on govinfo in HttpClient.get.', SECONDS_BUCKETS),
+    'govinfo_fetch_bytes': ('Size of each govinfo response body.', BYTES_BUCKETS),
+    'govinfo_fetched_bytes_total': ('Bytes fetched from govinfo.', None),
+    'govinfo_retries_total': ('Govinfo requests retried after being rate limited, by status.', None),
+    'bill_parse_seconds': ('Time spent parsing bill status XML.', SECONDS_BUCKETS),
+    'bill_normalize_seconds': ('Time spent cleaning parsed bill status data with MagicDict.', SECONDS_BUCKETS),
+    'bill_store_seconds': ('Time spent in BillManager.create_from_dict.', SECONDS_BUCKETS),
+    'bill_store_queries': ('Queries run by BillManager.create_from_dict for each bill.', QUERY_BUCKETS),
+    'bill_store_db_seconds': ('Time spent in the database by BillManager.create_from_dict.', SECONDS_BUCKETS),
+    'bills_stored_total': ('Bills created from govinfo.', None),
+    'populate_duplicates_total': ('Duplicate populate_bill work suppressed by the in-flight registry, by outcome.',
+                                  None),
+    'task_queue_seconds': ('Time tasks waited between being published and starting.', SECONDS_BUCKETS),
+    'task_run_seconds': ('Time tasks took to run.', SECONDS_BUCKETS),
+    'tasks_total': ('Tasks finished, by state.', None),
+}
+
+
+class Histogram:
+    """
+    A fixed-bucket histogram. counts[i] is the number of observations no greater than buckets[i] and greater than
+    the bucket before it; the last count holds everything above the highest bucket.
+    """
+    def __init__(self, buckets, counts=None, total=0.0):
+        self.buckets = buckets
+        self.counts = list(counts) if counts is not None else [0] * (len(buckets) + 1)
+        self.total = total
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def merge(self, other):
+        self.counts = [count + other_count for count, other_count in zip(self.counts, other.counts)]
+        self.total += other.total
+
+    def quantile(self, q):
+        """
+        Estimates a quantile by interpolating within the bucket it falls in.
+        :param q: The quantile, from 0 to 1
+        :return: The estimate, or None if the histogram is empty. Quantiles above the highest bucket are reported as
+        the highest bucket.
+        """
+        count = self.count
+        if not count:
+            return None
+        rank, seen = q * count, 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0
+                return lower + (self.buckets[index] - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+def label_text(labels):
+    return ','.join('{key}="{value}"'.format(key=key, value=str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                    for key, value in labels)
+
+
+def bucket_text(bucket):
+    return '{bucket:g}'.format(bucket=bucket)
+
+
+class Metrics:
+    """
+    Per-process counters and histograms for the ingest pipeline. Recording only touches process memory, under a
+    lock, so it is cheap enough to leave on. Each process flushes a snapshot to the cache at most once every
+    BILLSERVE_METRICS_FLUSH_INTERVAL seconds, and the metrics views read every process's latest snapshot back. Like
+    the reference data registry, processes only see each other through a shared cache backend.
+    """
+    key_prefix = 'billserve:metrics:'
+    index_key = 'billserve:metrics:processes'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.process = '{host}:{pid}'.format(host=socket.gethostname(), pid=self.pid)
+        self.histograms = {}
+        self.counters = {}
+        self.flushed_at = None
+
+    @staticmethod
+    def flush_interval():
+        return getattr(settings, 'BILLSERVE_METRICS_FLUSH_INTERVAL', 15.0)
+
+    @staticmethod
+    def expiry():
+        return getattr(settings, 'BILLSERVE_METRICS_EXPIRY', 24 * 60 * 60)
+
+    def check_fork(self):
+        # A forked worker starts with a copy of its parent's metrics, which the parent reports already
+        if os.getpid() != self.pid:
+            self.reset()
+
+    def observe(self, name, value, **labels):
+        """
+        Records a value in a histogram.
+        :param name: The name of a histogram in METRICS
+        :param value: The value observed
+        :param labels: Labels distinguishing this series
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.check_fork()
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(METRICS[name][1])
+            histogram.observe(value)
+
+    def increment(self, name, amount=1, **labels):
+        """
+        Adds to a counter.
+        :param name: The name of a counter in METRICS
+        :param amount: The amount to add
+        :param labels: Labels distinguishing this series
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.check_fork()
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        Observes how long the block takes, in seconds, even if it raises.
+        :param name: The name of a histogram in METRICS
+        :param labels: Labels distinguishing this series
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @contextmanager
+    def queries(self, prefix):
+        """
+        Observes how many queries the block runs and how long they take, as the {prefix}_queries and
+        {prefix}_db_seconds histograms.
+        :param prefix: The prefix of the two histograms in METRICS
+        """
+        tally = [0, 0.0]
+
+        def count(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                tally[0] += 1
+                tally[1] += time.perf_counter() - start
+
+        try:
+            with connection.execute_wrapper(count):
+                yield
+        finally:
+            self.observe(prefix + '_queries', tally[0])
+            self.observe(prefix + '_db_seconds', tally[1])
+
+    def snapshot(self):
+        """
+        :return: This process's metrics as a picklable dictionary
+        """
+        with self.lock:
+            self.check_fork()
+            return {
+                'histograms': [(name, labels, histogram.counts, histogram.total)
+                               for (name, labels), histogram in self.histograms.items()],
+                'counters': [(name, labels, value) for (name, labels), value in self.counters.items()],
+            }
+
+    def flush(self, force=False):
+        """
+        Writes this process's snapshot to the cache, if the flush interval has passed since the last write.
+        :param force: Whether to write regardless of the interval
+        """
+        now = time.monotonic()
+        if not force and self.flushed_at is not None and now - self.flushed_at < self.flush_interval():
+            return
+        self.flushed_at = now
+
+        snapshot = self.snapshot()
+        cache.set(self.key_prefix + self.process, snapshot, self.expiry())
+        processes = cache.get(self.index_key) or []
+        if self.process not in processes:
+            cache.set(self.index_key, processes + [self.process], None)
+
+    def collect(self):
+        """
+        Reads back the latest snapshot of every process, after flushing this one.
+        :return: A dictionary mapping process names to snapshots, skipping processes whose snapshots have expired
+        """
+        self.flush(force=True)
+        processes = cache.get(self.index_key) or []
+        snapshots = cache.get_many([self.key_prefix + process for process in processes])
+        live = [process for process in processes if self.key_prefix + process in snapshots]
+        if len(live) != len(processes):
+            cache.set(self.index_key, live, None)
+        return {process: snapshots[self.key_prefix + process] for process in live}
+
+    def prometheus(self):
+        """
+        :return: Every process's metrics in the Prometheus text exposition format, labelled by worker
+        """
+        series = {name: [] for name in METRICS}
+        for process, snapshot in sorted(self.collect().items()):
+            for name, labels, counts, total in snapshot['histograms']:
+                series[name].append(((('worker', process),) + tuple(labels), counts, total))
+            for name, labels, value in snapshot['counters']:
+                series[name].append(((('worker', process),) + tuple(labels), value))
+
+        lines = []
+        for name, (description, buckets) in METRICS.items():
+            metric = 'billserve_' + name
+            lines.append('# HELP {metric} {description}'.format(metric=metric, description=description))
+            lines.append('# TYPE {metric} {type}'.format(metric=metric,
+                                                          type='counter' if buckets is None else 'histogram'))
+            for entry in series[name]:
+                labels = label_text(entry[0])
+                if buckets is None:
+                    lines.append('{metric}{{{labels}}} {value}'.format(metric=metric, labels=labels, value=entry[1]))
+                    continue
+                counts, total, cumulative = entry[1], entry[2], 0
+                for bucket, count in zip([bucket_text(bucket) for bucket in buckets] + ['+Inf'], counts):
+                    cumulative += count
+                    lines.append('{metric}_bucket{{{labels},le="{bucket}"}} {count}'.format(
+                        metric=metric, labels=labels, bucket=bucket, count=cumulative))
+                lines.append('{metric}_sum{{{labels}}} {total!r}'.format(metric=metric, labels=labels, total=total))
+                lines.append('{metric}_count{{{labels}}} {count}'.format(metric=metric, labels=labels,
+                                                                         count=cumulative))
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """
+        :return: A dictionary summarizing every metric across all processes: totals for counters, and the count,
+        sum, mean and estimated median, 90th and 99th percentiles for histograms. Labels other than the worker are
+        kept as separate series.
+        """
+        histograms, counters = {}, {}
+        snapshots = self.collect()
+        for snapshot in snapshots.values():
+            for name, labels, counts, total in snapshot['histograms']:
+                histogram = Histogram(METRICS[name][1], counts, total)
+                if (name, labels) in histograms:
+                    histograms[(name, labels)].merge(histogram)
+                else:
+                    histograms[(name, labels)] = histogram
+            for name, labels, value in snapshot['counters']:
+                counters[(name, labels)] = counters.get((name, labels), 0) + value
+
+        metrics = {}
+        for (name, labels), histogram in sorted(histograms.items()):
+            count = histogram.count
+            metrics.setdefault(name, []).append({
+                'labels': dict(labels), 'count': count, 'sum': histogram.total,
+                'mean': histogram.total / count if count else None, 'p50': histogram.quantile(.5),
+                'p90': histogram.quantile(.9), 'p99': histogram.quantile(.99),
+            })
+        for (name, labels), value in sorted(counters.items()):
+            metrics.setdefault(name, []).append({'labels': dict(labels), 'value': value})
+        return {'workers': sorted(snapshots), 'metrics': metrics}
+
+
+metrics = Metrics()
+
+
+def task_published(headers=None, **kwargs):
+    """
+    Celery before_task_publish receiver that stamps tasks with their publish time, to measure queue latency.
+    """
+    if headers is not None:
+        headers['billserve_published'] = time.time()
+
+
+def task_started(task_id=None, task=None, **kwargs):
+    """
+    Celery task_prerun receiver that records how long the task was queued and notes when it started.
+    """
+    request = task.request
+    published = getattr(request, 'billserve_published', None) or (getattr(request, 'headers', None) or {}).get(
+        'billserve_published')
+    if published is not None:
+        metrics.observe('task_queue_seconds', max(time.time() - published, 0.0), task=task.name)
+    request.billserve_started = time.perf_counter()
+
+
+def task_finished(task_id=None, task=None, state=None, **kwargs):
+    """
+    Celery task_postrun receiver that records how long the task ran, then flushes if the interval has passed.
+    """
+    started = getattr(task.request, 'billserve_started', None)
+    if started is not None:
+        metrics.observe('task_run_seconds', time.perf_counter() - started, task=task.name)
+    metrics.increment('tasks_total', task=task.name, state=state or 'UNKNOWN')
+    metrics.flush()
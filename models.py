@@ -1,10 +1,12 @@
-from django.db.models import Model
-from django.db.models import CharField, BooleanField, DateTimeField, DateField, IntegerField, TextField, URLField
+from django.db.models import Model, Index
+from django.db.models import CharField, BooleanField, DateTimeField, DateField, FloatField, IntegerField, TextField, \
+    URLField, BinaryField
 from django.db.models import ForeignKey, OneToOneField, ManyToManyField
 from django.db.models import CASCADE, SET_NULL
 from django.db.models import Sum, Case, When
 from polymorphic.models import PolymorphicModel
 from .managers import *
+from .enumerations import FrontierStatus, LegislatorType
 
 
 class Party(Model):
@@ -35,9 +37,41 @@ class Legislator(PolymorphicModel):
     members = ['firstName', 'lastName', 'state', 'party']
     optional_members = ['district', 'isOriginalCosponsor', 'sponsorshipDate']
     objects = LegislatorManager()
+    denormalized_type = None
 
     first_name = CharField(max_length=100)
     last_name = CharField(max_length=100)
+    last_modified = DateTimeField(null=True)
+
+    # Copies of the subclass's columns, kept in sync by save(), so hot read paths can skip the polymorphic upcast and
+    # the child table joins. See LegislatorManager.denormalized().
+    legislator_type = IntegerField(null=True, db_index=True)
+    legislator_party = ForeignKey('Party', related_name='+', on_delete=SET_NULL, null=True)
+    legislator_state = ForeignKey('State', related_name='+', on_delete=SET_NULL, null=True)
+    legislator_chamber = ForeignKey('Chamber', related_name='+', on_delete=SET_NULL, null=True)
+    legislator_district = ForeignKey('District', related_name='+', on_delete=SET_NULL, null=True)
+
+    # Share of cosponsors on this legislator's bills from another party. See analytics.bipartisanship.
+    bipartisanship_score = FloatField(null=True)
+
+    # This legislator's bit position in every RollCall vector, assigned once by LegislatorManager.assign_vote_ordinals
+    # and never reused. None until the legislator first appears in a roll call.
+    vote_ordinal = IntegerField(null=True, unique=True)
+    # Share of party unity votes on which this legislator sided with their party. See analytics.votes.
+    party_unity_score = FloatField(null=True)
+
+    def save(self, *args, **kwargs):
+        if self.denormalized_type is not None:
+            self.legislator_type = self.denormalized_type.value
+            self.legislator_party_id = self.party_id
+            self.legislator_state_id = self.state_id
+            self.legislator_chamber_id = self.legislative_body_id
+            self.legislator_district_id = getattr(self, 'district_id', None)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {
+                    'legislator_type', 'legislator_party', 'legislator_state', 'legislator_chamber',
+                    'legislator_district'}
+        super().save(*args, **kwargs)
 
     def full_name(self):
         return '{first_name} {last_name}'.format(first_name=self.first_name, last_name=self.last_name)
@@ -49,6 +83,24 @@ class Legislator(PolymorphicModel):
         return self.co_sponsored_bills.all()
 
 
+class Collaboration(Model):
+    objects = CollaborationManager()
+
+    # One row per ordered pair of legislators who sponsor or cosponsor a bill together. The row pairing a legislator
+    # with themselves counts all of their bills. See CoOccurrenceManager.
+    legislator = ForeignKey('Legislator', on_delete=CASCADE, related_name='collaborations')
+    collaborator = ForeignKey('Legislator', on_delete=CASCADE, related_name='+')
+    shared_bills = IntegerField(default=0)
+    similarity = FloatField(null=True)
+
+    class Meta:
+        unique_together = ('legislator', 'collaborator')
+        indexes = [Index(fields=['legislator', '-shared_bills']), Index(fields=['legislator', '-similarity'])]
+
+    def __str__(self):
+        return '{legislator} - {collaborator}'.format(legislator=self.legislator, collaborator=self.collaborator)
+
+
 class LegislativeSubjectActivity(Model):
     activity_type = IntegerField(null=True)
     activity_count = IntegerField(default=1)
@@ -64,6 +116,7 @@ class LegislativeSubjectSupportSplit(Model):
     white_count = IntegerField(default=0)
     legislative_subject = OneToOneField('LegislativeSubject', related_name='support_split',
                                                on_delete=CASCADE)
+    last_modified = DateTimeField(null=True)
 
     def __str_(self):
         return '{legislative_subject} - red_count: {rc} blue_count: {bc} white_count: {wc}'\
@@ -72,6 +125,8 @@ class LegislativeSubjectSupportSplit(Model):
 
 
 class Senator(Legislator):
+    denormalized_type = LegislatorType.senator
+
     party = ForeignKey('Party', related_name='senators', on_delete=SET_NULL, null=True)
     legislative_body = ForeignKey('Chamber', related_name='senators', on_delete=SET_NULL, null=True)
     state = ForeignKey('State', related_name='senators', on_delete=SET_NULL, null=True)
@@ -85,6 +140,8 @@ class Senator(Legislator):
 
 
 class Representative(Legislator):
+    denormalized_type = LegislatorType.representative
+
     party = ForeignKey('Party', related_name='representatives', on_delete=SET_NULL, null=True)
     district = ForeignKey('District', related_name='representative', on_delete=SET_NULL, null=True)
     legislative_body = ForeignKey('Chamber', related_name='representatives', on_delete=SET_NULL, null=True)
@@ -121,19 +178,49 @@ class Bill(Model):
     bill_number = IntegerField(null=True)
     congress = IntegerField(null=True)
 
+    # Maintained by BillManager.refresh_counters so bills can be sorted and filtered by support from an index
+    num_sponsors = IntegerField(default=0, db_index=True)
+    num_cosponsors = IntegerField(default=0, db_index=True)
+
+    # Share of cosponsors from a party other than the sponsor's. See analytics.bipartisanship.
+    bipartisanship_score = FloatField(null=True)
+
+    # The lowest primary key among the bills connected to this one through related bills, or None for a bill with
+    # no related bills yet. Only written by BillManager.merge_families and rebuild_families.
+    family_id = IntegerField(null=True, db_index=True)
+
     type = CharField(max_length=10, verbose_name='type of bill (S, HR, HRJRES, etc.)', null=True)
 
     cbo_cost_estimate = URLField(null=True)  # If CBO cost estimate in bill_status
     bill_url = URLField()
 
+    def save(self, *args, **kwargs):
+        # Leave family_id out of updates, so a save() of a stale instance can't undo a concurrent family merge
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name != 'family_id']
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return 'No. {bill_number}: {title}'.format(bill_number=self.bill_number, title=self.title)
 
     def co_sponsor_count(self):
-        return self.cosponsors.all().count()
+        return self.num_cosponsors
 
     def sponsor_count(self):
-        return self.sponsors.all().count()
+        return self.num_sponsors
+
+
+class BillDocument(Model):
+    objects = BillDocumentManager()
+
+    # The bill's detail payload as rendered by BillSerializer, with hyperlinks against documents.SENTINEL_ORIGIN
+    bill = OneToOneField('Bill', on_delete=CASCADE, primary_key=True, related_name='document')
+    payload = TextField()
+    generated = DateTimeField()
+
+    def __str__(self):
+        return 'Document for {bill}'.format(bill=self.bill)
 
 
 class BillSummary(Model):
@@ -184,6 +271,7 @@ class LegislativeSubject(Model):
     objects = LegislativeSubjectManager()
 
     name = CharField(max_length=100)
+    last_modified = DateTimeField(null=True)
 
     def __str__(self):
         return self.name
@@ -205,12 +293,12 @@ class LegislativeSubject(Model):
                 )
             )
 
-        top_sponsors = Legislator.objects.annotate(count=sponsors_count)
+        top_sponsors = Legislator.objects.denormalized().annotate(count=sponsors_count)
         top_sponsors = top_sponsors.filter(count__isnull=False)
         top_sponsors = top_sponsors.order_by('-count')
         top_sponsors = top_sponsors[:5]
 
-        top_cosponsors = Legislator.objects.annotate(count=cosponsors_count)
+        top_cosponsors = Legislator.objects.denormalized().annotate(count=cosponsors_count)
         top_cosponsors = top_cosponsors.filter(count__isnull=False)
         top_cosponsors = top_cosponsors.order_by('-count')
         top_cosponsors = top_cosponsors[:5]
@@ -218,6 +306,111 @@ class LegislativeSubject(Model):
         return top_sponsors, top_cosponsors
 
 
+class SubjectCoOccurrence(Model):
+    objects = SubjectCoOccurrenceManager()
+
+    # One row per ordered pair of legislative subjects tagged on the same bill. The row pairing a subject with itself
+    # counts all of its bills. See CoOccurrenceManager.
+    legislative_subject = ForeignKey('LegislativeSubject', on_delete=CASCADE, related_name='co_occurrences')
+    related_subject = ForeignKey('LegislativeSubject', on_delete=CASCADE, related_name='+')
+    shared_bills = IntegerField(default=0)
+    similarity = FloatField(null=True)
+
+    class Meta:
+        unique_together = ('legislative_subject', 'related_subject')
+        indexes = [Index(fields=['legislative_subject', '-shared_bills']),
+                   Index(fields=['legislative_subject', '-similarity'])]
+
+    def __str__(self):
+        return '{legislative_subject} - {related_subject}'.format(legislative_subject=self.legislative_subject,
+                                                                  related_subject=self.related_subject)
+
+
+class ActivityRollup(Model):
+    objects = ActivityRollupManager()
+
+    # Monthly activity counts per congress, subject or policy area, and party. Bills and sponsorships count in the
+    # month the bill was introduced, cosponsorships in the month they were made. dimension holds a RollupDimension
+    # value and dimension_pk the subject or policy area, or 0 for totals. congress and party_pk are 0 when unknown
+    # rather than NULL, since NULLs never collide in the unique index. See ActivityRollupManager.
+    month = DateField()
+    congress = IntegerField(default=0)
+    dimension = IntegerField()
+    dimension_pk = IntegerField()
+    party_pk = IntegerField(default=0)
+
+    bills = IntegerField(default=0)
+    sponsorships = IntegerField(default=0)
+    cosponsorships = IntegerField(default=0)
+
+    class Meta:
+        # Doubles as the index every time series reads its range from
+        unique_together = ('dimension', 'dimension_pk', 'month', 'congress', 'party_pk')
+
+    def __str__(self):
+        return '{month:%Y-%m} {dimension}:{dimension_pk}'.format(month=self.month, dimension=self.dimension,
+                                                                 dimension_pk=self.dimension_pk)
+
+
+class CrawlFrontier(Model):
+    objects = CrawlFrontierManager()
+
+    # One row for each bill URL a crawl has to populate, so a crawl can be followed and resumed without the broker.
+    # status holds a FrontierStatus value and priority a FrontierPriority value. See CrawlFrontierManager.
+    url = URLField(max_length=255, unique=True)
+    crawl_id = CharField(max_length=32, db_index=True)
+    congress = IntegerField(null=True)
+    collection = CharField(max_length=10, null=True)
+    priority = IntegerField()
+    status = IntegerField(default=FrontierStatus.pending.value)
+    attempts = IntegerField(default=0)
+    last_error = TextField(null=True)
+    bill = ForeignKey('Bill', on_delete=SET_NULL, null=True, related_name='+')
+    created_at = DateTimeField(auto_now_add=True)
+    queued_at = DateTimeField(null=True)
+    started_at = DateTimeField(null=True)
+    finished_at = DateTimeField(null=True)
+
+    class Meta:
+        # Batches are claimed in this order, and progress is counted from it
+        indexes = [Index(fields=['crawl_id', 'status', 'collection', 'priority', 'id']),
+                   Index(fields=['status', 'finished_at'])]
+
+    def __str__(self):
+        return self.url
+
+
+class CollectionCrawl(Model):
+    objects = CollectionCrawlManager()
+
+    # When each bill status collection of each congress was last crawled. See crawls.CrawlScheduler.
+    congress = IntegerField()
+    collection = CharField(max_length=10)
+    crawl_id = CharField(max_length=32)
+    crawled_at = DateTimeField()
+
+    class Meta:
+        unique_together = ('congress', 'collection')
+
+    def __str__(self):
+        return '{congress}/{collection}'.format(congress=self.congress, collection=self.collection)
+
+
+class ChangeEvent(Model):
+    objects = ChangeEventManager()
+
+    # The change feed clients sync from. The primary key is the monotonic sequence number. resource names what
+    # changed, e.g. 'bills' or 'collaborations', and action holds a ChangeAction value. object_pk is the changed row,
+    # or for aggregates the legislator or subject they belong to, and None when the change covers the whole resource.
+    resource = CharField(max_length=50)
+    action = IntegerField()
+    object_pk = IntegerField(null=True)
+    created_at = DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return '{pk}: {resource} {object_pk}'.format(pk=self.pk, resource=self.resource, object_pk=self.object_pk)
+
+
 class Action(Model):
     members = ['actionDate', 'committee', 'text', 'type']
     optional_members = []
@@ -264,6 +457,50 @@ class State(Model):
         return self.abbreviation
 
 
+class RollCall(Model):
+    objects = RollCallManager()
+
+    chamber = ForeignKey('Chamber', on_delete=CASCADE, related_name='roll_calls')
+    congress = IntegerField()
+    session = IntegerField()
+    number = IntegerField()
+    date = DateField(null=True)
+    question = TextField(null=True)
+    result = CharField(max_length=100, null=True)
+    bill = ForeignKey('Bill', on_delete=SET_NULL, null=True, related_name='roll_calls')
+
+    # Each vector is numpy.packbits over legislator vote ordinals: bit n is set if the legislator with vote_ordinal n
+    # cast that vote. size is the number of ordinals that existed when the roll call was stored.
+    size = IntegerField()
+    yeas = BinaryField()
+    nays = BinaryField()
+    present = BinaryField()
+    not_voting = BinaryField()
+
+    vectors = ('yeas', 'nays', 'present', 'not_voting')
+
+    class Meta:
+        unique_together = ('chamber', 'congress', 'session', 'number')
+
+    def vote_for(self, ordinal):
+        """
+        Decodes a single legislator's vote without unpacking the vectors.
+        :param ordinal: The legislator's vote ordinal
+        :return: 'yea', 'nay', 'present' or 'not_voting', or None if the legislator didn't take part
+        """
+        if ordinal is None or ordinal >= self.size:
+            return None
+        index, mask = ordinal >> 3, 0x80 >> (ordinal & 7)
+        for vector in self.vectors:
+            if getattr(self, vector)[index] & mask:
+                return 'yea' if vector == 'yeas' else 'nay' if vector == 'nays' else vector
+        return None
+
+    def __str__(self):
+        return '{chamber} roll call {number}, {congress}-{session}'.format(
+            chamber=self.chamber, number=self.number, congress=self.congress, session=self.session)
+
+
 class Vote(Model):
     legislator = ForeignKey('Legislator', on_delete=CASCADE)
     bill = ForeignKey('Bill', on_delete=CASCADE)
@@ -1,32 +1,67 @@
 from .http import HttpClient
 import xmltodict
 import json
+import re
+from collections import OrderedDict
 from .models.MagicDict import MagicDict
+from billserve.metrics import metrics
+from django.conf import settings
 
 
 class GovinfoClient:
     http = HttpClient()
+    # Every bill status collection govinfo publishes for a congress, as bill types
+    collections = ('s', 'hr', 'sjres', 'hjres', 'sconres', 'hconres', 'sres', 'hres')
+    bill_file = re.compile(r'BILLSTATUS-(?P<congress>\d+)(?P<type>[a-z]+)(?P<number>\d+)\.xml$')
 
     @staticmethod
-    def create_bill_from_url(url):
+    def create_bill_from_url(url, crawl_id=None, refresh=False):
         """
         Creates a bill instance from a baby URL.
         :param url: THe URL of the bill you'd like to create
-        :return: The created bill
+        :param crawl_id: The id of the crawl to add the related bill tasks to, if any
+        :param refresh: Whether to refresh the stored bill at the URL rather than create a new one
+        :return: The created or refreshed bill
         """
         from billserve.models import Bill
         response = GovinfoClient.http.get(url)
-        bill_data_raw = xmltodict.parse(response.data)
+        bill_data = GovinfoClient.parse_bill(response.data, url)
+
+        with metrics.timer('bill_store_seconds'), metrics.queries('bill_store'):
+            bill = Bill.objects.create_from_dict(bill_data, crawl_id=crawl_id, refresh=refresh)
+        metrics.increment('bills_stored_total')
+        return bill
+
+    @staticmethod
+    def parse_bill(xml, url):
+        """
+        Parses and cleans a bill status document into the dictionary BillManager.create_from_dict expects.
+        :param xml: The bill status XML
+        :param url: The URL the XML came from
+        :return: The cleaned bill data
+        """
+        from billserve.models import Bill
+        with metrics.timer('bill_parse_seconds'):
+            # MagicDict only converts OrderedDicts, which newer xmltodict releases no longer return by default
+            bill_data_raw = xmltodict.parse(xml, dict_constructor=OrderedDict)
 
         if 'billStatus' not in bill_data_raw or 'bill' not in bill_data_raw['billStatus']:
             raise KeyError('Malformed XML data found at {url}'.format(url=url))
 
         bill_data_raw = bill_data_raw['billStatus']['bill']
 
-        bill_data = MagicDict(bill_data_raw, Bill.members, Bill.optional_members).cleaned()
+        with metrics.timer('bill_normalize_seconds'):
+            bill_data = MagicDict(bill_data_raw, Bill.members, Bill.optional_members).cleaned()
         bill_data['url'] = url
+        return bill_data
 
-        return Bill.objects.create_from_dict(bill_data)
+    @staticmethod
+    def base_url():
+        """
+        :return: The origin govinfo is reached at, from the BILLSERVE_GOVINFO_BASE_URL setting, without a trailing
+        slash. Point it at networking.fakegovinfo for offline load tests.
+        """
+        return getattr(settings, 'BILLSERVE_GOVINFO_BASE_URL', 'https://www.govinfo.gov').rstrip('/')
 
     @staticmethod
     def create_bill_url(congress, bill_type, number):
@@ -37,9 +72,32 @@ class GovinfoClient:
         :param number: The number of the bill in its congress (987, 314, etc.)
         :return: A URL that points towards the bill's location on GovInfo.
         """
-        return \
-            'https://www.govinfo.gov/bulkdata/BILLSTATUS/{congress}/{type}/BILLSTATUS-{congress}{type}{number}.xml' \
-            .format(congress=congress, type=bill_type.lower(), number=number)
+        return '{base}/bulkdata/BILLSTATUS/{congress}/{type}/BILLSTATUS-{congress}{type}{number}.xml'.format(
+            base=GovinfoClient.base_url(), congress=congress, type=bill_type.lower(), number=number)
+
+    @staticmethod
+    def parse_bill_url(url):
+        """
+        Splits a govinfo bill URL back into its components.
+        :param url: A URL like those create_bill_url generates
+        :return: A tuple of the congress, the lowercase bill type and the bill number, or None if the URL isn't a
+        bill status file
+        """
+        match = GovinfoClient.bill_file.search(url)
+        if match is None:
+            return None
+        return int(match.group('congress')), match.group('type'), int(match.group('number'))
+
+    @staticmethod
+    def create_listing_url(congress, bill_type):
+        """
+        Generates the URL of govinfo's JSON listing of every bill status file of one type in a congress.
+        :param congress: The congress (115, 114, 113, etc.)
+        :param bill_type: The type of the bills (S, HR, etc.)
+        :return: The listing's URL
+        """
+        return '{base}/bulkdata/json/BILLSTATUS/{congress}/{type}'.format(
+            base=GovinfoClient.base_url(), congress=congress, type=bill_type.lower())
 
     @staticmethod
     def create_bill_url_list_from_origin(origin_url):
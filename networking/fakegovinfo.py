@@ -0,0 +1,127 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeGovinfoServer(ThreadingHTTPServer):
+    """
+    A stand-in for govinfo's bulk data service, for offline load tests. It serves BILLSTATUS XML from a corpus laid out
+    like govinfo's, e.g. the output of fixtures/generate_congress.py, and the JSON listings GovinfoClient crawls
+    from. Responses can be slowed down, fail with a 500 or be rate limited with a 429.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, corpus, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, retry_after=1,
+                 seed=None, public_url=None):
+        """
+        :param address: A (host, port) tuple to listen on. Port 0 picks a free port.
+        :param corpus: The directory holding bulkdata/BILLSTATUS/<congress>/<type>/*.xml
+        :param latency: The mean delay added to each response, in seconds
+        :param jitter: The standard deviation of the delay, in seconds
+        :param error_rate: The share of requests answered with a 500
+        :param throttle_rate: The share of requests answered with a 429
+        :param retry_after: The Retry-After header sent with each 429, in seconds
+        :param seed: A seed for the random delays and failures
+        :param public_url: The origin listings link to, if clients can't reach the server at its bound address
+        """
+        super().__init__(address, FakeGovinfoHandler)
+        self.corpus = corpus
+        self.latency, self.jitter = latency, jitter
+        self.error_rate, self.throttle_rate, self.retry_after = error_rate, throttle_rate, retry_after
+        self.public_url = public_url
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {'requests': 0, 'served': 0, 'errors': 0, 'throttled': 0, 'not_found': 0}
+
+    @property
+    def base_url(self):
+        if self.public_url:
+            return self.public_url.rstrip('/')
+        host, port = self.server_address[:2]
+        return 'http://{host}:{port}'.format(host=host, port=port)
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+    def fate(self):
+        """
+        Decides how to treat a request.
+        :return: A tuple of the delay in seconds and one of 'serve', 'error' or 'throttle'
+        """
+        with self.lock:
+            delay = max(self.random.gauss(self.latency, self.jitter), 0.0) if self.jitter else self.latency
+            draw = self.random.random()
+        if draw < self.throttle_rate:
+            return delay, 'throttle'
+        elif draw < self.throttle_rate + self.error_rate:
+            return delay, 'error'
+        return delay, 'serve'
+
+    def start(self):
+        """
+        Serves from a daemon thread.
+        :return: The thread
+        """
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class FakeGovinfoHandler(BaseHTTPRequestHandler):
+    listing = re.compile(r'^/bulkdata/json/BILLSTATUS/(?P<congress>\d+)/(?P<type>[a-z]+)/?$')
+    bill = re.compile(r'^/bulkdata/BILLSTATUS/(?P<congress>\d+)/(?P<type>[a-z]+)/(?P<name>BILLSTATUS-\w+\.xml)$')
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status, body=b'', content_type='text/plain', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        server.count('requests')
+        delay, fate = server.fate()
+        if delay:
+            time.sleep(delay)
+        if fate == 'throttle':
+            server.count('throttled')
+            return self.send(429, b'Too Many Requests', headers={'Retry-After': str(server.retry_after)})
+        elif fate == 'error':
+            server.count('errors')
+            return self.send(500, b'Internal Server Error')
+
+        path = self.path.split('?')[0]
+        listing, bill = self.listing.match(path), self.bill.match(path)
+        if listing:
+            directory = os.path.join(server.corpus, 'bulkdata', 'BILLSTATUS', listing.group('congress'),
+                                     listing.group('type'))
+            if os.path.isdir(directory):
+                files = [{'justFileName': name, 'fileExtension': 'xml', 'folder': False,
+                          'link': '{base}/bulkdata/BILLSTATUS/{congress}/{type}/{name}'.format(
+                              base=server.base_url, congress=listing.group('congress'), type=listing.group('type'),
+                              name=name)}
+                         for name in sorted(os.listdir(directory)) if name.endswith('.xml')]
+                server.count('served')
+                return self.send(200, json.dumps({'files': files}).encode(), 'application/json')
+        elif bill:
+            path = os.path.join(server.corpus, 'bulkdata', 'BILLSTATUS', bill.group('congress'), bill.group('type'),
+                                bill.group('name'))
+            if os.path.isfile(path):
+                with open(path, 'rb') as xml:
+                    body = xml.read()
+                server.count('served')
+                return self.send(200, body, 'application/xml')
+
+        server.count('not_found')
+        self.send(404, b'Not Found')
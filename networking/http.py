@@ -1,5 +1,10 @@
+import time
+
 import urllib3
 import certifi
+from django.conf import settings
+
+from billserve.metrics import metrics
 
 
 class HttpClient:
@@ -9,21 +14,51 @@ class HttpClient:
                  'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8'
                  }
 
+    # Statuses govinfo sends when it wants us to slow down. urllib3's own retries would also resend these when they
+    # carry a Retry-After, so they're left to handle connection errors and redirects only.
+    retry_statuses = {429, 503}
+    __retries = urllib3.Retry(3, respect_retry_after_header=False)
+
     @staticmethod
     def get(url):
         """
-        Requests a web page from Govinfo.
+        Requests a web page from Govinfo. Rate limited requests are retried up to BILLSERVE_GOVINFO_RETRIES times,
+        after the server's Retry-After or an exponential backoff starting at BILLSERVE_GOVINFO_BACKOFF seconds.
         :param url: The URL you'd like to request
         :return: The response from the remote server
         """
-        # The request headers provided are required to access Govinfo resources. I couldn't figure out exactly which
-        # Accept header was required, so I included all three.
-        response = HttpClient.__pool.request('GET', url, headers=HttpClient.__headers)
+        retries = getattr(settings, 'BILLSERVE_GOVINFO_RETRIES', 3)
+        for attempt in range(retries + 1):
+            # The request headers provided are required to access Govinfo resources. I couldn't figure out exactly
+            # which Accept header was required, so I included all three.
+            with metrics.timer('govinfo_fetch_seconds'):
+                response = HttpClient.__pool.request('GET', url, headers=HttpClient.__headers,
+                                                     retries=HttpClient.__retries)
+            if response.status not in HttpClient.retry_statuses or attempt == retries:
+                break
+            metrics.increment('govinfo_retries_total', status=response.status)
+            time.sleep(HttpClient.retry_delay(response, attempt))
+
+        metrics.observe('govinfo_fetch_bytes', len(response.data))
+        metrics.increment('govinfo_fetched_bytes_total', len(response.data))
         if response.status != 200:
             raise urllib3.exceptions.HTTPError('Bad status encountered while requesting url {url}: {status}'
                                                .format(url=url, status=response.status))
         return response
 
+    @staticmethod
+    def retry_delay(response, attempt):
+        """
+        :param response: A rate limited response
+        :param attempt: The number of retries already made
+        :return: The seconds to wait before retrying, capped at BILLSERVE_GOVINFO_MAX_BACKOFF
+        """
+        maximum = getattr(settings, 'BILLSERVE_GOVINFO_MAX_BACKOFF', 60.0)
+        retry_after = response.headers.get('Retry-After')
+        if retry_after is not None and retry_after.strip().isdigit():
+            return min(float(retry_after), maximum)
+        return min(getattr(settings, 'BILLSERVE_GOVINFO_BACKOFF', 0.5) * 2 ** attempt, maximum)
+
     @staticmethod
     def http_to_https(url):
         """
@@ -0,0 +1,115 @@
+import datetime
+import re
+
+import xmltodict
+
+
+class RollCallParser:
+    """
+    Reads roll call vote XML, either the House Clerk's rollcall-vote format or the Senate's roll_call_vote format, into
+    a plain dictionary for RollCallManager.create_from_dict.
+    """
+    votes = {
+        'Yea': 'yea', 'Aye': 'yea', 'Guilty': 'yea',
+        'Nay': 'nay', 'No': 'nay', 'Not Guilty': 'nay',
+        'Present': 'present',
+        'Not Voting': 'not_voting',
+    }
+
+    @staticmethod
+    def parse(xml):
+        """
+        Parses a roll call vote in either chamber's format.
+        :param xml: The XML document, as a string or bytes
+        :return: A dictionary describing the roll call and how each member voted
+        """
+        data = xmltodict.parse(xml, force_list=('recorded-vote', 'member'))
+        if 'rollcall-vote' in data:
+            return RollCallParser.parse_house(data['rollcall-vote'])
+        elif 'roll_call_vote' in data:
+            return RollCallParser.parse_senate(data['roll_call_vote'])
+        raise KeyError('Unrecognized roll call vote XML')
+
+    @staticmethod
+    def leading_number(string):
+        """
+        :param string: A string starting with a number, e.g. '1st'
+        :return: The number
+        """
+        return int(re.match(r'\s*(\d+)', string).group(1))
+
+    @staticmethod
+    def bill(bill_type, number):
+        """
+        :param bill_type: A bill type as printed in roll call XML, e.g. 'H R' or 'S.'
+        :param number: The bill number
+        :return: A dictionary with the bill's type and number as stored on Bill, or None if there is no bill
+        """
+        if not bill_type or not number:
+            return None
+        return {'type': re.sub(r'[^A-Za-z]', '', bill_type).upper(), 'number': RollCallParser.leading_number(number)}
+
+    @staticmethod
+    def parse_house(vote):
+        """
+        :param vote: The parsed rollcall-vote element of a House Clerk roll call
+        :return: A dictionary describing the roll call
+        """
+        metadata = vote['vote-metadata']
+        bill_type, _, number = (metadata.get('legis-num') or '').rpartition(' ')
+
+        members = []
+        for recorded_vote in vote['vote-data']['recorded-vote']:
+            legislator = recorded_vote['legislator']
+            name = legislator.get('@unaccented-name') or legislator.get('#text') or ''
+            members.append({
+                'first_name': None,
+                # Members sharing a surname are printed as 'Smith (NJ)'
+                'last_name': re.sub(r'\s*\(.*\)$', '', name),
+                'state': legislator.get('@state'),
+                'party': legislator.get('@party'),
+                'vote': RollCallParser.votes.get(recorded_vote.get('vote')),
+            })
+
+        return {
+            'chamber': 'House',
+            'congress': int(metadata['congress']),
+            'session': RollCallParser.leading_number(metadata['session']),
+            'number': int(metadata['rollcall-num']),
+            'date': datetime.datetime.strptime(metadata['action-date'], '%d-%b-%Y').date(),
+            'question': metadata.get('vote-question'),
+            'result': metadata.get('vote-result'),
+            'bill': RollCallParser.bill(bill_type, number),
+            'members': members,
+        }
+
+    @staticmethod
+    def parse_senate(vote):
+        """
+        :param vote: The parsed roll_call_vote element of a Senate roll call
+        :return: A dictionary describing the roll call
+        """
+        document = vote.get('document') or {}
+        # Dates look like 'January 3, 2017,  12:00 PM'
+        month_day, year = [part.strip() for part in vote['vote_date'].split(',')[:2]]
+
+        members = [{
+            'first_name': member.get('first_name'),
+            'last_name': member.get('last_name'),
+            'state': member.get('state'),
+            'party': member.get('party'),
+            'vote': RollCallParser.votes.get(member.get('vote_cast')),
+        } for member in vote['members']['member']]
+
+        return {
+            'chamber': 'Senate',
+            'congress': int(vote['congress']),
+            'session': RollCallParser.leading_number(vote['session']),
+            'number': int(vote['vote_number']),
+            'date': datetime.datetime.strptime('{month_day} {year}'.format(month_day=month_day, year=year),
+                                               '%B %d %Y').date(),
+            'question': vote.get('vote_question_text') or vote.get('question'),
+            'result': vote.get('vote_result'),
+            'bill': RollCallParser.bill(document.get('document_type'), document.get('document_number')),
+            'members': members,
+        }
@@ -0,0 +1,119 @@
+import cProfile
+import functools
+import itertools
+import logging
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.utils.decorators import method_decorator
+
+logger = logging.getLogger(__name__)
+
+counters = {}
+sequence = itertools.count()
+state = threading.local()
+
+
+def targets():
+    """
+    :return: The set of names to profile, from the BILLSERVE_PROFILE setting or, failing that, the comma separated
+    BILLSERVE_PROFILE environment variable. '*' profiles every decorated task and view.
+    """
+    names = getattr(settings, 'BILLSERVE_PROFILE', None)
+    if names is None:
+        names = os.environ.get('BILLSERVE_PROFILE', '')
+    if isinstance(names, str):
+        names = names.split(',')
+    return {name.strip() for name in names if name.strip()}
+
+
+def option(name, default):
+    """
+    :return: A profiling option from settings, then the environment, then the default
+    """
+    value = getattr(settings, name, None)
+    if value is None:
+        value = os.environ.get(name)
+        if value is not None and isinstance(default, bool):
+            return value.lower() in ('1', 'true', 'yes', 'on')
+    return default if value is None else type(default)(value)
+
+
+def sampled(name):
+    """
+    Decides whether this invocation of a target is profiled, for 1 in every BILLSERVE_PROFILE_SAMPLE_RATE.
+    :param name: The target's name
+    :return: True if it should be profiled
+    """
+    rate = max(option('BILLSERVE_PROFILE_SAMPLE_RATE', 1), 1)
+    counter = counters.setdefault(name, itertools.count())
+    return next(counter) % rate == 0
+
+
+def write_allocations(path, snapshot, peak, top):
+    with open(path, 'w') as output:
+        output.write('Peak traced memory: {peak} bytes\n'.format(peak=peak))
+        output.write('Top {top} allocations by line:\n'.format(top=top))
+        for statistic in snapshot.statistics('lineno')[:top]:
+            output.write('{statistic}\n'.format(statistic=statistic))
+
+
+def profiled(name):
+    """
+    Builds a decorator that profiles a function with cProfile, and with tracemalloc if BILLSERVE_PROFILE_MEMORY is
+    set, whenever name is one of the targets. Each profiled invocation writes a pstats file, and an allocations
+    report next to it, to BILLSERVE_PROFILE_DIR. Untargeted calls cost a settings lookup. Calls made while another
+    profile is running on the same thread aren't profiled separately, since they show up in the outer profile.
+    :param name: The name the function is targeted by, e.g. 'populate_bill' or 'BillDetail'
+    :return: A decorator
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            names = targets()
+            if getattr(state, 'active', False) or (name not in names and '*' not in names) or not sampled(name):
+                return function(*args, **kwargs)
+
+            directory = option('BILLSERVE_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'billserve-profiles'))
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, '{name}-{time}-{pid}'.format(
+                name=name, time=time.strftime('%Y%m%dT%H%M%S'), pid=os.getpid()))
+            path = '{path}-{n}'.format(path=path, n=next(sequence))
+
+            memory = option('BILLSERVE_PROFILE_MEMORY', False)
+            started_tracing = memory and not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            elif memory:
+                tracemalloc.reset_peak()
+
+            profile = cProfile.Profile()
+            state.active = True
+            try:
+                return profile.runcall(function, *args, **kwargs)
+            finally:
+                state.active = False
+                profile.dump_stats(path + '.pstats')
+                if memory:
+                    snapshot = tracemalloc.take_snapshot()
+                    peak = tracemalloc.get_traced_memory()[1]
+                    if started_tracing:
+                        tracemalloc.stop()
+                    write_allocations(path + '.allocations.txt', snapshot, peak,
+                                      option('BILLSERVE_PROFILE_TOP', 25))
+                logger.info('Wrote profile of %s to %s.pstats', name, path)
+        return wrapper
+    return decorator
+
+
+def profiled_view(name):
+    """
+    Builds a class decorator that profiles a class-based view's dispatch.
+    :param name: The name the view is targeted by
+    :return: A class decorator
+    """
+    return method_decorator(profiled(name), name='dispatch')
@@ -0,0 +1,189 @@
+import logging
+import sys
+import threading
+import time
+import uuid
+from collections import namedtuple
+from types import MappingProxyType
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+PartyRecord = namedtuple('PartyRecord', ['pk', 'name', 'abbreviation'])
+StateRecord = namedtuple('StateRecord', ['pk', 'name', 'abbreviation'])
+ChamberRecord = namedtuple('ChamberRecord', ['pk', 'name', 'abbreviation'])
+PolicyAreaRecord = namedtuple('PolicyAreaRecord', ['pk', 'name'])
+
+
+def deep_size(value, seen=None):
+    """
+    Estimates the memory used by an object and everything it contains.
+    :param value: The object to measure
+    :param seen: The ids of objects already counted
+    :return: The estimated size in bytes
+    """
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    size = sys.getsizeof(value)
+    if isinstance(value, MappingProxyType):
+        value = dict(value)
+        size += sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_size(key, seen) + deep_size(item, seen) for key, item in value.items())
+    elif isinstance(value, (tuple, list, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in value)
+    return size
+
+
+class ReferenceTables:
+    """
+    An immutable snapshot of the small reference tables: parties, states, chambers and policy areas. Records are
+    named tuples and every index is a read-only mapping, so a snapshot can be shared between threads.
+    """
+    def __init__(self, version):
+        """
+        Loads a snapshot from the database.
+        :param version: The data version the snapshot was loaded at
+        """
+        from .models import Party, State, Chamber, PolicyArea
+
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+        parties = [PartyRecord(*row) for row in Party.objects.values_list('pk', 'name', 'abbreviation')]
+        states = [StateRecord(*row) for row in State.objects.values_list('pk', 'name', 'abbreviation')]
+        chambers = [ChamberRecord(*row) for row in Chamber.objects.values_list('pk', 'name', 'abbreviation')]
+        policy_areas = [PolicyAreaRecord(*row) for row in PolicyArea.objects.values_list('pk', 'name')]
+
+        self.parties = MappingProxyType({party.pk: party for party in parties})
+        self.parties_by_abbreviation = MappingProxyType({party.abbreviation: party for party in parties})
+        self.states = MappingProxyType({state.pk: state for state in states})
+        self.states_by_abbreviation = MappingProxyType({state.abbreviation: state for state in states})
+        self.chambers = MappingProxyType({chamber.pk: chamber for chamber in chambers})
+        self.chambers_by_name = MappingProxyType({chamber.name: chamber for chamber in chambers})
+        self.policy_areas = MappingProxyType({policy_area.pk: policy_area for policy_area in policy_areas})
+
+    def footprint(self):
+        """
+        :return: The estimated memory used by the snapshot, in bytes
+        """
+        return deep_size([self.parties, self.parties_by_abbreviation, self.states, self.states_by_abbreviation,
+                          self.chambers, self.chambers_by_name, self.policy_areas])
+
+
+class ReferenceRegistry:
+    """
+    A process-wide holder of the current ReferenceTables snapshot. Every write to a reference table bumps a data
+    version in the cache, and the registry reloads its snapshot when it sees the version change. It checks the
+    cache at most once every BILLSERVE_REFERENCE_CHECK_INTERVAL seconds. Writes in this process invalidate it
+    immediately. Other processes only see new versions through a shared cache backend.
+    """
+    version_key = 'billserve:reference-data-version'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tables = None
+        self.checked_at = None
+
+    @staticmethod
+    def check_interval():
+        return getattr(settings, 'BILLSERVE_REFERENCE_CHECK_INTERVAL', 1.0)
+
+    def data_version(self):
+        """
+        :return: The current data version from the cache, creating one if the cache has none
+        """
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, uuid.uuid4().hex, None)
+            version = cache.get(self.version_key)
+        return version
+
+    def bump(self):
+        """
+        Records that the reference tables changed, so every registry reloads.
+        """
+        cache.set(self.version_key, uuid.uuid4().hex, None)
+        self.checked_at = None
+
+    def current(self):
+        """
+        :return: The current ReferenceTables snapshot, reloaded first if the data version changed
+        """
+        tables, checked_at = self.tables, self.checked_at
+        if tables is not None and checked_at is not None and \
+                time.monotonic() - checked_at < self.check_interval():
+            return tables
+
+        version = self.data_version()
+        with self.lock:
+            if self.tables is None or self.tables.version != version:
+                self.tables = ReferenceTables(version)
+                logger.info('Loaded reference data version %s: %d bytes', version, self.tables.footprint())
+            self.checked_at = time.monotonic()
+            return self.tables
+
+    def reload(self):
+        """
+        Reloads the snapshot unconditionally, e.g. after a lookup missed.
+        :return: The new ReferenceTables snapshot
+        """
+        with self.lock:
+            self.tables = ReferenceTables(self.data_version())
+            self.checked_at = time.monotonic()
+            return self.tables
+
+    def lookup(self, index, key, model):
+        """
+        Looks a record up in one of the snapshot's indexes, reloading once if it isn't there.
+        :param index: The name of the index, e.g. 'states_by_abbreviation'
+        :param key: The key to look up
+        :param model: The model the index covers, for the exception raised on a miss
+        :return: The record
+        """
+        records = getattr(self.current(), index)
+        if key not in records:
+            records = getattr(self.reload(), index)
+            if key not in records:
+                raise model.DoesNotExist('{model} matching {key} does not exist.'.format(
+                    model=model.__name__, key=key))
+        return records[key]
+
+    def party(self, pk):
+        from .models import Party
+        return self.lookup('parties', pk, Party)
+
+    def party_by_abbreviation(self, abbreviation):
+        from .models import Party
+        return self.lookup('parties_by_abbreviation', abbreviation, Party)
+
+    def state(self, pk):
+        from .models import State
+        return self.lookup('states', pk, State)
+
+    def state_by_abbreviation(self, abbreviation):
+        from .models import State
+        return self.lookup('states_by_abbreviation', abbreviation, State)
+
+    def chamber_by_name(self, name):
+        from .models import Chamber
+        return self.lookup('chambers_by_name', name, Chamber)
+
+    def policy_area(self, pk):
+        from .models import PolicyArea
+        return self.lookup('policy_areas', pk, PolicyArea)
+
+
+reference_data = ReferenceRegistry()
+
+
+def reference_data_changed(sender, **kwargs):
+    """
+    Signal receiver that bumps the reference data version whenever a reference table is written.
+    """
+    reference_data.bump()
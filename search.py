@@ -0,0 +1,147 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import strip_tags
+
+
+class BillSearchIndex:
+    """
+    A full-text index over bill titles and summary text. SQLite databases get an FTS5 virtual table and PostgreSQL
+    databases get a tsvector table with a GIN index. Other backends fall back to a substring search.
+    """
+    table = 'billserve_bill_search'
+    title_weight = 2.0
+    summary_weight = 1.0
+
+    @staticmethod
+    def vendor():
+        """
+        :return: The database vendor of the default connection, e.g. 'sqlite' or 'postgresql'
+        """
+        return connection.vendor
+
+    @staticmethod
+    def create():
+        """
+        Creates the index table if it doesn't exist yet. Safe to call repeatedly.
+        """
+        vendor = BillSearchIndex.vendor()
+        with connection.cursor() as cursor:
+            if vendor == 'sqlite':
+                cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(title, summaries, "
+                               "tokenize='porter unicode61')".format(table=BillSearchIndex.table))
+            elif vendor == 'postgresql':
+                from .models import Bill
+                cursor.execute('CREATE TABLE IF NOT EXISTS {table} ('
+                               'bill_id integer PRIMARY KEY REFERENCES {bill_table} (id) ON DELETE CASCADE, '
+                               'document tsvector NOT NULL)'
+                               .format(table=BillSearchIndex.table, bill_table=Bill._meta.db_table))
+                cursor.execute('CREATE INDEX IF NOT EXISTS {table}_document ON {table} USING GIN (document)'
+                               .format(table=BillSearchIndex.table))
+
+    @staticmethod
+    def update(bill):
+        """
+        Writes a bill's title and summaries into the index, replacing whatever was there for that bill.
+        :param bill: The bill to index
+        """
+        vendor = BillSearchIndex.vendor()
+        if vendor not in {'sqlite', 'postgresql'}:
+            return
+
+        title = bill.title or ''
+        summaries = ' '.join(strip_tags(text) for text in bill.bill_summaries.values_list('text', flat=True))
+
+        with connection.cursor() as cursor:
+            if vendor == 'sqlite':
+                cursor.execute('DELETE FROM {table} WHERE rowid = %s'.format(table=BillSearchIndex.table), [bill.pk])
+                cursor.execute('INSERT INTO {table} (rowid, title, summaries) VALUES (%s, %s, %s)'
+                               .format(table=BillSearchIndex.table), [bill.pk, title, summaries])
+            else:
+                cursor.execute("INSERT INTO {table} (bill_id, document) VALUES "
+                               "(%s, setweight(to_tsvector('english', %s), 'A') || "
+                               "setweight(to_tsvector('english', %s), 'B')) "
+                               "ON CONFLICT (bill_id) DO UPDATE SET document = EXCLUDED.document"
+                               .format(table=BillSearchIndex.table), [bill.pk, title, summaries])
+
+    @staticmethod
+    def delete(pk):
+        """
+        Removes a deleted bill from the index. PostgreSQL does this itself through the foreign key, but FTS5 tables
+        can't have one, and SQLite may hand a deleted bill's primary key to the next bill created.
+        :param pk: The primary key of the bill
+        """
+        if BillSearchIndex.vendor() == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('DELETE FROM {table} WHERE rowid = %s'.format(table=BillSearchIndex.table), [pk])
+
+    @staticmethod
+    def rebuild():
+        """
+        Re-indexes every bill in the database, dropping whatever the index held for bills that no longer exist.
+        :return: The number of bills indexed
+        """
+        from .models import Bill
+
+        BillSearchIndex.create()
+        if BillSearchIndex.vendor() == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('DELETE FROM {table}'.format(table=BillSearchIndex.table))
+        count = 0
+        for bill in Bill.objects.all().iterator():
+            BillSearchIndex.update(bill)
+            count += 1
+        return count
+
+    @staticmethod
+    def match_expression(query):
+        """
+        Converts free text into an FTS5 match expression that requires every word, so user input can never be
+        interpreted as FTS5 query syntax.
+        :param query: The raw search string
+        :return: The match expression, or None if the query has no searchable words
+        """
+        words = re.findall(r'\w+', query)
+        if not words:
+            return None
+        return ' '.join('"{word}"'.format(word=word) for word in words)
+
+    @staticmethod
+    def search(queryset, query):
+        """
+        Restricts a bill queryset to bills matching a search string and orders it by relevance.
+        :param queryset: A queryset of bills
+        :param query: The raw search string
+        :return: The filtered queryset, most relevant bills first
+        """
+        from .models import Bill
+
+        vendor = BillSearchIndex.vendor()
+        table = BillSearchIndex.table
+        bill_id = '{bill_table}.id'.format(bill_table=Bill._meta.db_table)
+
+        if vendor == 'sqlite':
+            match = BillSearchIndex.match_expression(query)
+            if match is None:
+                return queryset.none()
+            matches = '{bill_id} IN (SELECT rowid FROM {table} WHERE {table} MATCH %s)'.format(bill_id=bill_id,
+                                                                                              table=table)
+            rank = RawSQL('SELECT bm25({table}, {title_weight}, {summary_weight}) FROM {table} '
+                          'WHERE {table} MATCH %s AND rowid = {bill_id}'
+                          .format(table=table, title_weight=BillSearchIndex.title_weight,
+                                  summary_weight=BillSearchIndex.summary_weight, bill_id=bill_id), (match,))
+            # A plain pk__in RawSQL would be wrapped in a second pair of parentheses, which SQLite reads as a
+            # scalar subquery returning only the first match. bm25() scores better matches with more negative numbers.
+            queryset = queryset.extra(where=[matches], params=[match])
+            return queryset.annotate(search_rank=rank).order_by('search_rank', 'pk')
+        elif vendor == 'postgresql':
+            matches = "{bill_id} IN (SELECT bill_id FROM {table} WHERE document @@ plainto_tsquery('english', %s))"\
+                .format(bill_id=bill_id, table=table)
+            rank = RawSQL("SELECT ts_rank(document, plainto_tsquery('english', %s)) FROM {table} "
+                          "WHERE bill_id = {bill_id}".format(table=table, bill_id=bill_id), (query,))
+            queryset = queryset.extra(where=[matches], params=[query])
+            return queryset.annotate(search_rank=rank).order_by('-search_rank', 'pk')
+        else:
+            return queryset.filter(Q(title__icontains=query) | Q(bill_summaries__text__icontains=query)).distinct()
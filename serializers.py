@@ -1,6 +1,8 @@
 from .models import *
+from django.urls import reverse as django_reverse, get_script_prefix
 from rest_framework import serializers
-from billserve.enumerations import LegislativeSubjectActivityType
+from billserve.enumerations import LegislativeSubjectActivityType, LegislatorType
+from billserve.registry import reference_data
 
 
 class PolicyAreaShortSerializer(serializers.HyperlinkedModelSerializer):
@@ -72,7 +74,7 @@ class SenatorSerializer(serializers.ModelSerializer):
     class Meta:
         model = Senator
         fields = ('party', 'legislative_body', 'state', 'committees', 'first_name', 'last_name',
-                  'cosponsored_bills', 'sponsored_bills')
+                  'cosponsored_bills', 'sponsored_bills', 'bipartisanship_score', 'party_unity_score')
 
 
 class RepresentativeSerializer(serializers.ModelSerializer):
@@ -84,7 +86,7 @@ class RepresentativeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Representative
         fields = ('party', 'legislative_body', 'state', 'committees', 'first_name', 'last_name', 'district',
-                  'sponsored_bills', 'cosponsored_bills')
+                  'sponsored_bills', 'cosponsored_bills', 'bipartisanship_score', 'party_unity_score')
 
 
 class PartySerializer(serializers.ModelSerializer):
@@ -148,6 +150,37 @@ class LegislatorListSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class LegislatorSummarySerializer(serializers.BaseSerializer):
+    """
+    Produces the same output as LegislatorListSerializer from plain Legislator instances, using the denormalized
+    columns instead of the subclass. Pair it with LegislatorManager.denormalized() to skip the polymorphic upcast.
+    """
+    def to_representation(self, instance):
+        if not hasattr(self, 'row_serializer'):
+            self.row_serializer = LegislatorListRowSerializer(self.context['request'], self.context.get('format'))
+        return self.row_serializer.to_representation(self.row_serializer.row_for(instance))
+
+
+class LegislatorDetailSerializer(serializers.ModelSerializer):
+    def to_representation(self, instance):
+        """
+        Serializes a legislator with the detail serializer for its subclass, the way LegislatorListSerializer does
+        with the short ones.
+        :param instance: The senator or representative instance
+        :return: The serialized legislator instance as its subclass
+        """
+        if isinstance(instance, Representative):
+            return RepresentativeSerializer(instance=instance, context=self.context).data
+        elif isinstance(instance, Senator):
+            return SenatorSerializer(instance=instance, context=self.context).data
+        else:
+            return LegislatorSerializer(instance=instance, context=self.context).data
+
+    class Meta:
+        model = Legislator
+        fields = '__all__'
+
+
 class LegislativeSubjectShortSerializer(serializers.HyperlinkedModelSerializer):
     class Meta:
         model = LegislativeSubject
@@ -164,10 +197,12 @@ class LegislativeSubjectSerializer(serializers.ModelSerializer):
     bills = BillShortSerializer(many=True)
     support_split = LegislativeSubjectSupportSplitSerializer()
     active_legislators = serializers.SerializerMethodField()
+    related_subjects = serializers.SerializerMethodField()
+    related_subject_count = 10
 
     class Meta:
         model = LegislativeSubject
-        fields = ('name', 'bills', 'active_legislators', 'support_split')
+        fields = ('name', 'bills', 'active_legislators', 'support_split', 'related_subjects')
 
     def get_active_legislators(self, obj):
         """
@@ -185,6 +220,18 @@ class LegislativeSubjectSerializer(serializers.ModelSerializer):
             'top_cosponsors': self.json_list_for(top_cosponsors)
         }
 
+    def get_related_subjects(self, obj):
+        """
+        Gets the subjects most often tagged on the same bills as the given subject, from the co-occurrence index.
+        :param obj: The legislative subject
+        :return: A list of related subjects, most bills shared first, with their shared bill counts and similarities
+        """
+        top = SubjectCoOccurrence.objects.top(obj.pk, self.related_subject_count)
+        names = LegislativeSubject.objects.in_bulk([pk for pk, shared, similarity in top])
+        serializer = LegislativeSubjectShortSerializer(context=self.context)
+        return [dict(serializer.to_representation(names[pk]), shared_bills=shared, similarity=similarity)
+                for pk, shared, similarity in top]
+
     def json_list_for(self, legislators):
         """
         Convenience method for converting raw legislator instances into their serialized format.
@@ -193,10 +240,11 @@ class LegislativeSubjectSerializer(serializers.ModelSerializer):
         """
         res = []
 
+        serializer = LegislatorSummarySerializer(context=self.context)
+
         for legislator in legislators:
-            serialized_legislator = LegislatorListSerializer(instance=legislator, context=self.context)
             data = {
-                'legislator': serialized_legislator.data,
+                'legislator': serializer.to_representation(legislator),
                 'count': legislator.count
             }
             res.append(data)
@@ -220,8 +268,8 @@ class BillSummarySerializer(serializers.ModelSerializer):
 
 class BillSerializer(serializers.ModelSerializer):
     related_bills = BillShortSerializer(many=True)
-    sponsors = LegislatorListSerializer(many=True)
-    cosponsors = LegislatorListSerializer(many=True)
+    sponsors = LegislatorSummarySerializer(many=True)
+    cosponsors = LegislatorSummarySerializer(many=True)
     legislative_subjects = LegislativeSubjectShortSerializer(many=True)
     policy_area = PolicyAreaShortSerializer()
     bill_summaries = BillSummarySerializer(many=True)
@@ -231,7 +279,7 @@ class BillSerializer(serializers.ModelSerializer):
         model = Bill
         fields = ('sponsors', 'cosponsors', 'policy_area', 'legislative_subjects', 'related_bills', 'committees',
                   'originating_body', 'support_splits', 'title', 'bill_summaries', 'introduction_date', 'last_modified',
-                  'bill_number', 'congress', 'type', 'cbo_cost_estimate', 'url', 'bill_url')
+                  'bill_number', 'congress', 'type', 'cbo_cost_estimate', 'url', 'bill_url', 'bipartisanship_score')
         depth = 1
 
     def get_support_splits(self, obj):
@@ -259,6 +307,8 @@ class BillSerializer(serializers.ModelSerializer):
                 """
                 return {'red_count': self.red_count, 'blue_count': self.blue_count, 'white_count': self.white_count}
 
+        party_pks = self.party_pks()
+
         def generate_split(legislators):
             """
             Generates the distribution of republican, democrat and independent congresspeople involved with a bill.
@@ -266,20 +316,17 @@ class BillSerializer(serializers.ModelSerializer):
             :return: The counts of republicans, democrats and independents
             """
             red_count = blue_count = white_count = 0
-            republican_party = Party.objects.get(abbreviation="R")
-            democratic_party = Party.objects.get(abbreviation="D")
-            independent_party = Party.objects.get(abbreviation="I")
 
             for legislator in legislators:
-                legislator_party = legislator.party
-                if legislator_party == republican_party:
+                legislator_party_pk = legislator.legislator_party_id
+                if legislator_party_pk == party_pks['R']:
                     red_count += 1
-                elif legislator_party == democratic_party:
+                elif legislator_party_pk == party_pks['D']:
                     blue_count += 1
-                elif legislator_party == independent_party:
+                elif legislator_party_pk == party_pks['I']:
                     white_count += 1
                 else:
-                    raise ValueError('Unexpected party encountered: {p}'.format(p=legislator_party))
+                    raise ValueError('Unexpected party encountered: {p}'.format(p=legislator_party_pk))
 
             return SupportSplit(red_count=red_count, blue_count=blue_count, white_count=white_count)
 
@@ -288,6 +335,16 @@ class BillSerializer(serializers.ModelSerializer):
 
         return {'cosponsorship_split': cosponsorship_split.as_dict(), 'sponsorship_split': sponsorship_split.as_dict()}
 
+    @staticmethod
+    def party_pks():
+        """
+        Looks up the primary keys of the republican, democratic and independent parties in the reference data
+        registry, rather than in the database.
+        :return: A dictionary of party primary keys by abbreviation
+        """
+        return {abbreviation: reference_data.party_by_abbreviation(abbreviation).pk
+                for abbreviation in ('R', 'D', 'I')}
+
 
 class CommitteeSerializer(serializers.ModelSerializer):
     class Meta:
@@ -305,3 +362,236 @@ class VoteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Vote
         fields = ('yea', 'pk')
+
+
+class RollCallVoteSerializer(serializers.ModelSerializer):
+    """
+    One roll call as seen from a single legislator's voting record. The legislator's vote ordinal is passed in the
+    context as 'vote_ordinal', and only their bit of each vector is decoded.
+    """
+    bill = serializers.HyperlinkedRelatedField(view_name='bill-detail', read_only=True)
+    vote = serializers.SerializerMethodField()
+
+    class Meta:
+        model = RollCall
+        fields = ('congress', 'session', 'number', 'date', 'question', 'result', 'bill', 'vote')
+
+    def get_vote(self, obj):
+        return obj.vote_for(self.context['vote_ordinal'])
+
+
+class HyperlinkTemplate:
+    """
+    A detail URL that's reversed once and then formatted for each primary key, rather than calling reverse() for
+    every object the way hyperlinked fields do.
+    """
+    placeholder = '987654321'
+    paths = {}
+
+    def __init__(self, view_name, request, format=None):
+        """
+        Initializes a hyperlink template for the given route and request.
+        :param view_name: The name of the detail route, e.g. 'bill-detail'
+        :param request: The request the URLs are built for. Supplies the scheme and host.
+        :param format: The format suffix of the request, if any
+        """
+        key = (view_name, format, get_script_prefix())
+        if key not in HyperlinkTemplate.paths:
+            kwargs = {'pk': HyperlinkTemplate.placeholder}
+            if format is not None:
+                kwargs['format'] = format
+            HyperlinkTemplate.paths[key] = django_reverse(view_name, kwargs=kwargs)
+
+        url = request.build_absolute_uri(HyperlinkTemplate.paths[key])
+        self.prefix, _, self.suffix = url.rpartition(HyperlinkTemplate.placeholder)
+
+    def url(self, pk):
+        """
+        :param pk: The primary key of the linked object
+        :return: The absolute URL of the linked object
+        """
+        return self.prefix + str(pk) + self.suffix
+
+
+class RowSerializer:
+    """
+    Base class for serializers that build output from values_list() rows instead of model instances. Each subclass
+    produces exactly what its hyperlinked model serializer counterpart produces.
+    """
+    fields = ()
+
+    def __init__(self, request, format=None):
+        self.request = request
+        self.format = format
+
+    def rows(self, queryset):
+        """
+        :param queryset: A queryset of the serializer's model
+        :return: The queryset as tuples of the serializer's fields
+        """
+        return queryset.values_list(*self.fields)
+
+    def to_representation(self, row):
+        raise NotImplementedError
+
+    def many(self, rows):
+        """
+        :param rows: An iterable of rows from rows()
+        :return: A list of serialized rows
+        """
+        return [self.to_representation(row) for row in rows]
+
+
+class BillShortRowSerializer(RowSerializer):
+    """
+    Row based equivalent of BillShortSerializer.
+    """
+    fields = ('pk', 'bill_number', 'title', 'introduction_date', 'policy_area_id')
+
+    def __init__(self, request, format=None):
+        super().__init__(request, format)
+        self.bill_urls = HyperlinkTemplate('bill-detail', request, format)
+        self.policy_area_urls = HyperlinkTemplate('policyarea-detail', request, format)
+        self.date = serializers.DateField().to_representation
+
+    def to_representation(self, row):
+        pk, bill_number, title, introduction_date, policy_area_pk = row
+
+        if policy_area_pk is None:
+            policy_area = None
+        else:
+            policy_area = {'name': reference_data.policy_area(policy_area_pk).name,
+                           'url': self.policy_area_urls.url(policy_area_pk)}
+
+        return {
+            'title': 'No. {bill_number}: {title}'.format(bill_number=bill_number, title=title),
+            'introduction_date': None if introduction_date is None else self.date(introduction_date),
+            'policy_area': policy_area,
+            'url': self.bill_urls.url(pk)
+        }
+
+
+class LegislatorShortRowSerializer(RowSerializer):
+    """
+    Shared pieces of the row based senator and representative serializers. Party and state abbreviations come from
+    the reference data registry rather than a join.
+    """
+    def __init__(self, request, format=None):
+        super().__init__(request, format)
+        self.party_urls = HyperlinkTemplate('party-detail', request, format)
+        self.state_urls = HyperlinkTemplate('state-detail', request, format)
+
+    @staticmethod
+    def abbreviations(party_pk, state_pk):
+        """
+        :param party_pk: The primary key of a party, or None
+        :param state_pk: The primary key of a state, or None
+        :return: A tuple of the party and state abbreviations, each None if its key is None
+        """
+        return (None if party_pk is None else reference_data.party(party_pk).abbreviation,
+                None if state_pk is None else reference_data.state(state_pk).abbreviation)
+
+    def party(self, pk, abbreviation):
+        return None if pk is None else {'abbreviation': abbreviation, 'url': self.party_urls.url(pk)}
+
+    def state(self, pk, abbreviation):
+        return None if pk is None else {'abbreviation': abbreviation, 'url': self.state_urls.url(pk)}
+
+
+class SenatorShortRowSerializer(LegislatorShortRowSerializer):
+    """
+    Row based equivalent of SenatorShortSerializer.
+    """
+    fields = ('pk', 'first_name', 'last_name', 'party_id', 'state_id')
+
+    def __init__(self, request, format=None):
+        super().__init__(request, format)
+        self.senator_urls = HyperlinkTemplate('senator-detail', request, format)
+
+    def to_representation(self, row):
+        pk, first_name, last_name, party_pk, state_pk = row
+        party_abbreviation, state_abbreviation = self.abbreviations(party_pk, state_pk)
+
+        return {
+            'full_name': 'Sen. {first_name} {last_name} [{party}-{state}]'.format(
+                first_name=first_name, last_name=last_name, party=party_abbreviation, state=state_abbreviation),
+            'state': self.state(state_pk, state_abbreviation),
+            'party': self.party(party_pk, party_abbreviation),
+            'url': self.senator_urls.url(pk)
+        }
+
+
+class RepresentativeShortRowSerializer(LegislatorShortRowSerializer):
+    """
+    Row based equivalent of RepresentativeShortSerializer.
+    """
+    fields = ('pk', 'first_name', 'last_name', 'party_id', 'state_id', 'district_id', 'district__number',
+              'district__state_id')
+
+    def __init__(self, request, format=None):
+        super().__init__(request, format)
+        self.representative_urls = HyperlinkTemplate('representative-detail', request, format)
+        self.district_urls = HyperlinkTemplate('district-detail', request, format)
+
+    def to_representation(self, row):
+        pk, first_name, last_name, party_pk, state_pk, district_pk, district_number, district_state_pk = row
+        party_abbreviation, state_abbreviation = self.abbreviations(party_pk, state_pk)
+
+        if district_pk is None:
+            district_name = None
+            district = None
+        else:
+            district_name = '{state}-{number}'.format(state=reference_data.state(district_state_pk).abbreviation,
+                                                      number=district_number)
+            district = {'number': district_number, 'url': self.district_urls.url(district_pk)}
+
+        return {
+            'full_name': 'Rep. {first_name} {last_name} [{party}-{district}]'.format(
+                first_name=first_name, last_name=last_name, party=party_abbreviation, district=district_name),
+            'party': self.party(party_pk, party_abbreviation),
+            'state': self.state(state_pk, state_abbreviation),
+            'district': district,
+            'url': self.representative_urls.url(pk)
+        }
+
+
+class LegislatorListRowSerializer(RowSerializer):
+    """
+    Row based equivalent of LegislatorListSerializer, for a mix of senators and representatives. Reads the
+    denormalized columns on the legislator table, so rows come from a single table without an upcast.
+    """
+    fields = ('pk', 'legislator_type', 'first_name', 'last_name', 'legislator_party_id', 'legislator_state_id',
+              'legislator_district_id', 'legislator_district__number', 'legislator_district__state_id')
+
+    def __init__(self, request, format=None):
+        super().__init__(request, format)
+        self.senators = SenatorShortRowSerializer(request, format)
+        self.representatives = RepresentativeShortRowSerializer(request, format)
+
+    @staticmethod
+    def row_for(legislator):
+        """
+        Builds a row from a legislator instance, for legislators that have already been loaded.
+        :param legislator: A legislator, ideally from LegislatorManager.denormalized()
+        :return: A tuple of the serializer's fields
+        """
+        district = legislator.legislator_district
+
+        return (legislator.pk, legislator.legislator_type, legislator.first_name, legislator.last_name,
+                legislator.legislator_party_id, legislator.legislator_state_id, legislator.legislator_district_id,
+                district.number if district else None, district.state_id if district else None)
+
+    def to_representation(self, row):
+        pk, legislator_type, first_name, last_name, party_pk, state_pk, district_pk, district_number, \
+            district_state_pk = row
+
+        if legislator_type == LegislatorType.senator.value:
+            return self.senators.to_representation((pk, first_name, last_name, party_pk, state_pk))
+        elif legislator_type == LegislatorType.representative.value:
+            return self.representatives.to_representation(
+                (pk, first_name, last_name, party_pk, state_pk, district_pk, district_number, district_state_pk))
+        else:
+            # Written before the denormalized columns existed and not yet synced by denormalize_legislators, so fall
+            # back to the upcast
+            return LegislatorListSerializer(instance=Legislator.objects.get(pk=pk),
+                                            context={'request': self.request, 'format': self.format}).data
@@ -1,7 +1,10 @@
 from __future__ import absolute_import, unicode_literals
 from celery import shared_task
+from django.conf import settings
 
+from billserve.crawls import crawls, inflight, rebuilds, scheduler
 from billserve.networking.client import GovinfoClient
+from billserve.profiling import profiled
 
 
 @shared_task
@@ -17,41 +20,158 @@ def add_related_bill(current_bill_pk, related_bill_pk):
 
 
 @shared_task
-def populate_bill(url):
+@profiled('populate_bill')
+def populate_bill(url, crawl_id=None, related_bill_pk=None, claimed=False, refresh=False):
     """
-    Either gets an existing bill from the database or creates a new one based on its URL
+    Either gets an existing bill from the database or creates a new one based on its URL. Duplicate tasks for a URL
+    reuse the first one's result. URLs in the crawl frontier are checkpointed as done or failed.
     :param url: A URL pointing towards a valid GovInfo endpoint
+    :param crawl_id: The id of the crawl this task is part of, if any
+    :param related_bill_pk: The primary key of a bill to add the bill to the related bills of, if any
+    :param claimed: Whether drain_frontier queued this task for the URL's frontier entry
+    :param refresh: Whether to fetch and re-ingest the bill even if it's stored already
     :return: The primary key of the bill we've either gotten or created
     """
+    from .models import Bill, CrawlFrontier
+
+    def get_or_create():
+        try:
+            bill_pk = Bill.objects.values_list('pk', flat=True).get(bill_url=url)
+        except Bill.DoesNotExist:
+            return GovinfoClient.create_bill_from_url(url, crawl_id=crawl_id).pk
+        if refresh:
+            return GovinfoClient.create_bill_from_url(url, crawl_id=crawl_id, refresh=True).pk
+        return bill_pk
+
+    # A claimed task only counts as done once it settles its URL's claim. If drain_frontier gave up on it and
+    # requeued the URL, that already counted it, and whichever of its tasks settles the URL first counts the new one
+    settled = False
+    try:
+        CrawlFrontier.objects.started(url)
+        try:
+            # Refreshes are de-duplicated apart from lookups, which would otherwise stand in for them
+            bill_pk = inflight.run('{url}#refresh'.format(url=url) if refresh else url, get_or_create)
+        except Exception as error:
+            settled = CrawlFrontier.objects.failed(url, error, claimed=claimed)
+            raise
+        settled = CrawlFrontier.objects.finished(url, bill_pk, claimed=claimed)
+
+        if related_bill_pk is not None:
+            Bill.objects.add_related_bill(related_bill_pk, bill_pk)
+        return bill_pk
+    finally:
+        if settled or not claimed:
+            crawls.done(crawl_id)
+
+
+@shared_task
+@profiled('update')
+def update(origin_url, crawl_id=None):
+    """
+    Adds every bill in a listing to the crawl frontier and makes sure the frontier is being drained.
+    :param origin_url: The URL of the listing
+    :param crawl_id: The id of the crawl this task is part of, or None to start a crawl of its own
+    """
     from .models import Bill
 
+    if crawl_id is None:
+        crawl_id = crawls.start(1)
     try:
-        bill = Bill.objects.get(bill_url=url)
-    except Bill.DoesNotExist:
-        bill = GovinfoClient.create_bill_from_url(url)
+        Bill.objects.bulk_create_bills_from_origin(origin_url, crawl_id=crawl_id)
+    finally:
+        crawls.done(crawl_id)
 
-    return bill.pk
+
+@shared_task
+def drain_frontier(crawl_id):
+    """
+    Tops each collection's queued URLs up to its concurrency limit from a crawl's frontier, highest priority first,
+    then runs again after BILLSERVE_FRONTIER_INTERVAL seconds until nothing is left. Only one of these runs for each
+    crawl.
+    :param crawl_id: The crawl's id
+    """
+    from .enumerations import FrontierPriority
+    from .models import CrawlFrontier
+
+    try:
+        # The tasks of URLs queued too long ago are taken to be lost, so the crawl stops waiting on them
+        crawls.done(crawl_id, CrawlFrontier.objects.requeue_stale(crawl_id))
+
+        # Collections can be routed to queues of their own, to spread them over dedicated workers
+        queues = getattr(settings, 'BILLSERVE_COLLECTION_QUEUES', {})
+        for collection, limit in CrawlFrontier.objects.top_ups(crawl_id).items():
+            claims = CrawlFrontier.objects.claim(crawl_id, collection, limit)
+            crawls.add(crawl_id, len(claims))
+            for url, priority in claims:
+                populate_bill.apply_async((url,), {'crawl_id': crawl_id, 'claimed': True,
+                                                   'refresh': priority == FrontierPriority.refresh.value},
+                                          queue=queues.get(collection))
+
+        # Stopping first means an update that adds URLs from here on starts the next loop itself
+        crawls.stop_draining(crawl_id)
+        if CrawlFrontier.objects.unfinished(crawl_id).exists() and crawls.start_draining(crawl_id):
+            crawls.add(crawl_id)
+            drain_frontier.apply_async((crawl_id,), countdown=getattr(settings, 'BILLSERVE_FRONTIER_INTERVAL', 1.0))
+    finally:
+        crawls.done(crawl_id)
 
 
 @shared_task
-def update(origin_url):
+def schedule_crawls(force=False):
     """
-    Currently starts at a single bill URL and then spiders out from there. Eventually this method will query all
-    possible bill repositories and see if there are any new bills to grab.
-    :param origin_url: The URL to begin our search at
+    Starts a crawl of every collection that is due a refresh. Meant to run periodically, e.g. from Celery beat.
+    :param force: Whether to crawl every collection, due or not
+    :return: The id of the crawl, or None if nothing was due
     """
-    from .models import Bill
+    return scheduler.run(force=force)
 
-    Bill.objects.bulk_create_bills_from_origin(origin_url)
+
+@shared_task
+def debounced_rebuild():
+    """
+    Rebuilds once no rebuild has been requested for the debounce window, waiting longer if need be. Queued by
+    RebuildScheduler.request.
+    """
+    remaining = rebuilds.remaining()
+    if remaining > 0 and not debounced_rebuild.request.is_eager:
+        debounced_rebuild.apply_async(countdown=remaining)
+        return
+    rebuilds.clear()
+    rebuild()
 
 
 @shared_task
+@profiled('rebuild')
 def rebuild():
     """
-    Destroys and then rebuilds all the legislative support splits.
+    Destroys and then rebuilds all the legislative support splits, collaborations, subject co-occurrences, activity
+    rollups and bill families, rescores bipartisanship and party unity and re-renders the stored documents of the
+    bills whose scores or families changed, then tells the change feed that each of them was rebuilt. If another
+    rebuild is running, requests one to run after it instead. Documents that drifted for any other reason are
+    repaired by the check_bill_documents command.
     """
-    from .models import LegislativeSubjectSupportSplit
-
-    LegislativeSubjectSupportSplit.objects.rebuild()
+    from .analytics.bipartisanship import score_bipartisanship
+    from .analytics.votes import score_party_unity
+    from .enumerations import ChangeAction
+    from .models import ActivityRollup, Bill, BillDocument, ChangeEvent, Collaboration, \
+        LegislativeSubjectSupportSplit, SubjectCoOccurrence
 
+    token = rebuilds.acquire()
+    if token is None:
+        rebuilds.request()
+        return
 
+    try:
+        LegislativeSubjectSupportSplit.objects.rebuild()
+        Collaboration.objects.rebuild()
+        SubjectCoOccurrence.objects.rebuild()
+        ActivityRollup.objects.rebuild()
+        family_pks = Bill.objects.rebuild_families()
+        bill_pks, legislator_pks = score_bipartisanship()
+        score_party_unity()
+        # Bill documents only hold the bills' own scores, not their sponsors', and their last modified times
+        BillDocument.objects.regenerate(sorted(set(family_pks) | set(bill_pks)))
+        for resource in ('support-splits', 'collaborations', 'subject-co-occurrences', 'activity-rollups', 'bills'):
+            ChangeEvent.objects.record(resource, ChangeAction.rebuilt)
+    finally:
+        rebuilds.release(token)
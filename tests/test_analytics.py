@@ -0,0 +1,398 @@
+from unittest import mock
+from django.test import TestCase
+from django.urls import reverse
+from billserve.analytics.bipartisanship import score_bipartisanship
+from billserve.analytics.votes import VoteMatrix, agreement, party_unity, score_party_unity
+from billserve.models import *
+from billserve.networking.rollcalls import RollCallParser
+import datetime
+
+
+class BipartisanshipTestCase(TestCase):
+    fixtures = ['states.json', 'parties.json']
+
+    def setUp(self):
+        state = State.objects.get(pk=32)
+        self.democrat = Senator.objects.create(first_name='Martin', last_name='Heinrich', state=state,
+                                               party=Party.objects.get(pk=2))
+        self.republican = Senator.objects.create(first_name='Susan', last_name='Collins', state=state,
+                                                 party=Party.objects.get(pk=3))
+        self.independent = Senator.objects.create(first_name='Angus', last_name='King', state=state,
+                                                  party=Party.objects.get(pk=1))
+        self.bills = [Bill.objects.create(bill_url='http://google.com/{n}'.format(n=number)) for number in range(3)]
+
+        self.bills[0].sponsors.add(self.democrat)
+        self.cosponsor(self.bills[0], self.republican, self.independent)
+        self.bills[1].sponsors.add(self.democrat)
+        self.cosponsor(self.bills[1], self.democrat, self.republican)
+        self.bills[2].sponsors.add(self.republican)
+
+    @staticmethod
+    def cosponsor(bill, *legislators):
+        for legislator in legislators:
+            Cosponsorship.objects.create(legislator=legislator, bill=bill, is_original_cosponsor=True,
+                                         cosponsorship_date=datetime.date(2017, 5, 1))
+
+    def test_scores(self):
+        bill_pks, legislator_pks = score_bipartisanship()
+        self.assertEqual(set(bill_pks), {self.bills[0].pk, self.bills[1].pk})
+        self.assertEqual(legislator_pks, [self.democrat.pk])
+
+        scores = dict(Bill.objects.values_list('pk', 'bipartisanship_score'))
+        self.assertEqual(scores, {self.bills[0].pk: 1.0, self.bills[1].pk: 0.5, self.bills[2].pk: None})
+        self.assertEqual(Legislator.objects.get(pk=self.democrat.pk).bipartisanship_score, 0.75)
+        self.assertIsNone(Legislator.objects.get(pk=self.republican.pk).bipartisanship_score)
+
+    def test_unchanged_scores_are_not_rewritten(self):
+        score_bipartisanship()
+        self.assertEqual(score_bipartisanship(), ([], []))
+
+
+class CollaborationTestCase(TestCase):
+    fixtures = ['states.json', 'parties.json']
+
+    def setUp(self):
+        state, party = State.objects.get(pk=32), Party.objects.get(pk=2)
+        self.legislators = [Senator.objects.create(first_name='Martin', last_name=name, state=state, party=party)
+                            for name in ('Heinrich', 'Udall', 'Lujan', 'Haaland')]
+        self.involvements = [(0, 1, 2), (0, 1), (2, 3), (0,)]
+        for number, involved in enumerate(self.involvements):
+            bill = Bill.objects.create(bill_url='http://google.com/{n}'.format(n=number))
+            bill.sponsors.add(self.legislators[involved[0]])
+            BipartisanshipTestCase.cosponsor(bill, *(self.legislators[index] for index in involved[1:]))
+
+    def collaborations(self):
+        return {(legislator_pk, collaborator_pk): (shared, round(similarity, 6)) for
+                legislator_pk, collaborator_pk, shared, similarity in
+                Collaboration.objects.values_list('legislator_id', 'collaborator_id', 'shared_bills', 'similarity')}
+
+    def test_rebuild(self):
+        Collaboration.objects.rebuild()
+        heinrich, udall, lujan, haaland = (legislator.pk for legislator in self.legislators)
+        collaborations = self.collaborations()
+        self.assertEqual(collaborations[(heinrich, heinrich)], (3, 1.0))
+        self.assertEqual(collaborations[(heinrich, udall)], (2, round(2 / 3, 6)))
+        self.assertEqual(collaborations[(udall, heinrich)], (2, round(2 / 3, 6)))
+        self.assertNotIn((heinrich, haaland), collaborations)
+
+    def test_record_bill_matches_rebuild(self):
+        for involved in self.involvements:
+            Collaboration.objects.record_bill(self.legislators[index].pk for index in involved)
+        recorded = self.collaborations()
+        Collaboration.objects.rebuild()
+        self.assertEqual(recorded, self.collaborations())
+
+    def test_record_bill_with_concurrent_insert(self):
+        pks = [self.legislators[0].pk, self.legislators[1].pk]
+        bulk_create = Collaboration.objects.bulk_create
+
+        def racing_bulk_create(pairs, **kwargs):
+            # Another ingest of a bill with the same legislators inserts their pairs first
+            bulk_create([Collaboration.objects.pair(row, column, shared_bills=1) for row in pks for column in pks])
+            return bulk_create(pairs, **kwargs)
+
+        with mock.patch.object(Collaboration.objects, 'bulk_create', racing_bulk_create):
+            Collaboration.objects.record_bill(pks)
+        self.assertEqual(set(self.collaborations().values()), {(2, 1.0)})
+
+    def test_top(self):
+        Collaboration.objects.rebuild()
+        heinrich, udall, lujan, haaland = (legislator.pk for legislator in self.legislators)
+        self.assertEqual([pk for pk, shared, similarity in Collaboration.objects.top(heinrich, 5)], [udall, lujan])
+        self.assertEqual([pk for pk, shared, similarity in Collaboration.objects.top(lujan, 5, 'similarity')],
+                         [haaland, udall, heinrich])
+
+
+class SubjectCoOccurrenceTestCase(TestCase):
+    def setUp(self):
+        self.subjects = [LegislativeSubject.objects.create(name=name)
+                         for name in ('Higher education', 'Student aid', 'Taxation')]
+        self.taggings = [(0, 1), (0, 1, 2), (2,)]
+        for number, tagged in enumerate(self.taggings):
+            bill = Bill.objects.create(bill_url='http://google.com/{n}'.format(n=number))
+            bill.legislative_subjects.add(*(self.subjects[index] for index in tagged))
+
+    def co_occurrences(self):
+        return set(SubjectCoOccurrence.objects.values_list('legislative_subject_id', 'related_subject_id',
+                                                           'shared_bills', 'similarity'))
+
+    def test_record_bill_matches_rebuild(self):
+        for tagged in self.taggings:
+            SubjectCoOccurrence.objects.record_bill(self.subjects[index].pk for index in tagged)
+        recorded = self.co_occurrences()
+        SubjectCoOccurrence.objects.rebuild()
+        self.assertEqual(recorded, self.co_occurrences())
+
+    def test_record_bill_reports_rescored_subjects(self):
+        SubjectCoOccurrence.objects.rebuild()
+        changed = SubjectCoOccurrence.objects.record_bill([self.subjects[2].pk])
+        self.assertEqual(changed, {subject.pk for subject in self.subjects})
+
+    def test_related_subjects(self):
+        SubjectCoOccurrence.objects.rebuild()
+        response = self.client.get(reverse('legislativesubject-detail', kwargs={'pk': self.subjects[0].pk}))
+        related = response.json()['related_subjects']
+        self.assertEqual([subject['name'] for subject in related], ['Student aid', 'Taxation'])
+        self.assertEqual(related[0]['shared_bills'], 2)
+        self.assertEqual(related[0]['similarity'], 1.0)
+
+
+class ActivityRollupTestCase(TestCase):
+    fixtures = ['states.json', 'parties.json', 'policy_areas.json']
+
+    def setUp(self):
+        state = State.objects.get(pk=32)
+        self.democrat = Senator.objects.create(first_name='Martin', last_name='Heinrich', state=state,
+                                               party=Party.objects.get(pk=2))
+        self.republican = Senator.objects.create(first_name='Susan', last_name='Collins', state=state,
+                                                 party=Party.objects.get(pk=3))
+        self.subject = LegislativeSubject.objects.create(name='Higher education')
+        self.bills = []
+        for number, day in enumerate((datetime.date(2017, 5, 1), datetime.date(2017, 5, 20),
+                                      datetime.date(2017, 6, 3))):
+            bill = Bill.objects.create(bill_url='http://google.com/{n}'.format(n=number), congress=115,
+                                       introduction_date=day, policy_area=PolicyArea.objects.get(pk=1))
+            bill.sponsors.add(self.democrat)
+            bill.legislative_subjects.add(self.subject)
+            self.bills.append(bill)
+        BipartisanshipTestCase.cosponsor(self.bills[0], self.republican)
+
+    def rows(self):
+        return set(ActivityRollup.objects.values_list('dimension', 'dimension_pk', 'month', 'congress', 'party_pk',
+                                                      'bills', 'sponsorships', 'cosponsorships'))
+
+    def test_record_bills_matches_rebuild(self):
+        for bill in self.bills:
+            ActivityRollup.objects.record_bills([bill.pk])
+        recorded = self.rows()
+        ActivityRollup.objects.rebuild()
+        self.assertEqual(recorded, self.rows())
+
+    def test_record_bills_with_concurrent_insert(self):
+        ActivityRollup.objects.rebuild()
+        expected = {row[:5] + tuple(2 * count for count in row[5:]) for row in self.rows()}
+        ActivityRollup.objects.all().delete()
+        pks = [bill.pk for bill in self.bills]
+        bulk_create = ActivityRollup.objects.bulk_create
+
+        def racing_bulk_create(rows, **kwargs):
+            # Another ingest of the same bills inserts their rows first
+            bulk_create([ActivityRollup.objects.row(key, counts)
+                         for key, counts in ActivityRollup.objects.deltas_for(pks).items()])
+            return bulk_create(rows, **kwargs)
+
+        with mock.patch.object(ActivityRollup.objects, 'bulk_create', racing_bulk_create):
+            ActivityRollup.objects.record_bills(pks)
+        self.assertEqual(self.rows(), expected)
+
+    def test_unknown_congress_and_party_share_rows(self):
+        independent = Senator.objects.create(first_name='Angus', last_name='King', state=State.objects.get(pk=32))
+        for number in range(2):
+            bill = Bill.objects.create(bill_url='http://google.com/unknown/{n}'.format(n=number),
+                                       introduction_date=datetime.date(2017, 7, 4))
+            bill.sponsors.add(independent)
+            ActivityRollup.objects.record_bills([bill.pk])
+        rows = ActivityRollup.objects.filter(month=datetime.date(2017, 7, 1))
+        self.assertEqual(list(rows.values_list('congress', 'party_pk', 'bills')), [(0, 0, 2)])
+
+    def test_series(self):
+        ActivityRollup.objects.rebuild()
+        response = self.client.get(reverse('activity'), {'dimension': 'subject', 'id': self.subject.pk,
+                                                          'start': '2017-05'})
+        self.assertEqual(response.json(), [
+            {'month': '2017-05', 'party': 'D', 'bills': 2, 'sponsorships': 2, 'cosponsorships': 0},
+            {'month': '2017-05', 'party': 'R', 'bills': 0, 'sponsorships': 0, 'cosponsorships': 1},
+            {'month': '2017-06', 'party': 'D', 'bills': 1, 'sponsorships': 1, 'cosponsorships': 0},
+        ])
+
+    def test_series_filters(self):
+        ActivityRollup.objects.rebuild()
+        response = self.client.get(reverse('activity'), {'party': 'D', 'end': '2017-05', 'congress': 115})
+        self.assertEqual([row['bills'] for row in response.json()], [2])
+
+    def test_series_needs_id(self):
+        self.assertEqual(self.client.get(reverse('activity'), {'dimension': 'subject'}).status_code, 400)
+
+
+class BillFamilyTestCase(TestCase):
+    def setUp(self):
+        self.bills = [Bill.objects.create(bill_url='http://google.com/{n}'.format(n=number)) for number in range(5)]
+        self.edges = [(3, 1), (0, 4), (1, 4)]
+        for first, second in self.edges:
+            self.bills[first].related_bills.add(self.bills[second])
+
+    def families(self):
+        return [bill.family_id for bill in Bill.objects.order_by('pk')]
+
+    def test_rebuild(self):
+        pks = [bill.pk for bill in self.bills]
+        changes = ChangeEvent.objects.count()
+        self.assertEqual(sorted(Bill.objects.rebuild_families()), [pks[0], pks[1], pks[3], pks[4]])
+        self.assertEqual(self.families(), [pks[0], pks[0], None, pks[0], pks[0]])
+        self.assertIsNotNone(Bill.objects.get(pk=pks[1]).last_modified)
+        self.assertIsNone(Bill.objects.get(pk=pks[2]).last_modified)
+        self.assertEqual(set(ChangeEvent.objects.filter(pk__gt=changes).values_list('object_pk', flat=True)),
+                         {pks[0], pks[1], pks[3], pks[4]})
+        self.assertEqual(Bill.objects.rebuild_families(), [])
+
+    def test_merge_matches_rebuild(self):
+        for first, second in self.edges:
+            Bill.objects.merge_families(self.bills[first].pk, self.bills[second].pk)
+        merged = self.families()
+        Bill.objects.rebuild_families()
+        self.assertEqual(merged, self.families())
+
+    def test_save_keeps_family(self):
+        bill = Bill.objects.get(pk=self.bills[3].pk)
+        Bill.objects.merge_families(self.bills[3].pk, self.bills[0].pk)
+        bill.title = 'Sunshine Act'
+        bill.save()
+        self.assertEqual(Bill.objects.get(pk=bill.pk).family_id, self.bills[0].pk)
+
+    def test_family_endpoint(self):
+        Bill.objects.rebuild_families()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('bill-family', kwargs={'pk': self.bills[4].pk}))
+        self.assertEqual(len(response.json()), 4)
+        response = self.client.get(reverse('bill-family', kwargs={'pk': self.bills[2].pk}))
+        self.assertEqual(len(response.json()), 1)
+        self.assertEqual(self.client.get(reverse('bill-family', kwargs={'pk': 999})).status_code, 404)
+
+
+HOUSE_ROLL_CALL = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<rollcall-vote>\n'
+    '  <vote-metadata>\n'
+    '    <congress>115</congress>\n'
+    '    <session>1st</session>\n'
+    '    <rollcall-num>{number}</rollcall-num>\n'
+    '    <legis-num>H R 996</legis-num>\n'
+    '    <vote-question>On Passage</vote-question>\n'
+    '    <vote-result>Passed</vote-result>\n'
+    '    <action-date>{day}-May-2017</action-date>\n'
+    '  </vote-metadata>\n'
+    '  <vote-data>\n'
+    '    <recorded-vote><legislator unaccented-name="Lujan" party="D" state="NM">Lujan</legislator>'
+    '<vote>{lujan}</vote></recorded-vote>\n'
+    '    <recorded-vote><legislator unaccented-name="Haaland" party="D" state="NM">Haaland</legislator>'
+    '<vote>{haaland}</vote></recorded-vote>\n'
+    '    <recorded-vote><legislator unaccented-name="Pearce" party="R" state="NM">Pearce</legislator>'
+    '<vote>{pearce}</vote></recorded-vote>\n'
+    '    <recorded-vote><legislator unaccented-name="Smith (NJ)" party="R" state="NJ">Smith (NJ)</legislator>'
+    '<vote>Aye</vote></recorded-vote>\n'
+    '  </vote-data>\n'
+    '</rollcall-vote>\n'
+)
+
+SENATE_ROLL_CALL = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<roll_call_vote>\n'
+    '  <congress>115</congress>\n'
+    '  <session>1</session>\n'
+    '  <vote_number>12</vote_number>\n'
+    '  <vote_date>January 3, 2017,  12:00 PM</vote_date>\n'
+    '  <vote_question_text>On the Motion</vote_question_text>\n'
+    '  <vote_result>Agreed to</vote_result>\n'
+    '  <members>\n'
+    '    <member><last_name>Heinrich</last_name><first_name>Martin</first_name>'
+    '<party>D</party><state>NM</state><vote_cast>Nay</vote_cast></member>\n'
+    '  </members>\n'
+    '</roll_call_vote>\n'
+)
+
+
+class RollCallTestCase(TestCase):
+    fixtures = ['states.json', 'parties.json', 'chambers.json']
+
+    def setUp(self):
+        state = State.objects.get(pk=32)
+        democrat, republican = Party.objects.get(pk=2), Party.objects.get(pk=3)
+        district = District.objects.create(number=1, state=state)
+        self.lujan = Representative.objects.create(first_name='Ben', last_name='Lujan', state=state, party=democrat,
+                                                   district=district)
+        self.haaland = Representative.objects.create(first_name='Deb', last_name='Haaland', state=state,
+                                                     party=democrat, district=district)
+        self.pearce = Representative.objects.create(first_name='Steve', last_name='Pearce', state=state,
+                                                    party=republican, district=district)
+        self.heinrich = Senator.objects.create(first_name='Martin', last_name='Heinrich', state=state, party=democrat)
+        self.bill = Bill.objects.create(bill_url='http://google.com', congress=115, type='HR', bill_number=996)
+
+    def load(self, number, day, lujan, haaland, pearce):
+        return RollCall.objects.create_from_dict(RollCallParser.parse(HOUSE_ROLL_CALL.format(
+            number=number, day=day, lujan=lujan, haaland=haaland, pearce=pearce)))
+
+    def test_create_from_dict(self):
+        roll_call, unmatched = self.load(1, 1, 'Yea', 'Present', 'Nay')
+        self.assertEqual(unmatched, 1)
+        self.assertEqual(roll_call.bill, self.bill)
+        self.assertEqual(roll_call.date, datetime.date(2017, 5, 1))
+        ordinals = dict(Legislator.objects.values_list('pk', 'vote_ordinal'))
+        self.assertIsNone(ordinals[self.heinrich.pk])
+        self.assertEqual(roll_call.vote_for(ordinals[self.lujan.pk]), 'yea')
+        self.assertEqual(roll_call.vote_for(ordinals[self.haaland.pk]), 'present')
+        self.assertEqual(roll_call.vote_for(ordinals[self.pearce.pk]), 'nay')
+
+    def test_ordinals_are_stable(self):
+        self.load(1, 1, 'Yea', 'Yea', 'Nay')
+        ordinals = dict(Legislator.objects.values_list('pk', 'vote_ordinal'))
+        roll_call, _ = RollCall.objects.create_from_dict(RollCallParser.parse(SENATE_ROLL_CALL))
+        self.assertEqual(roll_call.size, 4)
+        self.assertEqual(roll_call.vote_for(3), 'nay')
+        self.assertEqual(roll_call.vote_for(ordinals[self.lujan.pk]), None)
+        self.load(1, 1, 'Nay', 'Yea', 'Nay')
+        ordinals[self.heinrich.pk] = 3
+        self.assertEqual(dict(Legislator.objects.values_list('pk', 'vote_ordinal')), ordinals)
+        self.assertEqual(RollCall.objects.count(), 2)
+
+    def test_party_unity_and_agreement(self):
+        self.load(1, 1, 'Yea', 'Yea', 'Nay')
+        self.load(2, 2, 'Yea', 'Nay', 'Nay')
+        self.load(3, 3, 'Nay', 'Nay', 'Yea')
+        matrix = VoteMatrix.load(RollCall.objects.order_by('number'))
+        ordinals = dict(Legislator.objects.values_list('pk', 'vote_ordinal'))
+
+        sided, cast = party_unity(matrix, 2, 3)
+        lujan = ordinals[self.lujan.pk]
+        self.assertEqual((sided[lujan], cast[lujan]), (2, 2))
+
+        agreement_matrix = agreement(matrix)
+        self.assertAlmostEqual(agreement_matrix[lujan, ordinals[self.haaland.pk]], 2 / 3)
+        self.assertEqual(agreement_matrix[lujan, ordinals[self.pearce.pk]], 0.0)
+
+        score_party_unity()
+        scores = dict(Legislator.objects.values_list('pk', 'party_unity_score'))
+        self.assertEqual(scores[self.lujan.pk], 1.0)
+        self.assertEqual(scores[self.pearce.pk], 1.0)
+        self.assertIsNone(scores[self.heinrich.pk])
+
+    def test_agreement_endpoint(self):
+        self.load(1, 1, 'Yea', 'Yea', 'Nay')
+        self.load(2, 2, 'Yea', 'Nay', 'Nay')
+        self.load(3, 3, 'Nay', 'Nay', 'Yea')
+        url = reverse('legislator-agreement', kwargs={'pk': self.lujan.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(result['legislator']['url'].rstrip('/').rsplit('/', 1)[-1], result['agreement'])
+                          for result in response.json()],
+                         [(str(self.haaland.pk), 0.6667), (str(self.pearce.pk), 0.0)])
+
+        response = self.client.get(url, {'ordering': 'least', 'limit': 1})
+        self.assertEqual([result['agreement'] for result in response.json()], [0.0])
+        self.assertEqual(self.client.get(url, {'congress': 114}).json(), [])
+        self.assertEqual(self.client.get(url, {'ordering': 'sideways'}).status_code, 400)
+        response = self.client.get(reverse('legislator-agreement', kwargs={'pk': self.heinrich.pk}))
+        self.assertEqual(response.json(), [])
+        self.assertEqual(self.client.get(reverse('legislator-agreement', kwargs={'pk': 999})).status_code, 404)
+
+    def test_votes_endpoint(self):
+        self.load(1, 1, 'Yea', 'Yea', 'Nay')
+        self.load(2, 2, 'Not Voting', 'Nay', 'Nay')
+        response = self.client.get(reverse('legislator-votes', kwargs={'pk': self.lujan.pk}))
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([(result['number'], result['vote']) for result in results], [(2, 'not_voting'), (1, 'yea')])
+        self.assertIn('/bills/{pk}/'.format(pk=self.bill.pk), results[0]['bill'])
+
+        response = self.client.get(reverse('legislator-votes', kwargs={'pk': self.heinrich.pk}))
+        self.assertEqual(response.json()['results'], [])
+        self.assertEqual(self.client.get(reverse('legislator-votes', kwargs={'pk': 999})).status_code, 404)
@@ -0,0 +1,94 @@
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from billserve.autocomplete import Autocomplete, AutocompleteIndex, KindIndex, autocomplete, normalize, \
+    normalize_query
+from billserve.enumerations import ChangeAction
+from billserve.models import *
+
+
+class NormalizeTestCase(TestCase):
+    def test_normalize(self):
+        self.assertEqual(normalize('H.R. 1'), 'hr 1')
+        self.assertEqual(normalize("Beto O'Rourke"), 'beto orourke')
+        self.assertEqual(normalize('  Labor,  and Pensions '), 'labor and pensions')
+        self.assertEqual(normalize('Nydia Velázquez'), 'nydia velazquez')
+        self.assertEqual(normalize_query('HR1'), 'hr 1')
+        self.assertEqual(normalize_query('h1n1'), 'h1n1')
+
+    def test_heavy_prefixes_match_a_full_scan(self):
+        keys = ['{letter}{number}'.format(letter=letter, number=number) for letter in 'ab' for number in range(40)]
+        tokens = [(key, rank) for rank, key in enumerate(reversed(keys))]
+        index = KindIndex(list(tokens), scan_limit=4, depth=6)
+        self.assertIn('a', index.heavy)
+        self.assertIn('a1', index.heavy)
+        for prefix in ('a', 'b1', 'a3', 'b39'):
+            expected = sorted(rank for key, rank in tokens if key.startswith(prefix))[:6]
+            self.assertEqual(list(index.lookup(prefix, 6)[0]), expected)
+
+
+class AutocompleteIndexTestCase(TestCase):
+    fixtures = ['parties.json', 'states.json', 'chambers.json', 'legislative_subjects.json', 'policy_areas.json',
+                'committees.json']
+
+    def setUp(self):
+        cache.clear()
+        # Drop whatever the app built from the development database as it loaded
+        if autocomplete.thread is not None:
+            autocomplete.thread.join()
+        autocomplete.index = None
+        state = State.objects.get(pk=32)
+        self.heinrich = Senator.objects.create(first_name='Martin', last_name='Heinrich', state=state,
+                                               party=Party.objects.get(pk=2))
+        self.bills = [Bill.objects.create(bill_url='http://google.com/{n}'.format(n=number), type='HR',
+                                          bill_number=number, congress=115, title='Act {n}'.format(n=number))
+                      for number in (1, 10, 12)]
+        Bill.objects.filter(pk=self.bills[2].pk).update(num_cosponsors=5)
+
+    def test_search(self):
+        index = AutocompleteIndex('test')
+        self.assertEqual(index.search('heinr'), [('senator', self.heinrich.pk, 'Martin Heinrich', 'D-NM')])
+        self.assertEqual(index.search('martin h')[0][1], self.heinrich.pk)
+
+        # The exact match comes first, then the bill with the most support
+        self.assertEqual([pk for kind, pk, label, detail in index.search('H.R. 1')],
+                         [self.bills[0].pk, self.bills[2].pk, self.bills[1].pk])
+        self.assertEqual(index.search('hr12')[0][2:], ('H.R. 12', 'Act 12 (115th Congress)'))
+
+        self.assertEqual(index.search('higher ed', kinds=['legislative-subject'])[0][2], 'Higher education')
+        self.assertEqual([label for kind, pk, label, detail in index.search('educ', kinds=['legislative-subject'])],
+                         ['Education programs funding', 'Higher education'])
+        self.assertEqual(index.search('pensions', kinds=['committee'])[0][3], 'Senate')
+        self.assertEqual(index.search('zzz'), [])
+        self.assertEqual(index.search('   '), [])
+        self.assertGreater(index.stats()['bytes'], 0)
+
+    def test_rebuilds_on_new_data(self):
+        holder = Autocomplete()
+        first = holder.current()
+        self.assertIs(holder.current(), first)
+        ChangeEvent.objects.record('bills', ChangeAction.created, [self.bills[0].pk])
+
+        # The rebuild runs here rather than on a thread of its own, which couldn't see the test's transaction
+        with self.settings(BILLSERVE_AUTOCOMPLETE_CHECK_INTERVAL=0), \
+                mock.patch.object(holder, 'rebuild', side_effect=lambda: holder.build()):
+            self.assertIs(holder.current(), first)
+            self.assertIsNot(holder.current(), first)
+            self.assertEqual(holder.current().version, holder.data_version())
+
+    def test_requests_keep_the_previous_index_during_a_rebuild(self):
+        holder = Autocomplete()
+        first = holder.current()
+        ChangeEvent.objects.record('bills', ChangeAction.created, [self.bills[0].pk])
+        # Another thread is rebuilding
+        with holder.lock, self.settings(BILLSERVE_AUTOCOMPLETE_CHECK_INTERVAL=0):
+            self.assertFalse(holder.rebuild())
+            self.assertIs(holder.current(), first)
+
+    def test_view(self):
+        response = self.client.get(reverse('autocomplete'), {'q': 'heinrich'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['url'],
+                         'http://testserver' + reverse('senator-detail', kwargs={'pk': self.heinrich.pk}))
+        self.assertEqual(self.client.get(reverse('autocomplete'), {'q': 'a', 'types': 'bills'}).status_code, 400)
@@ -0,0 +1,46 @@
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+from billserve.models import *
+
+spec = importlib.util.spec_from_file_location(
+    'generate_congress', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'fixtures', 'generate_congress.py'))
+generate_congress = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(generate_congress)
+
+
+class SyntheticCongressTestCase(TestCase):
+    fixtures = ['states.json', 'parties.json', 'chambers.json']
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.congress = generate_congress.Congress(legislators=20, bills=15, related_density=0.3, seed=1)
+
+    def test_fixture(self):
+        call_command('loaddata', self.congress.write_fixture(self.directory), verbosity=0)
+        self.assertEqual(Bill.objects.count(), 15)
+        self.assertEqual(Senator.objects.count() + Representative.objects.count(), 20)
+        self.assertEqual(Cosponsorship.objects.count(), sum(len(bill['cosponsors']) for bill in self.congress.bills))
+        senator = Legislator.objects.filter(legislator_type=1).first()
+        self.assertEqual(senator.legislator_party_id, senator.party_id)
+
+    def test_benchmark_ingests_xml(self):
+        self.congress.write_xml(self.directory)
+        output = os.path.join(self.directory, 'results.json')
+        call_command('benchmark', xml_dir=self.directory, requests=2, output=output)
+        with open(output) as results:
+            results = json.load(results)
+
+        self.assertEqual(results['ingest']['bills'], 15)
+        self.assertEqual(results['counts']['legislators'], len({
+            legislator['pk'] for bill in self.congress.bills
+            for legislator in [bill['sponsor']] + [cosponsor for cosponsor, _, _ in bill['cosponsors']]}))
+        self.assertEqual(results['endpoints']['bill-detail']['statuses'], {'200': 2})
+        related = {(bill['pk'], pk) for bill in self.congress.bills for pk in bill['related']}
+        self.assertEqual(Bill.related_bills.through.objects.count(), len(related))
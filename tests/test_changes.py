@@ -0,0 +1,71 @@
+import datetime
+import time
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from billserve.enumerations import ChangeAction
+from billserve.models import *
+
+
+class ChangeEventManagerTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_since(self):
+        ChangeEvent.objects.record('bills', ChangeAction.created, [3, 1, 3])
+        ChangeEvent.objects.record('activity-rollups', ChangeAction.rebuilt)
+        first, second, third = ChangeEvent.objects.order_by('pk')
+        self.assertEqual([first.object_pk, second.object_pk, third.object_pk], [1, 3, None])
+
+        events, more = ChangeEvent.objects.since(0, 2)
+        self.assertEqual(events, [first, second])
+        self.assertTrue(more)
+        events, more = ChangeEvent.objects.since(second.pk, 2)
+        self.assertEqual(events, [third])
+        self.assertFalse(more)
+
+    def test_stops_at_recent_gaps(self):
+        ChangeEvent.objects.record('bills', ChangeAction.created, [1, 2, 3])
+        first, second, third = ChangeEvent.objects.order_by('pk')
+        # As if the second change's transaction hadn't committed yet, while the changes around it were committed
+        # long ago
+        missing = second.pk
+        second.delete()
+        ChangeEvent.objects.filter(pk__in=[first.pk, third.pk]).update(
+            created_at=timezone.now() - datetime.timedelta(minutes=1))
+        self.assertEqual(ChangeEvent.objects.since(0, 10), ([first], False))
+        self.assertEqual(ChangeEvent.objects.since(first.pk, 10), ([], False))
+
+        # Gaps are only skipped once they've been seen for the settle time
+        cache.set('billserve:changes:gap:{seq}'.format(seq=missing), time.time() - 60)
+        self.assertEqual(ChangeEvent.objects.since(first.pk, 10), ([third], False))
+
+    def test_ingest_records_changes(self):
+        education = Bill.objects.create(bill_url='http://google.com/1', title='Middle Class CHANCE Act')
+        tax = Bill.objects.create(bill_url='http://google.com/2', title='Education Tax Relief Act')
+        Bill.objects.merge_families(education.pk, tax.pk)
+        self.assertEqual(set(ChangeEvent.objects.filter(resource='bills').values_list('object_pk', flat=True)),
+                         {education.pk, tax.pk})
+
+        tax_pk = tax.pk
+        tax.delete()
+        deleted = ChangeEvent.objects.latest('pk')
+        self.assertEqual((deleted.resource, deleted.action, deleted.object_pk),
+                         ('bills', ChangeAction.deleted.value, tax_pk))
+
+
+class ChangeFeedTestCase(TestCase):
+    def test_get(self):
+        ChangeEvent.objects.record('cosponsorships', ChangeAction.created, [5, 6])
+        response = self.client.get(reverse('changes'), {'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['changes']), 1)
+        self.assertEqual(response.data['changes'][0]['action'], 'created')
+        self.assertTrue(response.data['more'])
+
+        response = self.client.get(reverse('changes'), {'since': response.data['next']})
+        self.assertEqual([change['pk'] for change in response.data['changes']], [6])
+        self.assertFalse(response.data['more'])
+        self.assertEqual(self.client.get(reverse('changes'), {'since': 'x'}).status_code, 400)
@@ -0,0 +1,354 @@
+from django.core.cache import cache
+import datetime
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from billserve.crawls import CrawlTracker, InFlightRegistry, RebuildScheduler, crawls, current_congress, rebuilds, \
+    scheduler
+from billserve.enumerations import ChangeAction, FrontierPriority, FrontierStatus
+from billserve.metrics import metrics
+from billserve.models import *
+from billserve.networking.client import GovinfoClient
+from billserve.tasks import debounced_rebuild, populate_bill, rebuild
+from billserve.tests.test_benchmark import generate_congress
+
+
+class RecordingScheduler(RebuildScheduler):
+    def __init__(self):
+        self.countdowns = []
+
+    def schedule(self, countdown):
+        self.countdowns.append(countdown)
+
+
+class CrawlTrackerTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.scheduler = RecordingScheduler()
+        self.crawls = CrawlTracker(self.scheduler)
+
+    def test_finishes_once_all_work_is_done(self):
+        crawl_id = self.crawls.start(2)
+        self.crawls.add(crawl_id, 3)
+        for _ in range(4):
+            self.assertFalse(self.crawls.done(crawl_id))
+        self.assertEqual(self.crawls.pending(crawl_id), 1)
+        self.assertIsNone(self.crawls.finished_at(crawl_id))
+
+        # Work fanned out by the last task is added before that task is done
+        self.crawls.add(crawl_id)
+        self.assertFalse(self.crawls.done(crawl_id))
+        self.assertTrue(self.crawls.done(crawl_id))
+        self.assertIsNotNone(self.crawls.finished_at(crawl_id))
+        self.assertEqual(len(self.scheduler.countdowns), 1)
+
+    def test_work_outside_a_crawl_is_ignored(self):
+        self.crawls.add(None)
+        self.assertFalse(self.crawls.done(None))
+        self.assertFalse(self.crawls.done('expired'))
+        self.assertEqual(self.scheduler.countdowns, [])
+
+
+class RebuildSchedulerTestCase(TestCase):
+    fixtures = ['parties.json', 'states.json', 'chambers.json']
+
+    def setUp(self):
+        cache.clear()
+
+    def test_requests_are_coalesced(self):
+        scheduler = RecordingScheduler()
+        with self.settings(BILLSERVE_REBUILD_DEBOUNCE=30):
+            self.assertTrue(scheduler.request())
+            self.assertFalse(scheduler.request())
+            self.assertFalse(scheduler.request())
+            self.assertEqual(scheduler.countdowns, [30])
+            self.assertGreater(scheduler.remaining(), 29)
+
+            scheduler.clear()
+            self.assertTrue(scheduler.request())
+            self.assertEqual(len(scheduler.countdowns), 2)
+
+    def test_lock(self):
+        token = rebuilds.acquire()
+        self.assertIsNotNone(token)
+        self.assertIsNone(rebuilds.acquire())
+        rebuilds.release('stale')
+        self.assertIsNone(rebuilds.acquire())
+        rebuilds.release(token)
+        self.assertIsNotNone(rebuilds.acquire())
+
+    def test_rebuild_skips_while_locked(self):
+        token = rebuilds.acquire()
+        # Pretend a debounced rebuild is already queued, so the skipped rebuild joins it
+        cache.set(RebuildScheduler.scheduled_key, True)
+        rebuild()
+        self.assertIsNone(rebuilds.finished_at())
+        self.assertIsNotNone(cache.get(RebuildScheduler.requested_key))
+        rebuilds.release(token)
+
+    def test_rebuild_regenerates_changed_documents(self):
+        state = State.objects.get(pk=32)
+        democrat = Senator.objects.create(first_name='Martin', last_name='Heinrich', state=state,
+                                          party=Party.objects.get(pk=2))
+        republican = Senator.objects.create(first_name='Susan', last_name='Collins', state=state,
+                                            party=Party.objects.get(pk=3))
+        scored, unscored = (Bill.objects.create(bill_url='http://google.com/{n}'.format(n=number))
+                            for number in range(2))
+        scored.sponsors.add(democrat)
+        Cosponsorship.objects.create(legislator=republican, bill=scored, is_original_cosponsor=True,
+                                     cosponsorship_date=datetime.date(2017, 5, 1))
+        BillDocument.objects.regenerate()
+        generated = dict(BillDocument.objects.values_list('bill_id', 'generated'))
+
+        rebuild()
+        regenerated = dict(BillDocument.objects.values_list('bill_id', 'generated'))
+        self.assertGreater(regenerated[scored.pk], generated[scored.pk])
+        self.assertEqual(regenerated[unscored.pk], generated[unscored.pk])
+
+    def test_debounced_rebuild_runs_once(self):
+        cache.set(RebuildScheduler.scheduled_key, True)
+        debounced_rebuild.apply()
+        self.assertIsNotNone(rebuilds.finished_at())
+        self.assertIsNone(cache.get(RebuildScheduler.scheduled_key))
+        self.assertIsNotNone(rebuilds.acquire())
+
+
+class InFlightRegistryTestCase(TestCase):
+    url = 'https://www.govinfo.gov/bulkdata/BILLSTATUS/115/s/BILLSTATUS-115s1.xml'
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.inflight = InFlightRegistry()
+
+    def test_duplicates_reuse_the_first_result(self):
+        calls = []
+
+        def populate():
+            calls.append(self.url)
+            return 7
+
+        self.assertEqual(self.inflight.run(self.url, populate), 7)
+        self.assertEqual(self.inflight.run(self.url, populate), 7)
+        self.assertEqual(calls, [self.url])
+        self.assertEqual(metrics.counters[('populate_duplicates_total', (('outcome', 'reused'),))], 1)
+
+    def test_waits_on_a_claim(self):
+        token = self.inflight.claim(self.url)
+        self.assertIsNone(self.inflight.claim(self.url))
+        self.inflight.resolve(self.url, 3)
+        self.assertEqual(self.inflight.wait(self.url), 3)
+        self.assertIsNotNone(token)
+
+    def test_abandoned_claims_are_retried(self):
+        def fail():
+            raise ValueError('govinfo is down')
+
+        with self.assertRaises(ValueError):
+            self.inflight.run(self.url, fail)
+        self.assertIsNone(cache.get(self.inflight.key(self.url)))
+        self.assertEqual(self.inflight.run(self.url, lambda: 5), 5)
+
+    def test_stuck_claims_time_out(self):
+        token = self.inflight.claim(self.url)
+        with self.settings(BILLSERVE_INFLIGHT_WAIT=0.05, BILLSERVE_INFLIGHT_POLL_INTERVAL=0.01):
+            with self.assertRaises(TimeoutError):
+                self.inflight.run(self.url, lambda: 9)
+        self.assertEqual(cache.get(self.inflight.key(self.url)), token)
+
+    def test_waiters_reclaim_abandoned_urls(self):
+        token = self.inflight.claim(self.url)
+        waits, populated = [], []
+
+        def wait(url):
+            waits.append(url)
+            if len(waits) == 1:
+                # The first task fails, and a third beats this one to the new claim
+                self.inflight.abandon(url, token)
+                self.inflight.claim(url)
+                return None
+            self.inflight.resolve(url, 4)
+            return 4
+
+        with mock.patch.object(self.inflight, 'wait', side_effect=wait):
+            self.assertEqual(self.inflight.run(self.url, lambda: populated.append(1) or 1), 4)
+        self.assertEqual(len(waits), 2)
+        self.assertEqual(populated, [])
+
+
+class CrawlFrontierTestCase(TestCase):
+    urls = ['http://google.com/{n}'.format(n=n) for n in range(1, 5)]
+
+    def setUp(self):
+        cache.clear()
+        self.stored = Bill.objects.create(bill_url=self.urls[0], title='Middle Class CHANCE Act')
+        CrawlFrontier.objects.enqueue(self.urls, 'first')
+
+    @staticmethod
+    def claim(limit, crawl_id='first'):
+        return [url for url, priority in CrawlFrontier.objects.claim(crawl_id, None, limit)]
+
+    def test_new_bills_are_claimed_first(self):
+        self.assertEqual(CrawlFrontier.objects.get(url=self.urls[0]).priority, FrontierPriority.refresh.value)
+        self.assertEqual(CrawlFrontier.objects.claim('first', None, 3),
+                         [(url, FrontierPriority.new.value) for url in self.urls[1:]])
+        self.assertEqual(self.claim(3), self.urls[:1])
+        self.assertEqual(self.claim(3), [])
+        self.assertEqual(CrawlFrontier.objects.queued('first').count(), 4)
+
+    def test_checkpoints(self):
+        CrawlFrontier.objects.claim('first', None, 4)
+        CrawlFrontier.objects.started(self.urls[0])
+        self.assertTrue(CrawlFrontier.objects.finished(self.urls[0], self.stored.pk, claimed=True))
+        with self.settings(BILLSERVE_FRONTIER_ATTEMPTS=2):
+            CrawlFrontier.objects.started(self.urls[1])
+            self.assertTrue(CrawlFrontier.objects.failed(self.urls[1], ValueError('no such bill'), claimed=True))
+            self.assertEqual(CrawlFrontier.objects.get(url=self.urls[1]).status, FrontierStatus.pending.value)
+            CrawlFrontier.objects.claim('first', None, 4)
+            CrawlFrontier.objects.started(self.urls[1])
+            self.assertTrue(CrawlFrontier.objects.failed(self.urls[1], ValueError('no such bill'), claimed=True))
+
+        failed = CrawlFrontier.objects.get(url=self.urls[1])
+        self.assertEqual(failed.status, FrontierStatus.failed.value)
+        self.assertEqual(failed.attempts, 2)
+        self.assertEqual(failed.last_error, 'ValueError: no such bill')
+        self.assertEqual(CrawlFrontier.objects.get(url=self.urls[0]).bill, self.stored)
+
+        progress = CrawlFrontier.objects.progress('first')
+        self.assertEqual(progress['statuses'], {'pending': 0, 'queued': 2, 'done': 1, 'failed': 1})
+        self.assertEqual(progress['remaining'], 2)
+        self.assertEqual(progress['priorities']['refresh']['done'], 1)
+        self.assertGreater(progress['recent_throughput'], 0)
+
+        # A later crawl refreshes what this one finished
+        CrawlFrontier.objects.enqueue(self.urls, 'second')
+        self.assertEqual(CrawlFrontier.objects.unfinished('second').count(), 2)
+        self.assertEqual(CrawlFrontier.objects.unfinished('first').count(), 2)
+
+    def test_stale_and_resumed_urls_are_crawled_again(self):
+        CrawlFrontier.objects.claim('first', None, 2)
+        CrawlFrontier.objects.filter(url=self.urls[1]).update(queued_at=timezone.now() - datetime.timedelta(hours=1))
+        self.assertEqual(CrawlFrontier.objects.requeue_stale('first'), 1)
+        self.assertEqual(self.claim(1), self.urls[1:2])
+
+        self.assertEqual(CrawlFrontier.objects.resume('resumed'), 4)
+        self.assertEqual(CrawlFrontier.objects.unfinished('resumed').count(), 4)
+        self.assertEqual(CrawlFrontier.objects.queued('resumed').count(), 0)
+
+    def test_slow_tasks_are_only_counted_once(self):
+        crawl_id = crawls.start(2)
+        CrawlFrontier.objects.filter(url=self.urls[0]).update(crawl_id=crawl_id)
+        self.assertEqual(self.claim(1, crawl_id), self.urls[:1])
+        CrawlFrontier.objects.filter(url=self.urls[0]).update(queued_at=timezone.now() - datetime.timedelta(hours=1))
+
+        # drain_frontier gives up on the first task and queues a second one
+        crawls.done(crawl_id, CrawlFrontier.objects.requeue_stale(crawl_id))
+        self.assertEqual(self.claim(1, crawl_id), self.urls[:1])
+        crawls.add(crawl_id)
+        self.assertEqual(crawls.pending(crawl_id), 2)
+
+        # Both turn up, and only the first to settle the URL counts
+        self.assertEqual(populate_bill(self.urls[0], crawl_id=crawl_id, claimed=True), self.stored.pk)
+        self.assertEqual(crawls.pending(crawl_id), 1)
+        self.assertEqual(populate_bill(self.urls[0], crawl_id=crawl_id, claimed=True), self.stored.pk)
+        self.assertEqual(crawls.pending(crawl_id), 1)
+        self.assertEqual(CrawlFrontier.objects.get(url=self.urls[0]).status, FrontierStatus.done.value)
+
+    def test_progress_view(self):
+        crawl_id = crawls.start(1)
+        response = self.client.get(reverse('crawl-progress'), {'crawl': crawl_id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total'], 0)
+        self.assertEqual(response.json()['barrier']['pending'], 1)
+        self.assertEqual(self.client.get(reverse('crawl-progress')).json()['total'], 4)
+
+
+class RefreshTestCase(TestCase):
+    fixtures = ['states.json', 'parties.json', 'chambers.json']
+
+    def setUp(self):
+        cache.clear()
+        congress = generate_congress.Congress(legislators=20, bills=5, related_density=0, seed=1)
+        bill = max(congress.bills, key=lambda bill: len(bill['cosponsors']))
+        self.data = GovinfoClient.parse_bill(congress.bill_xml(bill).encode(), congress.url(bill))
+        self.data['url'] = congress.url(bill)
+
+    def test_refresh_replaces_the_stored_bill(self):
+        bill = Bill.objects.create_from_dict(self.data)
+        changes = ChangeEvent.objects.latest('pk').pk
+        self.data['title'] = 'Sunshine Act'
+        self.data['cosponsors'].pop()
+
+        refreshed = Bill.objects.create_from_dict(self.data, refresh=True)
+        self.assertEqual(refreshed.pk, bill.pk)
+        self.assertEqual(Bill.objects.count(), 1)
+        self.assertEqual(refreshed.title, 'Sunshine Act')
+        self.assertEqual(refreshed.num_cosponsors, len(self.data['cosponsors']))
+        self.assertEqual(Cosponsorship.objects.filter(bill=bill).count(), len(self.data['cosponsors']))
+        self.assertEqual(set(ChangeEvent.objects.filter(pk__gt=changes).values_list('resource', 'action')),
+                         {('bills', ChangeAction.updated.value), ('cosponsorships', ChangeAction.deleted.value)})
+
+
+    def test_refresh_regenerates_related_documents(self):
+        bill = Bill.objects.create_from_dict(self.data)
+        related = Bill.objects.create(bill_url='related', type='hr', bill_number=1, title='Related', congress=115,
+                                      last_modified=timezone.now() - datetime.timedelta(days=1))
+        Bill.objects.add_related_bill(bill.pk, related.pk)
+        modified = Bill.objects.get(pk=related.pk).last_modified
+        self.data['title'] = 'Sunshine Act'
+
+        Bill.objects.create_from_dict(self.data, refresh=True)
+        self.assertGreater(Bill.objects.get(pk=related.pk).last_modified, modified)
+        self.assertIn('Sunshine Act', BillDocument.objects.get(bill=related).payload)
+
+    def test_ingest_records_rescored_collaborators(self):
+        sponsor, created = Legislator.objects.get_or_create_from_dict(self.data['sponsors'][0])
+        collaborator = Senator.objects.create(first_name='Angus', last_name='King', state=State.objects.get(pk=32),
+                                              party=Party.objects.get(pk=1))
+        Collaboration.objects.record_bill([sponsor.pk, collaborator.pk])
+
+        Bill.objects.create_from_dict(self.data)
+        self.assertIn(collaborator.pk, ChangeEvent.objects.filter(resource='collaborations')
+                      .values_list('object_pk', flat=True))
+
+    def test_failed_ingest_leaves_nothing_behind(self):
+        self.data['committees']['billCommittees'] = [{'name': 'Committee on Nothing', 'chamber': 'House'}]
+        with self.assertRaises(KeyError):
+            Bill.objects.create_from_dict(self.data)
+        self.assertFalse(Bill.objects.exists())
+        self.assertFalse(BillDocument.objects.exists())
+        self.assertFalse(ChangeEvent.objects.exists())
+
+class CrawlSchedulerTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_current_congress(self):
+        self.assertEqual(current_congress(datetime.date(2017, 1, 3)), 115)
+        self.assertEqual(current_congress(datetime.date(2018, 12, 31)), 115)
+        self.assertEqual(current_congress(datetime.date(2019, 1, 2)), 115)
+        self.assertEqual(current_congress(datetime.date(2019, 1, 3)), 116)
+
+    def test_current_congress_is_refreshed_more_often(self):
+        current = current_congress()
+        with self.settings(BILLSERVE_CRAWL_FIRST_CONGRESS=current - 1, BILLSERVE_CRAWL_COLLECTIONS=('s', 'sjres')):
+            self.assertEqual(scheduler.due(), [(current, 's'), (current, 'sjres'), (current - 1, 's'),
+                                               (current - 1, 'sjres')])
+            CollectionCrawl.objects.record(scheduler.pairs(), 'first')
+            self.assertEqual(scheduler.due(), [])
+
+            later = timezone.now() + datetime.timedelta(days=1)
+            self.assertEqual(scheduler.due(later), [(current, 's'), (current, 'sjres')])
+            self.assertEqual(len(scheduler.due(later + datetime.timedelta(days=30))), 4)
+
+    def test_collection_concurrency(self):
+        urls = [GovinfoClient.create_bill_url(115, bill_type, number) for bill_type in ('hr', 'hconres')
+                for number in range(1, 6)]
+        CrawlFrontier.objects.enqueue(urls, 'first')
+        self.assertEqual(CrawlFrontier.objects.get(url=urls[0]).collection, 'hr')
+        with self.settings(BILLSERVE_COLLECTION_CONCURRENCY={'hconres': 2}, BILLSERVE_FRONTIER_BATCH=4):
+            self.assertEqual(CrawlFrontier.objects.top_ups('first'), {'hr': 4, 'hconres': 2})
+            CrawlFrontier.objects.claim('first', 'hconres', 2)
+            self.assertEqual(CrawlFrontier.objects.top_ups('first'), {'hr': 4, 'hconres': 0})
@@ -0,0 +1,57 @@
+import os
+import shutil
+import tempfile
+
+import urllib3
+from django.test import SimpleTestCase, override_settings
+from billserve.networking.client import GovinfoClient
+from billserve.networking.fakegovinfo import FakeGovinfoServer
+from billserve.networking.http import HttpClient
+
+BILL = '<?xml version="1.0" encoding="UTF-8"?><billStatus><bill><billNumber>{number}</billNumber></bill></billStatus>'
+
+
+class FakeGovinfoTestCase(SimpleTestCase):
+    def setUp(self):
+        self.corpus = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.corpus)
+        directory = os.path.join(self.corpus, 'bulkdata', 'BILLSTATUS', '115', 's')
+        os.makedirs(directory)
+        for number in (1, 2):
+            with open(os.path.join(directory, 'BILLSTATUS-115s{n}.xml'.format(n=number)), 'w') as xml:
+                xml.write(BILL.format(number=number))
+
+    def serve(self, **kwargs):
+        server = FakeGovinfoServer(('127.0.0.1', 0), self.corpus, seed=0, **kwargs)
+        server.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        settings = override_settings(BILLSERVE_GOVINFO_BASE_URL=server.base_url, BILLSERVE_GOVINFO_BACKOFF=0,
+                                     BILLSERVE_GOVINFO_RETRIES=3)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        return server
+
+    def test_listing_and_bills(self):
+        self.serve()
+        urls = GovinfoClient.create_bill_url_list_from_origin(GovinfoClient.create_listing_url(115, 'S'))
+        self.assertEqual(urls, [GovinfoClient.create_bill_url(115, 'S', 1), GovinfoClient.create_bill_url(115, 'S', 2)])
+        self.assertIn(b'<billNumber>2</billNumber>', HttpClient.get(urls[1]).data)
+
+    def test_not_found(self):
+        self.serve()
+        with self.assertRaises(urllib3.exceptions.HTTPError):
+            HttpClient.get(GovinfoClient.create_bill_url(115, 'S', 3))
+
+    def test_throttled_requests_are_retried(self):
+        server = self.serve(throttle_rate=0.5, retry_after=0)
+        for _ in range(5):
+            HttpClient.get(GovinfoClient.create_bill_url(115, 'S', 1))
+        self.assertEqual(server.counts['served'], 5)
+        self.assertGreater(server.counts['throttled'], 0)
+
+    def test_gives_up_after_retries(self):
+        server = self.serve(throttle_rate=1, retry_after=0)
+        with self.assertRaises(urllib3.exceptions.HTTPError):
+            HttpClient.get(GovinfoClient.create_bill_url(115, 'S', 1))
+        self.assertEqual(server.counts['throttled'], 4)
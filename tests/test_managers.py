@@ -1,6 +1,8 @@
 from django.test import TestCase
+from django.urls import reverse
 from billserve.managers import *
 from billserve.models import *
+from billserve.enumerations import LegislatorType
 import json
 
 
@@ -288,3 +290,60 @@ class BillManagerTestCase(TestCase):
         # TODO: Test to make sure a bill doesn't have two original cosponsors.
         pass
 
+
+class LegislatorDenormalizationTestCase(TestCase):
+    fixtures = ['states.json', 'parties.json', 'districts.json']
+
+    def setUp(self):
+        self.senator = Senator.objects.create(
+            first_name='Martin', last_name='Heinrich', state=State.objects.get(pk=32), party=Party.objects.get(pk=2))
+        self.representative = Representative.objects.create(
+            first_name='David', last_name='Joyce', state=State.objects.get(pk=36),
+            party=Party.objects.get(pk=3), district=District.objects.get(pk=1))
+
+    def test_save_copies_columns(self):
+        legislator = Legislator.objects.denormalized().get(pk=self.representative.pk)
+        self.assertEqual(legislator.legislator_type, LegislatorType.representative.value)
+        self.assertEqual(legislator.legislator_party_id, 3)
+        self.assertEqual(legislator.legislator_district_id, 1)
+
+    def test_sync_denormalized(self):
+        Senator.objects.filter(pk=self.senator.pk).update(party=Party.objects.get(pk=1))
+        Legislator.objects.non_polymorphic().update(legislator_type=None, legislator_district=None)
+        Legislator.objects.sync_denormalized()
+        senator = Legislator.objects.denormalized().get(pk=self.senator.pk)
+        representative = Legislator.objects.denormalized().get(pk=self.representative.pk)
+        self.assertEqual(senator.legislator_type, LegislatorType.senator.value)
+        self.assertEqual(senator.legislator_party_id, 1)
+        self.assertEqual(representative.legislator_district_id, 1)
+
+    def test_unsynced_legislators_are_still_served(self):
+        expected = self.client.get(reverse('legislator-list')).json()
+        Legislator.objects.non_polymorphic().update(legislator_type=None, legislator_district=None)
+        self.assertEqual(self.client.get(reverse('legislator-list')).json(), expected)
+
+
+class BillCountersTestCase(TestCase):
+    fixtures = ['states.json', 'parties.json']
+
+    def setUp(self):
+        self.senator = Senator.objects.create(
+            first_name='Martin', last_name='Heinrich', state=State.objects.get(pk=32), party=Party.objects.get(pk=2))
+        self.bill = Bill.objects.create(bill_url='http://google.com/1')
+        self.other_bill = Bill.objects.create(bill_url='http://google.com/2')
+        self.bill.sponsors.add(self.senator)
+        Cosponsorship.objects.create(legislator=self.senator, bill=self.bill, is_original_cosponsor=True,
+                                     cosponsorship_date=format_date('2017-05-01', '%Y-%m-%d'))
+
+    def test_refresh_counters(self):
+        res = Bill.objects.refresh_counters()
+        self.assertEqual(res, 2)
+        self.bill.refresh_from_db()
+        self.other_bill.refresh_from_db()
+        self.assertEqual((self.bill.sponsor_count(), self.bill.co_sponsor_count()), (1, 1))
+        self.assertEqual((self.other_bill.sponsor_count(), self.other_bill.co_sponsor_count()), (0, 0))
+
+    def test_refresh_counters_subset(self):
+        Bill.objects.refresh_counters([self.other_bill.pk])
+        self.bill.refresh_from_db()
+        self.assertEqual(self.bill.co_sponsor_count(), 0)
@@ -0,0 +1,58 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from billserve.metrics import Histogram, Metrics, metrics
+from billserve.models import *
+
+
+class HistogramTestCase(TestCase):
+    def test_buckets_and_quantiles(self):
+        histogram = Histogram((1, 2, 4))
+        for value in (0.5, 1, 1.5, 3, 10):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [2, 1, 1, 1])
+        self.assertEqual(histogram.count, 5)
+        self.assertEqual(histogram.quantile(.2), 0.5)
+        self.assertEqual(histogram.quantile(1), 4)
+        self.assertIsNone(Histogram((1,)).quantile(.5))
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    def test_queries(self):
+        with metrics.queries('bill_store'):
+            list(Party.objects.all())
+            list(State.objects.all())
+        histogram = metrics.histograms[('bill_store_queries', ())]
+        self.assertEqual(histogram.total, 2)
+
+    def test_processes_are_aggregated(self):
+        other = Metrics()
+        other.process = 'worker-2:1'
+        for recorder in (metrics, other):
+            recorder.observe('bill_parse_seconds', 0.02)
+            recorder.increment('govinfo_fetched_bytes_total', 100)
+        other.flush()
+
+        summary = metrics.summary()
+        self.assertEqual(len(summary['workers']), 2)
+        self.assertEqual(summary['metrics']['bill_parse_seconds'][0]['count'], 2)
+        self.assertEqual(summary['metrics']['govinfo_fetched_bytes_total'][0]['value'], 200)
+
+    def test_prometheus_view(self):
+        metrics.observe('task_queue_seconds', 0.3, task='billserve.tasks.populate_bill')
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn('# TYPE billserve_task_queue_seconds histogram', text)
+        self.assertIn('billserve_task_queue_seconds_bucket{{worker="{process}",task="billserve.tasks.populate_bill",'
+                      'le="0.5"}} 1'.format(process=metrics.process), text)
+        self.assertIn('le="+Inf"} 1', text)
+
+    def test_json_view(self):
+        metrics.increment('bills_stored_total')
+        response = self.client.get(reverse('metrics', kwargs={'format': 'json'}))
+        self.assertEqual(response.json()['metrics']['bills_stored_total'], [{'labels': {}, 'value': 1}])
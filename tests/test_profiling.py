@@ -0,0 +1,55 @@
+import glob
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from billserve.models import *
+from billserve.profiling import profiled
+
+
+@profiled('fibonacci')
+def fibonacci(n):
+    return n if n < 2 else fibonacci(n - 1) + fibonacci(n - 2)
+
+
+@profiled('square')
+def square(n):
+    return n * n
+
+
+class ProfilingTestCase(TestCase):
+    fixtures = ['parties.json', 'bills.json']
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def profiles(self, pattern='*.pstats'):
+        return glob.glob(os.path.join(self.directory, pattern))
+
+    def test_untargeted_calls_are_not_profiled(self):
+        with override_settings(BILLSERVE_PROFILE=['BillDetail'], BILLSERVE_PROFILE_DIR=self.directory):
+            self.assertEqual(fibonacci(10), 55)
+        self.assertEqual(self.profiles(), [])
+
+    def test_nested_calls_write_one_profile(self):
+        with override_settings(BILLSERVE_PROFILE='fibonacci', BILLSERVE_PROFILE_DIR=self.directory,
+                               BILLSERVE_PROFILE_MEMORY=True):
+            self.assertEqual(fibonacci(10), 55)
+        self.assertEqual(len(self.profiles()), 1)
+        self.assertEqual(len(self.profiles('*.allocations.txt')), 1)
+
+    def test_sample_rate(self):
+        with override_settings(BILLSERVE_PROFILE='*', BILLSERVE_PROFILE_DIR=self.directory,
+                               BILLSERVE_PROFILE_SAMPLE_RATE=3):
+            for n in range(6):
+                square(n)
+        self.assertEqual(len(self.profiles()), 2)
+
+    def test_view(self):
+        with override_settings(BILLSERVE_PROFILE='BillDetail', BILLSERVE_PROFILE_DIR=self.directory):
+            response = self.client.get(reverse('bill-detail', kwargs={'pk': 1}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.profiles('BillDetail-*.pstats')), 1)
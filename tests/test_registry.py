@@ -0,0 +1,32 @@
+from django.test import TestCase
+from billserve.models import *
+from billserve.registry import reference_data
+
+
+class ReferenceRegistryTestCase(TestCase):
+    fixtures = ['states.json', 'parties.json']
+
+    def setUp(self):
+        reference_data.current()
+
+    def test_lookups_skip_database(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(reference_data.state_by_abbreviation('NM').pk, 32)
+            self.assertEqual(reference_data.party(2).abbreviation, 'D')
+
+    def test_save_reloads(self):
+        party = Party.objects.get(pk=2)
+        party.name = 'Democratic-Farmer-Labor'
+        party.save()
+        self.assertEqual(reference_data.party(2).name, 'Democratic-Farmer-Labor')
+
+    def test_miss_reloads(self):
+        Chamber.objects.bulk_create([Chamber(name='House', abbreviation='H')])
+        self.assertEqual(reference_data.chamber_by_name('House').abbreviation, 'H')
+
+    def test_missing(self):
+        with self.assertRaises(State.DoesNotExist):
+            reference_data.state_by_abbreviation('ZZ')
+
+    def test_footprint(self):
+        self.assertGreater(reference_data.current().footprint(), 0)
@@ -0,0 +1,52 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+from billserve.models import *
+from billserve.search import BillSearchIndex
+import datetime
+
+
+@skipUnless(connection.vendor in {'sqlite', 'postgresql'}, 'Full-text search needs SQLite or PostgreSQL')
+class BillSearchIndexTestCase(TestCase):
+    def setUp(self):
+        self.education = Bill.objects.create(bill_url='http://google.com/1', title='Middle Class CHANCE Act')
+        BillSummary.objects.create(name='Introduced in Senate', action_description='Introduced in Senate',
+                                   action_date=datetime.date(2017, 5, 1), bill=self.education,
+                                   text='<p>Creating Higher <strong>Education</strong> Affordability</p>')
+        self.tax = Bill.objects.create(bill_url='http://google.com/2', title='Education Tax Relief Act')
+        self.other = Bill.objects.create(bill_url='http://google.com/3', title='Sunshine Act')
+        for bill in (self.education, self.tax, self.other):
+            BillSearchIndex.update(bill)
+
+    def test_search_summaries(self):
+        res = BillSearchIndex.search(Bill.objects.all(), 'affordability')
+        self.assertEqual(list(res), [self.education])
+
+    def test_search_ranks_title_matches_first(self):
+        res = BillSearchIndex.search(Bill.objects.all(), 'education')
+        self.assertEqual(list(res), [self.tax, self.education])
+
+    def test_search_requires_every_word(self):
+        res = BillSearchIndex.search(Bill.objects.all(), 'education tax')
+        self.assertEqual(list(res), [self.tax])
+
+    def test_search_ignores_query_syntax(self):
+        res = BillSearchIndex.search(Bill.objects.all(), '"sunshine" OR NEAR(')
+        self.assertEqual(list(res), [])
+
+    def test_update_replaces_document(self):
+        self.other.title = 'Higher Education Act'
+        self.other.save()
+        BillSearchIndex.update(self.other)
+        res = BillSearchIndex.search(Bill.objects.all(), 'sunshine')
+        self.assertEqual(list(res), [])
+
+    def test_delete_removes_document(self):
+        pk = self.other.pk
+        self.other.delete()
+        # A new bill given the deleted bill's primary key mustn't inherit its document
+        reused = Bill.objects.create(pk=pk, bill_url='http://google.com/4', title='Higher Education Act')
+        self.assertEqual(list(BillSearchIndex.search(Bill.objects.all(), 'sunshine')), [])
+        BillSearchIndex.update(reused)
+        self.assertIn(reused, BillSearchIndex.search(Bill.objects.all(), 'higher'))
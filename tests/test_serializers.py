@@ -0,0 +1,55 @@
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from billserve.registry import reference_data
+from billserve.serializers import *
+import datetime
+
+
+class RowSerializerTestCase(TestCase):
+    fixtures = ['states.json', 'parties.json', 'districts.json', 'policy_areas.json']
+
+    def setUp(self):
+        Senator.objects.create(first_name='Martin', last_name='Heinrich', state=State.objects.get(pk=32),
+                               party=Party.objects.get(pk=2))
+        Representative.objects.create(first_name='David', last_name='Joyce', state=State.objects.get(pk=36),
+                                      party=Party.objects.get(pk=3), district=District.objects.get(pk=1))
+        Representative.objects.create(first_name='Eleanor', last_name='Norton', state=State.objects.get(pk=9),
+                                      party=Party.objects.get(pk=2))
+        Bill.objects.create(bill_url='http://google.com/1', title='Middle Class CHANCE Act', bill_number=996,
+                            introduction_date=datetime.date(2017, 5, 1), policy_area=PolicyArea.objects.get(pk=1))
+        Bill.objects.create(bill_url='http://google.com/2')
+
+    def assertSameOutput(self, serializer_class, row_serializer_class, queryset, format=None):
+        request = Request(APIRequestFactory().get('/', SERVER_NAME='billserve.test'))
+        expected = serializer_class(queryset, many=True, context={'request': request, 'format': format}).data
+        row_serializer = row_serializer_class(request, format)
+        res = row_serializer.many(row_serializer.rows(queryset))
+        self.assertEqual(JSONRenderer().render(res), JSONRenderer().render(expected))
+
+    def test_bill_short(self):
+        self.assertSameOutput(BillShortSerializer, BillShortRowSerializer, Bill.objects.order_by('pk'))
+
+    def test_bill_short_format_suffix(self):
+        self.assertSameOutput(BillShortSerializer, BillShortRowSerializer, Bill.objects.order_by('pk'), 'json')
+
+    def test_senator_short(self):
+        self.assertSameOutput(SenatorShortSerializer, SenatorShortRowSerializer, Senator.objects.order_by('pk'))
+
+    def test_representative_short(self):
+        self.assertSameOutput(RepresentativeShortSerializer, RepresentativeShortRowSerializer,
+                              Representative.objects.order_by('pk'))
+
+    def test_legislator_list(self):
+        self.assertSameOutput(LegislatorListSerializer, LegislatorListRowSerializer, Legislator.objects.order_by('pk'))
+
+    def test_legislator_summary(self):
+        request = Request(APIRequestFactory().get('/', SERVER_NAME='billserve.test'))
+        expected = LegislatorListSerializer(Legislator.objects.order_by('pk'), many=True,
+                                            context={'request': request}).data
+        reference_data.current()
+        with self.assertNumQueries(1):
+            res = LegislatorSummarySerializer(Legislator.objects.denormalized().order_by('pk'), many=True,
+                                              context={'request': request}).data
+        self.assertEqual(JSONRenderer().render(res), JSONRenderer().render(expected))
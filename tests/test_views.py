@@ -0,0 +1,247 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from billserve.models import *
+import datetime
+import json
+
+
+class ConditionalRetrieveTestCase(TestCase):
+    fixtures = ['parties.json', 'bills.json']
+
+    def setUp(self):
+        self.bill = Bill.objects.get(pk=1)
+        self.bill.last_modified = timezone.now()
+        self.bill.save()
+        self.url = reverse('bill-detail', kwargs={'pk': self.bill.pk})
+
+    def test_etag_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('ETag'))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since_not_modified(self):
+        response = self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_modified_after_ingest(self):
+        etag = self.client.get(self.url)['ETag']
+        Bill.objects.filter(pk=self.bill.pk).update(last_modified=timezone.now())
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_never_ingested_has_no_validator(self):
+        Bill.objects.filter(pk=self.bill.pk).update(last_modified=None)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+
+class ExportTestCase(TestCase):
+    fixtures = ['states.json', 'parties.json', 'bills.json']
+
+    def setUp(self):
+        self.old_bill = Bill.objects.get(pk=1)
+        self.old_bill.last_modified = timezone.make_aware(datetime.datetime(2018, 1, 1))
+        self.old_bill.save()
+        self.new_bill = Bill.objects.create(bill_url='http://google.com', title='Sunshine Act',
+                                            last_modified=timezone.make_aware(datetime.datetime(2018, 6, 1)))
+        self.senator = Senator.objects.create(first_name='Martin', last_name='Heinrich',
+                                              state=State.objects.get(pk=32), party=Party.objects.get(pk=2))
+        Cosponsorship.objects.create(legislator=self.senator, bill=self.new_bill, is_original_cosponsor=True,
+                                     cosponsorship_date=datetime.date(2018, 6, 1))
+
+    def export(self, resource, format='ndjson', **params):
+        response = self.client.get(reverse('export', kwargs={'resource': resource, 'format': format}), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson(self):
+        lines = [json.loads(line) for line in self.export('bills').splitlines()]
+        self.assertEqual([line['id'] for line in lines], [self.old_bill.pk, self.new_bill.pk])
+        self.assertEqual(lines[0]['introduction_date'], '2017-05-01')
+
+    def test_csv(self):
+        lines = self.export('cosponsorships', 'csv').splitlines()
+        self.assertEqual(lines[0], 'id,bill_id,legislator_id,is_original_cosponsor,cosponsorship_date')
+        self.assertEqual(len(lines), 2)
+
+    def test_updated_since(self):
+        lines = self.export('bills', updated_since='2018-03-01').splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [self.new_bill.pk])
+
+    def test_updated_since_joins_bill(self):
+        self.assertEqual(self.export('cosponsorships', updated_since='2018-07-01'), '')
+
+    def test_bad_updated_since(self):
+        response = self.client.get(reverse('export', kwargs={'resource': 'bills', 'format': 'ndjson'}),
+                                   {'updated_since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_unknown_export(self):
+        response = self.client.get(reverse('export', kwargs={'resource': 'votes', 'format': 'ndjson'}))
+        self.assertEqual(response.status_code, 404)
+
+
+class BatchTestCase(TestCase):
+    fixtures = ['states.json', 'parties.json', 'districts.json', 'policy_areas.json']
+
+    def setUp(self):
+        self.senator = Senator.objects.create(first_name='Martin', last_name='Heinrich',
+                                              state=State.objects.get(pk=32), party=Party.objects.get(pk=2))
+        self.representative = Representative.objects.create(
+            first_name='David', last_name='Joyce', state=State.objects.get(pk=36), party=Party.objects.get(pk=3),
+            district=District.objects.get(pk=1))
+        self.bills = []
+        for number in range(4):
+            bill = Bill.objects.create(bill_url='http://google.com/{n}'.format(n=number), bill_number=number,
+                                       policy_area=PolicyArea.objects.get(pk=1))
+            bill.sponsors.add(self.senator)
+            Cosponsorship.objects.create(legislator=self.representative, bill=bill, is_original_cosponsor=True,
+                                         cosponsorship_date=datetime.date(2017, 5, 1))
+            self.bills.append(bill)
+        self.bills[0].related_bills.add(self.bills[1])
+
+    def batch(self, name, pks):
+        return self.client.get(reverse(name), {'ids': ','.join(str(pk) for pk in pks)})
+
+    def test_bill_batch_matches_detail(self):
+        response = self.batch('bill-list', [self.bills[2].pk, self.bills[0].pk])
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        detail = self.client.get(reverse('bill-detail', kwargs={'pk': self.bills[0].pk})).json()
+        self.assertEqual(results[1], detail)
+        self.assertEqual(results[0]['bill_number'], 2)
+
+    def test_bill_batch_query_count_is_constant(self):
+        with CaptureQueriesContext(connection) as one:
+            self.batch('bill-list', [self.bills[0].pk])
+        with CaptureQueriesContext(connection) as many:
+            self.batch('bill-list', [bill.pk for bill in self.bills])
+        self.assertEqual(len(one), len(many))
+
+    def test_bill_batch_post(self):
+        response = self.client.post(reverse('bill-batch'), {'ids': [self.bills[1].pk, 999]},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 1)
+        self.assertEqual(response.json()['missing'], [999])
+
+    def test_bill_batch_bad_ids(self):
+        response = self.batch('bill-list', ['one'])
+        self.assertEqual(response.status_code, 400)
+
+    def test_legislator_batch(self):
+        response = self.client.post(reverse('legislator-batch'), {'ids': [self.representative.pk, self.senator.pk]},
+                                    content_type='application/json')
+        results = response.json()['results']
+        self.assertEqual(results[0]['district'], 1)
+        self.assertEqual(len(results[0]['cosponsored_bills']), 4)
+        self.assertEqual(len(results[1]['sponsored_bills']), 4)
+
+    def test_legislative_subject_detail(self):
+        subject = LegislativeSubject.objects.create(name='Higher education')
+        for bill in self.bills:
+            bill.legislative_subjects.add(subject)
+        response = self.client.get(reverse('legislativesubject-detail', kwargs={'pk': subject.pk}))
+        top_sponsors = response.json()['active_legislators']['top_sponsors']
+        self.assertEqual(top_sponsors[0]['count'], 4)
+        self.assertTrue(top_sponsors[0]['legislator']['full_name'].startswith('Sen. Martin Heinrich'))
+
+
+class BillListTestCase(TestCase):
+    fixtures = ['parties.json']
+
+    def setUp(self):
+        for number, cosponsors in enumerate((3, 0, 7)):
+            Bill.objects.create(bill_url='http://google.com/{n}'.format(n=number), bill_number=number,
+                                num_cosponsors=cosponsors)
+
+    def bill_numbers(self, **params):
+        response = self.client.get(reverse('bill-list'), params)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        results = results['results'] if isinstance(results, dict) else results
+        return [result['title'].split(':')[0] for result in results]
+
+    def test_ordering(self):
+        self.assertEqual(self.bill_numbers(ordering='-cosponsor_count'), ['No. 2', 'No. 0', 'No. 1'])
+
+    def test_min_cosponsors(self):
+        self.assertEqual(self.bill_numbers(min_cosponsors=3, ordering='cosponsor_count'), ['No. 0', 'No. 2'])
+
+    def test_bad_ordering(self):
+        response = self.client.get(reverse('bill-list'), {'ordering': 'title'})
+        self.assertEqual(response.status_code, 400)
+
+
+class BillDocumentTestCase(TestCase):
+    fixtures = ['states.json', 'parties.json', 'districts.json', 'policy_areas.json']
+
+    def setUp(self):
+        senator = Senator.objects.create(first_name='Martin', last_name='Heinrich', state=State.objects.get(pk=32),
+                                         party=Party.objects.get(pk=2))
+        self.bill = Bill.objects.create(bill_url='http://google.com/1', title='Middle Class CHANCE Act',
+                                        bill_number=996, policy_area=PolicyArea.objects.get(pk=1),
+                                        last_modified=timezone.now())
+        self.bill.sponsors.add(senator)
+        self.url = reverse('bill-detail', kwargs={'pk': self.bill.pk})
+        self.live = self.client.get(self.url).content
+        BillDocument.objects.regenerate([self.bill.pk])
+
+    def test_serves_stored_document(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.content, self.live)
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_hyperlinks_follow_request_host(self):
+        response = self.client.get(self.url, HTTP_HOST='example.com')
+        self.assertIn('http://example.com/bills/', response.json()['url'])
+        self.assertNotIn('billserve.invalid', response.content.decode())
+
+    def test_inconsistent(self):
+        self.assertEqual(BillDocument.objects.inconsistent(), [])
+        Bill.objects.filter(pk=self.bill.pk).update(title='Sunshine Act')
+        self.assertEqual(BillDocument.objects.inconsistent(), [self.bill.pk])
+        BillDocument.objects.regenerate()
+        self.assertIn(b'Sunshine Act', self.client.get(self.url).content)
+
+
+class LegislatorCollaboratorsTestCase(TestCase):
+    fixtures = ['states.json', 'parties.json']
+
+    def setUp(self):
+        state, party = State.objects.get(pk=32), Party.objects.get(pk=2)
+        self.heinrich = Senator.objects.create(first_name='Martin', last_name='Heinrich', state=state, party=party)
+        self.udall = Senator.objects.create(first_name='Tom', last_name='Udall', state=state, party=party)
+        bill = Bill.objects.create(bill_url='http://google.com')
+        bill.sponsors.add(self.heinrich)
+        Cosponsorship.objects.create(legislator=self.udall, bill=bill, is_original_cosponsor=True,
+                                     cosponsorship_date=datetime.date(2017, 5, 1))
+        Collaboration.objects.rebuild()
+
+    def test_collaborators(self):
+        response = self.client.get(reverse('legislator-collaborators', kwargs={'pk': self.heinrich.pk}))
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual(len(results), 1)
+        self.assertTrue(results[0]['legislator']['full_name'].startswith('Sen. Tom Udall'))
+        self.assertEqual(results[0]['shared_bills'], 1)
+        self.assertEqual(results[0]['similarity'], 1.0)
+
+    def test_bad_limit(self):
+        response = self.client.get(reverse('legislator-collaborators', kwargs={'pk': self.heinrich.pk}),
+                                   {'limit': 0})
+        self.assertEqual(response.status_code, 400)
+
+    def test_unknown_legislator(self):
+        response = self.client.get(reverse('legislator-collaborators', kwargs={'pk': 999}))
+        self.assertEqual(response.status_code, 404)
@@ -10,21 +10,35 @@ urlpatterns = format_suffix_patterns([
     path('', views.api_root),
     path('update', views.update_view, name='update'),
     path('rebuild', views.rebuild_view, name='rebuild'),
+    re_path(r'^metrics/$', views.metrics_view, name='metrics'),
+    re_path(r'^crawls/progress/$', views.crawl_progress_view, name='crawl-progress'),
+    re_path(r'^exports/(?P<resource>[a-z-]+)/$', views.export_view, name='export'),
+    re_path(r'^activity/$', views.ActivitySeries.as_view(), name='activity'),
+    re_path(r'^changes/$', views.ChangeFeed.as_view(), name='changes'),
+    re_path(r'^autocomplete/$', views.AutocompleteSuggestions.as_view(), name='autocomplete'),
     re_path(r'^parties/$', views.PartyList.as_view(), name='party-list'),
     re_path(r'^states/$', views.StateList.as_view(), name='state-list'),
     re_path(r'^districts/$', views.DistrictList.as_view(), name='district-list'),
     re_path(r'^legislators/$', views.LegislatorList.as_view(), name='legislator-list'),
+    re_path(r'^legislators/batch/$', views.LegislatorBatch.as_view(), name='legislator-batch'),
     re_path(r'^representatives/$', views.RepresentativeList.as_view(), name='representative-list'),
     re_path(r'^senators/$', views.SenatorList.as_view(), name='senator-list'),
     re_path(r'^bills/$', views.BillList.as_view(), name='bill-list'),
+    re_path(r'^bills/batch/$', views.BillBatch.as_view(), name='bill-batch'),
     re_path(r'^legislative-subjects/$', views.LegislativeSubjectList.as_view(), name='legislativesubject-list'),
     re_path(r'^policy-areas/$', views.PolicyAreaList.as_view(), name='policyarea-list'),
     re_path(r'^parties/(?P<pk>[0-9]+)/$', views.PartyDetail.as_view(), name='party-detail'),
     re_path(r'^states/(?P<pk>[0-9]+)/$', views.StateDetail.as_view(), name='state-detail'),
     re_path(r'^districts/(?P<pk>[0-9]+)/$', views.DistrictDetail.as_view(), name='district-detail'),
+    re_path(r'^legislators/(?P<pk>[0-9]+)/collaborators/$', views.LegislatorCollaborators.as_view(),
+            name='legislator-collaborators'),
+    re_path(r'^legislators/(?P<pk>[0-9]+)/votes/$', views.LegislatorVotes.as_view(), name='legislator-votes'),
+    re_path(r'^legislators/(?P<pk>[0-9]+)/agreement/$', views.LegislatorAgreement.as_view(),
+            name='legislator-agreement'),
     re_path(r'^representatives/(?P<pk>[0-9]+)/$', views.RepresentativeDetail.as_view(), name='representative-detail'),
     re_path(r'^senators/(?P<pk>[0-9]+)/$', views.SenatorDetail.as_view(), name='senator-detail'),
     re_path(r'^bills/(?P<pk>[0-9]+)/$', views.BillDetail.as_view(), name='bill-detail'),
+    re_path(r'^bills/(?P<pk>[0-9]+)/family/$', views.BillFamily.as_view(), name='bill-family'),
     re_path(r'^legislative-subjects/(?P<pk>[0-9]+)/$', views.LegislativeSubjectDetail.as_view(),
             name='legislativesubject-detail'),
     re_path(r'^policy-areas/(?P<pk>[0-9]+)/$', views.PolicyAreaDetail.as_view(), name='policyarea-detail')
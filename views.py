@@ -1,14 +1,147 @@
+import datetime
+import json
+import zlib
+
 from django.shortcuts import render
-from django.http import HttpResponse, Http404
+from django.http import HttpResponse, HttpResponseBadRequest, Http404, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 
 from rest_framework.reverse import reverse
 from rest_framework import generics
 from rest_framework.decorators import api_view
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from billserve import documents
+from billserve.analytics.votes import VoteMatrix, agreement
+from billserve.autocomplete import KINDS, autocomplete
+from billserve.crawls import crawls, rebuilds
 from billserve.serializers import *
-from billserve.tasks import update, rebuild
+from billserve.search import BillSearchIndex
+from billserve.enumerations import ChangeAction, RollupDimension
+from billserve.exports import exports
+from billserve.metrics import metrics
+from billserve.profiling import profiled_view
+from billserve.registry import reference_data
+from billserve.tasks import schedule_crawls
+
+
+def conditional_retrieve(manager):
+    """
+    Builds a class decorator that lets a detail view answer If-None-Match and If-Modified-Since with a 304 before
+    any query or serialization work happens. The only query made is a read of the instance's last modified timestamp.
+    :param manager: A manager implementing last_modified_for(pk)
+    :return: A decorator for a retrieve view class
+    """
+    def last_modified(request, *args, **kwargs):
+        if not hasattr(request, 'billserve_last_modified'):
+            request.billserve_last_modified = manager.last_modified_for(kwargs['pk'])
+        return request.billserve_last_modified
+
+    def etag(request, *args, **kwargs):
+        timestamp = last_modified(request, *args, **kwargs)
+        if timestamp is None:
+            return None
+        # The same URL renders differently for the browsable API and for JSON, so the representation is part of the tag
+        representation = '{accept};{format}'.format(accept=request.META.get('HTTP_ACCEPT', ''),
+                                                    format=kwargs.get('format'))
+        return '{model}-{pk}-{timestamp}-{representation:x}'.format(
+            model=manager.model._meta.model_name, pk=kwargs['pk'], timestamp=int(timestamp.timestamp() * 1000000),
+            representation=zlib.crc32(representation.encode()))
+
+    return method_decorator(condition(etag_func=etag, last_modified_func=last_modified), name='get')
+
+
+class RowListMixin:
+    """
+    Serves a list view through a row serializer, which reads values_list() tuples and formats hyperlinks from
+    templates instead of instantiating models and reversing a URL per object. The output is identical to the view's
+    serializer_class.
+    """
+    row_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        row_serializer = self.row_serializer_class(request, self.format_kwarg)
+        queryset = row_serializer.rows(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(row_serializer.many(page))
+
+        return Response(row_serializer.many(queryset))
+
+
+class BatchMixin:
+    """
+    Returns many detailed instances in one response, either for a comma separated ids query parameter on GET or for
+    an ids list in a POST body. Instances are fetched with set based prefetching through the manager's
+    in_bulk_detailed method, so a batch costs the same number of queries whatever its size.
+    """
+    batch_manager = None
+    batch_serializer_class = None
+    max_batch_size = 100
+
+    def get_batch_pks(self, ids):
+        """
+        Validates a batch of primary keys.
+        :param ids: A list of primary keys, as integers or strings
+        :return: The primary keys as integers, in order and without duplicates
+        """
+        try:
+            pks = [int(pk) for pk in ids]
+        except (TypeError, ValueError):
+            raise ValidationError({'ids': 'Expected a list of integer ids.'})
+        if len(pks) > self.max_batch_size:
+            raise ValidationError({'ids': 'At most {n} ids may be requested at once.'.format(n=self.max_batch_size)})
+        return list(dict.fromkeys(pks))
+
+    def batch_response(self, ids):
+        """
+        :param ids: A list of primary keys
+        :return: A response containing the serialized instances in the order requested, and the ids not found
+        """
+        pks = self.get_batch_pks(ids)
+        instances = self.batch_manager.in_bulk_detailed(pks)
+        serializer = self.batch_serializer_class(instances, many=True, context=self.get_serializer_context())
+        found = {instance.pk for instance in instances}
+        return Response({'results': serializer.data, 'missing': [pk for pk in pks if pk not in found]})
+
+    def batch_query_ids(self, request):
+        """
+        :param request: A request object
+        :return: The ids in the request's ids query parameter, or None if it has none
+        """
+        ids = request.query_params.get('ids', None)
+        if ids is None:
+            return None
+        return [pk for pk in ids.split(',') if pk]
+
+    def batch_body_ids(self, request):
+        """
+        :param request: A request object
+        :return: The ids in the request body, given as {"ids": [1, 2, 3]} or as a form field
+        """
+        data = request.data
+        if hasattr(data, 'getlist'):
+            return data.getlist('ids')
+        if isinstance(data, dict):
+            return data.get('ids', [])
+        raise ValidationError({'ids': 'Expected a body of the form {"ids": [1, 2, 3]}.'})
+
+
+class BatchAPIView(BatchMixin, generics.GenericAPIView):
+    """
+    Retrieve a batch of detailed instances, with ?ids=1,2,3 or with a body of {"ids": [1, 2, 3]}.
+    """
+    def get(self, request, *args, **kwargs):
+        return self.batch_response(self.batch_query_ids(request) or [])
+
+    def post(self, request, *args, **kwargs):
+        return self.batch_response(self.batch_body_ids(request))
 
 
 @api_view(['GET'])
@@ -82,22 +215,154 @@ class DistrictDetail(generics.RetrieveAPIView):
     serializer_class = DistrictSerializer
 
 
-class LegislatorList(generics.ListAPIView):
+class LegislatorList(BatchMixin, RowListMixin, generics.ListAPIView):
     """
-    List all legislators.
+    List all legislators, or retrieve a batch of detailed legislators with ?ids=1,2,3.
     """
     queryset = Legislator.objects.all()
     serializer_class = LegislatorListSerializer
+    row_serializer_class = LegislatorListRowSerializer
+    batch_manager = Legislator.objects
+    batch_serializer_class = LegislatorDetailSerializer
+
+    def list(self, request, *args, **kwargs):
+        ids = self.batch_query_ids(request)
+        if ids is not None:
+            return self.batch_response(ids)
+        return super().list(request, *args, **kwargs)
 
 
-class RepresentativeList(generics.ListAPIView):
+class LegislatorBatch(BatchAPIView):
+    """
+    Retrieve a batch of detailed legislators, with ?ids=1,2,3 or with a body of {"ids": [1, 2, 3]}.
+    """
+    queryset = Legislator.objects.all()
+    serializer_class = LegislatorDetailSerializer
+    batch_manager = Legislator.objects
+    batch_serializer_class = LegislatorDetailSerializer
+
+
+class LegislatorCollaborators(generics.GenericAPIView):
+    """
+    List the legislators who most often sponsor or cosponsor bills with a legislator. Use ?ordering=similarity to rank
+    them by the Jaccard similarity of their bills instead of the number they share, and ?limit= to choose how many.
+    """
+    queryset = Legislator.objects.denormalized()
+    serializer_class = LegislatorSummarySerializer
+    orderings = ('shared_bills', 'similarity')
+    default_limit = 10
+    max_limit = 100
+
+    def get(self, request, *args, **kwargs):
+        pk = int(kwargs['pk'])
+        if not self.get_queryset().filter(pk=pk).exists():
+            raise Http404
+
+        ordering = request.query_params.get('ordering', self.orderings[0])
+        if ordering not in self.orderings:
+            raise ValidationError({'ordering': 'Expected one of: {orderings}.'.format(
+                orderings=', '.join(self.orderings))})
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            raise ValidationError({'limit': 'Expected an integer.'})
+        if not 0 < limit <= self.max_limit:
+            raise ValidationError({'limit': 'Expected an integer from 1 to {n}.'.format(n=self.max_limit)})
+
+        top = Collaboration.objects.top(pk, limit, ordering)
+        legislators = self.get_queryset().in_bulk([collaborator_pk for collaborator_pk, shared, similarity in top])
+        serializer = self.get_serializer()
+        return Response([{'legislator': serializer.to_representation(legislators[collaborator_pk]),
+                          'shared_bills': shared, 'similarity': similarity}
+                         for collaborator_pk, shared, similarity in top])
+
+
+class LegislatorAgreement(generics.GenericAPIView):
+    """
+    List the legislators who voted the same way as a legislator most often in a congress's roll calls, counting only
+    roll calls on which both voted yea or nay. Use ?ordering=least for the ones who agreed least often, ?congress= to
+    choose the congress, by default the latest with roll calls, and ?limit= to choose how many.
+    """
+    queryset = Legislator.objects.denormalized()
+    serializer_class = LegislatorSummarySerializer
+    orderings = ('most', 'least')
+    default_limit = 10
+    max_limit = 100
+
+    def get(self, request, *args, **kwargs):
+        legislator = Legislator.objects.non_polymorphic().only('pk', 'legislator_type', 'vote_ordinal')\
+            .filter(pk=kwargs['pk']).first()
+        if legislator is None:
+            raise Http404
+
+        ordering = request.query_params.get('ordering', self.orderings[0])
+        if ordering not in self.orderings:
+            raise ValidationError({'ordering': 'Expected one of: {orderings}.'.format(
+                orderings=', '.join(self.orderings))})
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            raise ValidationError({'limit': 'Expected an integer.'})
+        if not 0 < limit <= self.max_limit:
+            raise ValidationError({'limit': 'Expected an integer from 1 to {n}.'.format(n=self.max_limit)})
+
+        roll_calls = RollCall.objects.for_legislator(legislator)
+        if 'congress' in request.query_params:
+            try:
+                congress = int(request.query_params['congress'])
+            except ValueError:
+                raise ValidationError({'congress': 'Expected an integer.'})
+        else:
+            congress = roll_calls.order_by('-congress').values_list('congress', flat=True).first()
+        matrix = VoteMatrix.load(roll_calls.filter(congress=congress))
+        if not len(matrix.votes):
+            return Response([])
+
+        shares = agreement(matrix, [legislator.vote_ordinal])[0]
+        others = [(share, pk) for pk, share in zip(matrix.legislator_pks.tolist(), shares.tolist())
+                  if pk >= 0 and pk != legislator.pk and share == share]
+        others.sort(key=lambda other: (-other[0] if ordering == 'most' else other[0], other[1]))
+        others = others[:limit]
+
+        legislators = self.get_queryset().in_bulk([pk for share, pk in others])
+        serializer = self.get_serializer()
+        return Response([{'legislator': serializer.to_representation(legislators[pk]), 'agreement': round(share, 4)}
+                         for share, pk in others])
+
+
+class LegislatorVotes(generics.ListAPIView):
+    """
+    List a legislator's votes, newest first, one roll call at a time out of the stored vote vectors.
+    """
+    serializer_class = RollCallVoteSerializer
+
+    def get_legislator(self):
+        if not hasattr(self, 'legislator'):
+            self.legislator = Legislator.objects.non_polymorphic()\
+                .only('pk', 'legislator_type', 'vote_ordinal').filter(pk=self.kwargs['pk']).first()
+            if self.legislator is None:
+                raise Http404
+        return self.legislator
+
+    def get_queryset(self):
+        return RollCall.objects.for_legislator(self.get_legislator())
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['vote_ordinal'] = self.get_legislator().vote_ordinal
+        return context
+
+
+class RepresentativeList(RowListMixin, generics.ListAPIView):
     """
     List all representatives.
     """
     queryset = Representative.objects.all()
     serializer_class = RepresentativeShortSerializer
+    row_serializer_class = RepresentativeShortRowSerializer
 
 
+@conditional_retrieve(Legislator.objects)
 class RepresentativeDetail(generics.RetrieveAPIView):
     """
     Retrieve a representative instance.
@@ -106,14 +371,16 @@ class RepresentativeDetail(generics.RetrieveAPIView):
     serializer_class = RepresentativeSerializer
 
 
-class SenatorList(generics.ListAPIView):
+class SenatorList(RowListMixin, generics.ListAPIView):
     """
     List all senators.
     """
     queryset = Senator.objects.all()
     serializer_class = SenatorShortSerializer
+    row_serializer_class = SenatorShortRowSerializer
 
 
+@conditional_retrieve(Legislator.objects)
 class SenatorDetail(generics.RetrieveAPIView):
     """
     Retrieve a senator instance.
@@ -122,30 +389,110 @@ class SenatorDetail(generics.RetrieveAPIView):
     serializer_class = SenatorSerializer
 
 
-class BillList(generics.ListAPIView):
+class BillList(BatchMixin, RowListMixin, generics.ListAPIView):
     """
-    List all bills.
+    List all bills, or retrieve a batch of detailed bills with ?ids=1,2,3.
     """
     serializer_class = BillShortSerializer
+    row_serializer_class = BillShortRowSerializer
+    batch_manager = Bill.objects
+    batch_serializer_class = BillSerializer
+    orderings = {'cosponsor_count': 'num_cosponsors', 'sponsor_count': 'num_sponsors',
+                 'introduction_date': 'introduction_date'}
+
+    def list(self, request, *args, **kwargs):
+        ids = self.batch_query_ids(request)
+        if ids is not None:
+            return self.batch_response(ids)
+        return super().list(request, *args, **kwargs)
 
     def get_queryset(self):
         """
-        Optionally restricts the returned bills to those whose title contains a string, such as 'CFPB'
+        Optionally restricts the returned bills to those whose title contains a string, such as 'CFPB', to those
+        matching a full-text search over titles and summaries, ranked by relevance, or to those with at least
+        min_cosponsors cosponsors. Bills can be ordered by cosponsor_count, sponsor_count or introduction_date, with
+        a leading '-' for descending order.
         """
         queryset = Bill.objects.all()
         filter_string = self.request.query_params.get('title', None)
         if filter_string is not None:
             queryset = queryset.filter(title__icontains=filter_string)
+        search_string = self.request.query_params.get('q', None)
+        if search_string is not None:
+            queryset = BillSearchIndex.search(queryset, search_string)
+        min_cosponsors = self.request.query_params.get('min_cosponsors', None)
+        if min_cosponsors is not None:
+            try:
+                queryset = queryset.filter(num_cosponsors__gte=int(min_cosponsors))
+            except ValueError:
+                raise ValidationError({'min_cosponsors': 'Expected an integer.'})
+        ordering = self.request.query_params.get('ordering', None)
+        if ordering is not None:
+            descending = ordering.startswith('-')
+            field = self.orderings.get(ordering.lstrip('-'), None)
+            if field is None:
+                raise ValidationError({'ordering': 'Expected one of: {orderings}'.format(
+                    orderings=', '.join(sorted(self.orderings)))})
+            queryset = queryset.order_by('-' + field if descending else field, '-pk' if descending else 'pk')
         return queryset
 
 
+class BillBatch(BatchAPIView):
+    """
+    Retrieve a batch of detailed bills, with ?ids=1,2,3 or with a body of {"ids": [1, 2, 3]}.
+    """
+    queryset = Bill.objects.all()
+    serializer_class = BillSerializer
+    batch_manager = Bill.objects
+    batch_serializer_class = BillSerializer
+
+
+@conditional_retrieve(Bill.objects)
+@profiled_view('BillDetail')
 class BillDetail(generics.RetrieveAPIView):
     """
     Retrieve a bill instance.
     """
-    queryset = Bill.objects.all()
+    queryset = Bill.objects.detailed()
     serializer_class = BillSerializer
 
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # The stored document and the validators conditional_retrieve needs come from one query
+        if request.method == 'GET':
+            row = BillDocument.objects.lookup(kwargs['pk'])
+            if row is not None:
+                request.billserve_last_modified, request.billserve_document = row
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Serves the bill's stored document when it has one. Bills without one, and format suffixed URLs, whose
+        hyperlinks the document doesn't carry, are serialized live.
+        """
+        payload = getattr(request, 'billserve_document', None)
+        if payload is None or self.format_kwarg is not None:
+            return super().retrieve(request, *args, **kwargs)
+
+        payload = documents.localize(payload, request)
+        if request.accepted_renderer.format == 'json':
+            return HttpResponse(payload, content_type=request.accepted_renderer.media_type)
+        return Response(json.loads(payload))
+
+
+class BillFamily(generics.GenericAPIView):
+    """
+    List every bill connected to a bill through related bills, including the bill itself, oldest first.
+    """
+    queryset = Bill.objects.all()
+    serializer_class = BillShortSerializer
+
+    def get(self, request, *args, **kwargs):
+        row_serializer = BillShortRowSerializer(request, self.format_kwarg)
+        rows = list(row_serializer.rows(Bill.objects.family(int(kwargs['pk'])).order_by('introduction_date', 'pk')))
+        if not rows:
+            raise Http404
+        return Response(row_serializer.many(rows))
+
 
 class LegislativeSubjectList(generics.ListAPIView):
     """
@@ -155,6 +502,8 @@ class LegislativeSubjectList(generics.ListAPIView):
     serializer_class = LegislativeSubjectShortSerializer
 
 
+@conditional_retrieve(LegislativeSubject.objects)
+@profiled_view('LegislativeSubjectDetail')
 class LegislativeSubjectDetail(generics.RetrieveAPIView):
     """
     Retrieve a legislative subject instance.
@@ -179,23 +528,233 @@ class PolicyAreaDetail(generics.RetrieveAPIView):
     serializer_class = PolicyAreaSerializer
 
 
+class ActivitySeries(APIView):
+    """
+    Monthly counts of bill introductions, sponsorships and cosponsorships, by party. Use ?dimension=subject or
+    ?dimension=policy-area with ?id= to chart one subject or policy area, and narrow with ?start= and ?end= (YYYY-MM),
+    ?congress= and ?party= (an abbreviation).
+    """
+    dimensions = {'total': RollupDimension.total, 'subject': RollupDimension.legislative_subject,
+                  'policy-area': RollupDimension.policy_area}
+
+    @staticmethod
+    def parse_month(name, value):
+        """
+        :param name: The name of the query parameter, for error messages
+        :param value: A month as YYYY-MM or a date as YYYY-MM-DD, or None
+        :return: The first day of the month, or None
+        """
+        if value is None:
+            return None
+        date = parse_date(value if value.count('-') == 2 else '{month}-01'.format(month=value))
+        if date is None:
+            raise ValidationError({name: 'Expected a month as YYYY-MM.'})
+        return date.replace(day=1)
+
+    @staticmethod
+    def parse_integer(name, value):
+        if value is None:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({name: 'Expected an integer.'})
+
+    def get(self, request, format=None):
+        params = request.query_params
+        dimension = self.dimensions.get(params.get('dimension', 'total'))
+        if dimension is None:
+            raise ValidationError({'dimension': 'Expected one of: {dimensions}.'.format(
+                dimensions=', '.join(self.dimensions))})
+        dimension_pk = self.parse_integer('id', params.get('id'))
+        if dimension is RollupDimension.total:
+            dimension_pk = 0
+        elif dimension_pk is None:
+            raise ValidationError({'id': 'Required for this dimension.'})
+
+        party_pk = None
+        if 'party' in params:
+            try:
+                party_pk = reference_data.party_by_abbreviation(params['party']).pk
+            except Party.DoesNotExist:
+                raise ValidationError({'party': 'Unknown party.'})
+
+        series = ActivityRollup.objects.series(dimension, dimension_pk,
+                                               start=self.parse_month('start', params.get('start')),
+                                               end=self.parse_month('end', params.get('end')),
+                                               congress=self.parse_integer('congress', params.get('congress')),
+                                               party_pk=party_pk)
+        return Response([{
+            'month': '{month:%Y-%m}'.format(month=row['month']),
+            'party': reference_data.party(row['party_pk']).abbreviation if row['party_pk'] else None,
+            'bills': row['bills'],
+            'sponsorships': row['sponsorships'],
+            'cosponsorships': row['cosponsorships']
+        } for row in series])
+
+
+class AutocompleteSuggestions(APIView):
+    """
+    Suggests bills by number and legislators, legislative subjects, policy areas and committees by name as ?q= is
+    typed, best first. Narrow with ?types=, a comma separated list of bill, senator, representative,
+    legislative-subject, policy-area and committee, and ?limit=, at most 20.
+    """
+    detail_views = {'bill': 'bill-detail', 'senator': 'senator-detail', 'representative': 'representative-detail',
+                    'legislative-subject': 'legislativesubject-detail', 'policy-area': 'policyarea-detail'}
+
+    def get(self, request, format=None):
+        params = request.query_params
+        kinds = params['types'].split(',') if params.get('types') else KINDS
+        unknown = [kind for kind in kinds if kind not in KINDS]
+        if unknown:
+            raise ValidationError({'types': 'Expected some of: {kinds}.'.format(kinds=', '.join(KINDS))})
+        try:
+            limit = int(params.get('limit', 10))
+        except ValueError:
+            raise ValidationError({'limit': 'Expected an integer.'})
+
+        index = autocomplete.current()
+        return Response({
+            'results': [{
+                'type': kind,
+                'id': pk,
+                'label': label,
+                'detail': detail,
+                'url': reverse(self.detail_views[kind], kwargs={'pk': pk}, request=request)
+                if kind in self.detail_views else None,
+            } for kind, pk, label, detail in index.search(params.get('q', ''), limit, kinds)],
+            'index': index.stats(),
+        })
+
+
+class ChangeFeed(APIView):
+    """
+    The changes to bills, cosponsorships and aggregates after ?since=, a sequence number, oldest first. Pass the
+    returned next as since to continue, straight away while more is true and later otherwise. ?limit= caps the
+    batch size.
+    """
+    default_limit = 500
+    max_limit = 5000
+
+    def get(self, request, format=None):
+        params = request.query_params
+        try:
+            since = int(params.get('since', 0))
+        except ValueError:
+            raise ValidationError({'since': 'Expected a sequence number.'})
+        try:
+            limit = min(int(params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            raise ValidationError({'limit': 'Expected an integer.'})
+        if since < 0 or limit < 1:
+            raise ValidationError({'since' if since < 0 else 'limit': 'Expected a positive integer.'})
+
+        events, more = ChangeEvent.objects.since(since, limit)
+        return Response({
+            'changes': [{
+                'seq': event.pk,
+                'resource': event.resource,
+                'action': ChangeAction(event.action).name,
+                'pk': event.object_pk,
+                'at': event.created_at,
+            } for event in events],
+            'next': events[-1].pk if events else since,
+            'more': more,
+        })
+
+
 def update_view(request):
     """
-    Updates the database with new data from govinfo.
+    Updates the database with new data from govinfo, crawling every collection the crawl scheduler finds due.
     :param request: A request object
     :return An HTTP response stating that the update has been queued
     """
-    origin_url_s = 'https://www.govinfo.gov/bulkdata/json/BILLSTATUS/115/s'
-    origin_url_hr = 'https://www.govinfo.gov/bulkdata/json/BILLSTATUS/115/hr'
-    update.delay(origin_url_s), update.delay(origin_url_hr)
+    schedule_crawls.delay()
     return HttpResponse(status=200, content='OK: Update queued.')
 
 
 def rebuild_view(request):
     """
-    Rebuilds all legislative subject support splits based on data in the current database instance.
+    Rebuilds all legislative subject support splits based on data in the current database instance, once rebuild
+    requests have stopped for the debounce window.
     :param request: A request object
     :return: An HTTP response stating that the rebuild has been queued
     """
-    rebuild.delay()
+    rebuilds.request()
     return HttpResponse(status=200, content='OK: Rebuild queued.')
+
+
+def metrics_view(request, format=None):
+    """
+    Reports ingest timings and counters from every worker, in the Prometheus text format or, as metrics.json, as a
+    JSON summary.
+    :param request: A request object
+    :param format: Either None for Prometheus or 'json'
+    :return: An HTTP response containing the metrics
+    """
+    if format == 'json':
+        return HttpResponse(json.dumps(metrics.summary()), content_type='application/json')
+    elif format is not None:
+        raise Http404('No such metrics format: {format}'.format(format=format))
+    return HttpResponse(metrics.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def crawl_progress_view(request, format=None):
+    """
+    Reports how far the crawl frontier has got, optionally for a single crawl given as ?crawl=, and how fast it's
+    going.
+    :param request: A request object
+    :param format: Ignored, the progress is always JSON
+    :return: An HTTP response containing the progress
+    """
+    crawl_id = request.GET.get('crawl', None)
+    progress = CrawlFrontier.objects.progress(crawl_id)
+    if crawl_id is not None:
+        progress['barrier'] = {'pending': crawls.pending(crawl_id), 'finished_at': crawls.finished_at(crawl_id)}
+    return HttpResponse(json.dumps(progress), content_type='application/json')
+
+
+def parse_timestamp(string):
+    """
+    Parses a date or datetime query parameter. Dates are taken as midnight and naive values as the current time zone.
+    :param string: An ISO 8601 date or datetime
+    :return: An aware datetime
+    """
+    timestamp = parse_datetime(string)
+    if timestamp is None:
+        date = parse_date(string)
+        if date is None:
+            raise ValueError('Not a date or datetime: {s}'.format(s=string))
+        timestamp = datetime.datetime.combine(date, datetime.time())
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    return timestamp
+
+
+def export_view(request, resource, format=None):
+    """
+    Streams an entire table as newline delimited JSON (the default) or CSV. Accepts an optional updated_since
+    query parameter, a date or datetime, for incremental pulls.
+    :param request: A request object
+    :param resource: The name of the table to export: bills, cosponsorships, sponsorships or support-splits
+    :param format: Either 'ndjson' or 'csv'
+    :return: A streaming HTTP response containing the export
+    """
+    content_types = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+    format = format or 'ndjson'
+    if resource not in exports or format not in content_types:
+        raise Http404('No such export: {resource}.{format}'.format(resource=resource, format=format))
+
+    updated_since = request.GET.get('updated_since', None)
+    if updated_since is not None:
+        try:
+            updated_since = parse_timestamp(updated_since)
+        except ValueError:
+            return HttpResponseBadRequest('Bad updated_since: {v}'.format(v=request.GET['updated_since']))
+
+    export = exports[resource]
+    content = export.csv(updated_since) if format == 'csv' else export.ndjson(updated_since)
+    response = StreamingHttpResponse(content, content_type=content_types[format])
+    response['Content-Disposition'] = 'attachment; filename="{resource}.{format}"'.format(resource=resource,
+                                                                                          format=format)
+    return response